@@ -1,6 +1,7 @@
 import sys
 import os
 import traceback
+import multiprocessing
 from PySide6.QtWidgets import QApplication, QMessageBox
 from src.vista_qt.principal_qt import VentanaPrincipalQt
 from src.controlador.coordinador import CoordinadorPrincipal
@@ -17,6 +18,8 @@ def main():
         
         # Conectar el coordinador después de mostrar la ventana
         coordinador = CoordinadorPrincipal(ventana)
+        # Al cerrar la ventana: cancelar la cola y terminar los procesos hijos
+        app.aboutToQuit.connect(coordinador.cerrar)
         
         # Mensaje inicial (después de mostrar para evitar congelamiento)
         from PySide6.QtCore import QTimer
@@ -35,4 +38,6 @@ def main():
 
 
 if __name__ == "__main__":
+    # Los procesos de transformación se lanzan con spawn (también en el ejecutable congelado)
+    multiprocessing.freeze_support()
     sys.exit(main())
\ No newline at end of file
@@ -37,17 +37,29 @@ CONFIG_SISTEMA = {
     'RUTAS': {
         'program_folder': 'programa',  # Carpeta relativa
         'plantillas_folder': 'src/plantillas',  # Carpeta de plantillas
+        'cache_folder': None,  # None: carpeta de cache del usuario (LOCALAPPDATA, ~/.cache...)
     },
     'UI': {
         'ventana_titulo': 'Transformador de Excel',
         'ventana_ancho': 800,
         'ventana_alto': 700,
     },
+    'LECTURA': {
+        'motor': 'xml',  # 'xml' (expat sobre el zip, más rápido) u 'openpyxl' (read_only)
+    },
+    'ESCRITURA': {
+        'motor': 'openpyxl',  # 'openpyxl' (modelo de objetos), 'write_only' (filas de datos en flujo) o 'xml' (hoja destino emitida como XML sobre el zip de la plantilla)
+    },
     'PROCESAMIENTO': {
         'actualizacion_ui_cada_n_filas': 2000,
         'guardado_cada_n_filas': 3000,
         'max_mensajes_por_ciclo': 10,
         'verificacion_mensajes_ms': 50,
+        'filas_por_bloque': 2000,  # Filas que se transforman juntas por columna
+        'max_cache_fechas': 4096,  # Textos de fecha ya convertidos que se recuerdan por columna
+        'max_mapeos_cache': 64,  # Diseños de reporte cuyo mapeo de columnas se guarda en disco
+        'trabajadores_transformacion': 2,  # Transformaciones de la cola que se ejecutan a la vez
+        'limite_segundos_trabajo': None,  # Tiempo máximo de cada transformación (None: sin límite)
     },
     'VALIDACION': {
         'min_filas_obligatorio': 10,
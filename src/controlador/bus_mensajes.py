@@ -0,0 +1,135 @@
+# src/controlador/bus_mensajes.py
+"""
+Bus de mensajes hacia la vista
+Los hilos de trabajo dejan mensajes, llamadas y valores de estado en un búfer; un QTimer
+del hilo de la interfaz lo vacía cada 'verificacion_mensajes_ms' y agrega los mensajes
+en una sola llamada a la vista. De cada estado (p. ej. el progreso) solo se aplica el
+último valor de cada ciclo.
+"""
+
+import threading
+from collections import deque
+
+from src.config.polizas import CONFIG_SISTEMA
+
+try:
+    from PySide6.QtCore import QTimer
+except Exception:
+    QTimer = None
+
+_MENSAJE = 'mensaje'
+_LLAMADA = 'llamada'
+
+
+class BusMensajes:
+    """Búfer seguro entre hilos que la interfaz vacía por ciclos
+
+    Args:
+        agregar_mensajes: callable(lista de textos) que agrega los mensajes a la vista
+        intervalo_ms: milisegundos entre dos vaciados
+        max_mensajes: mensajes que se agregan como máximo por ciclo (el resto espera)
+    """
+
+    def __init__(self, agregar_mensajes, intervalo_ms=None, max_mensajes=None):
+        procesamiento = CONFIG_SISTEMA.get('PROCESAMIENTO', {})
+        if intervalo_ms is None:
+            intervalo_ms = procesamiento.get('verificacion_mensajes_ms', 50)
+        if max_mensajes is None:
+            max_mensajes = procesamiento.get('max_mensajes_por_ciclo', 10)
+        self._agregar_mensajes = agregar_mensajes
+        self.max_mensajes = max(1, int(max_mensajes))
+        self._lock = threading.Lock()
+        # Mensajes y llamadas en orden de llegada: (_MENSAJE, texto) o (_LLAMADA, func, args, kwargs)
+        self._pendientes = deque()
+        # clave -> (func, args): solo el último valor de cada estado
+        self._estados = {}
+        self._vaciando = False
+        self._timer = None
+        if QTimer is not None:
+            # Se crea en el hilo de la interfaz (el del coordinador)
+            self._timer = QTimer()
+            self._timer.setInterval(max(1, int(intervalo_ms)))
+            self._timer.timeout.connect(self.vaciar)
+            self._timer.start()
+
+    @property
+    def diferido(self):
+        """True si los envíos esperan al siguiente ciclo (hay QTimer)"""
+        return self._timer is not None
+
+    def mensaje(self, texto):
+        """Agrega un mensaje al registro de la vista"""
+        if not self.diferido:
+            self._agregar_mensajes([texto])
+            return
+        with self._lock:
+            self._pendientes.append((_MENSAJE, texto))
+
+    def llamar(self, func, *args, **kwargs):
+        """Ejecuta func en el hilo de la interfaz, en orden con los mensajes"""
+        if not self.diferido:
+            func(*args, **kwargs)
+            return
+        with self._lock:
+            self._pendientes.append((_LLAMADA, func, args, kwargs))
+
+    def estado(self, clave, func, *args):
+        """Como llamar(), pero de cada clave solo se ejecuta la última del ciclo"""
+        if not self.diferido:
+            func(*args)
+            return
+        with self._lock:
+            self._estados[clave] = (func, args)
+
+    def vaciar(self):
+        """Aplica lo acumulado: hasta max_mensajes mensajes, las llamadas entre ellos y los estados"""
+        # Un diálogo modal abierto desde una llamada sigue atendiendo el timer
+        if self._vaciando:
+            return
+        self._vaciando = True
+        try:
+            with self._lock:
+                entradas = []
+                mensajes = 0
+                while self._pendientes:
+                    if self._pendientes[0][0] == _MENSAJE:
+                        if mensajes == self.max_mensajes:
+                            break
+                        mensajes += 1
+                    entradas.append(self._pendientes.popleft())
+                estados = list(self._estados.values())
+                self._estados.clear()
+
+            lote = []
+            for entrada in entradas:
+                if entrada[0] == _MENSAJE:
+                    lote.append(entrada[1])
+                    continue
+                self._agregar(lote)
+                lote = []
+                _, func, args, kwargs = entrada
+                self._ejecutar(func, *args, **kwargs)
+            self._agregar(lote)
+            for func, args in estados:
+                self._ejecutar(func, *args)
+        finally:
+            self._vaciando = False
+
+    def _agregar(self, lote):
+        if lote:
+            self._ejecutar(self._agregar_mensajes, lote)
+
+    @staticmethod
+    def _ejecutar(func, *args, **kwargs):
+        try:
+            func(*args, **kwargs)
+        except Exception as e:
+            print(f"[ERROR bus] {e}")
+
+    def detener(self):
+        """Detiene el timer y aplica lo que quedó pendiente"""
+        if self._timer is not None:
+            self._timer.stop()
+            while self._pendientes:
+                self.vaciar()
+            self.vaciar()
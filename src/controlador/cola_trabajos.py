@@ -0,0 +1,161 @@
+# src/controlador/cola_trabajos.py
+"""
+Cola de trabajos de transformación
+Cada trabajo tiene su propia carpeta temporal, estado y progreso; un grupo fijo de
+hilos los ejecuta y los resultados se recogen a medida que terminan.
+"""
+
+import itertools
+import os
+import shutil
+import tempfile
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from src.modelo.cancelacion import TransformacionCancelada
+
+PENDIENTE = 'pendiente'
+EN_PROCESO = 'en_proceso'
+COMPLETADO = 'completado'
+ERROR = 'error'
+CANCELADO = 'cancelado'
+
+
+class Trabajo:
+    """Una transformación encolada: archivo origen y póliza, con su estado y resultado"""
+
+    def __init__(self, id_trabajo, ruta_origen, poliza):
+        self.id = id_trabajo
+        self.ruta_origen = ruta_origen
+        self.poliza = poliza
+        self.estado = PENDIENTE
+        self.progreso = 0
+        self.directorio = None
+        self.ruta_resultado = None
+        self.nombre_descarga = None
+        self.error = None
+        self.detalle_error = None
+        self.cancelacion_pedida = False
+
+    @property
+    def nombre(self):
+        return os.path.basename(self.ruta_origen)
+
+    @property
+    def terminado(self):
+        return self.estado in (COMPLETADO, ERROR, CANCELADO)
+
+
+class ColaTrabajos:
+    """Ejecuta los trabajos encolados en un grupo de hilos
+
+    Args:
+        ejecutar: callable(trabajo) -> (ruta_resultado, nombre_descarga); corre en un hilo
+            del grupo y debe guardar el resultado dentro de trabajo.directorio
+        al_terminar: callable(trabajo) que se llama, desde ese mismo hilo, cuando el
+            trabajo se completa, falla o se cancela
+        al_cancelar: callable(trabajo) que transmite la cancelación a un trabajo en curso
+        trabajadores: transformaciones que se ejecutan a la vez
+    """
+
+    def __init__(self, ejecutar, al_terminar=None, trabajadores=2, al_cancelar=None):
+        self._ejecutar = ejecutar
+        self._al_terminar = al_terminar
+        self._al_cancelar = al_cancelar
+        self._ejecutor = ThreadPoolExecutor(
+            max_workers=max(1, int(trabajadores)), thread_name_prefix='transformacion'
+        )
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        # id -> (Trabajo, Future) de los trabajos aún no descartados
+        self._trabajos = {}
+
+    def encolar(self, ruta_origen, poliza):
+        """Agrega un trabajo a la cola y lo devuelve"""
+        trabajo = Trabajo(next(self._ids), ruta_origen, poliza)
+        with self._lock:
+            futuro = self._ejecutor.submit(self._correr, trabajo)
+            self._trabajos[trabajo.id] = (trabajo, futuro)
+        return trabajo
+
+    def _correr(self, trabajo):
+        """Ejecuta un trabajo en su carpeta temporal y registra el resultado o el error"""
+        trabajo.directorio = tempfile.mkdtemp(prefix=f'transformacion_{trabajo.id}_')
+        trabajo.estado = EN_PROCESO
+        try:
+            if trabajo.cancelacion_pedida:
+                raise TransformacionCancelada("Transformación cancelada por el usuario")
+            trabajo.ruta_resultado, trabajo.nombre_descarga = self._ejecutar(trabajo)
+            trabajo.progreso = 100
+            trabajo.estado = COMPLETADO
+        except TransformacionCancelada as e:
+            trabajo.error = e
+            trabajo.estado = CANCELADO
+        except Exception as e:
+            trabajo.error = e
+            trabajo.detalle_error = traceback.format_exc()
+            trabajo.estado = ERROR
+        if self._al_terminar:
+            try:
+                self._al_terminar(trabajo)
+            except Exception as e:
+                print(f"[ERROR cola] {e}")
+        return trabajo
+
+    def trabajos(self):
+        """Trabajos no descartados, en orden de llegada"""
+        with self._lock:
+            return [trabajo for trabajo, _ in self._trabajos.values()]
+
+    def activos(self):
+        """Cantidad de trabajos pendientes o en proceso"""
+        return sum(1 for trabajo in self.trabajos() if not trabajo.terminado)
+
+    def progreso(self):
+        """Progreso medio (0-100) de los trabajos no descartados"""
+        trabajos = self.trabajos()
+        if not trabajos:
+            return 0
+        return sum(trabajo.progreso for trabajo in trabajos) / len(trabajos)
+
+    def completados(self, timeout=None):
+        """Itera los trabajos encolados hasta ahora a medida que terminan"""
+        with self._lock:
+            futuros = [futuro for _, futuro in self._trabajos.values()]
+        for futuro in as_completed(futuros, timeout=timeout):
+            yield futuro.result()
+
+    def cancelar(self, trabajo):
+        """Pide detener un trabajo; termina como CANCELADO en su próxima comprobación"""
+        if trabajo.terminado or trabajo.cancelacion_pedida:
+            return
+        trabajo.cancelacion_pedida = True
+        if trabajo.estado == EN_PROCESO and self._al_cancelar:
+            self._al_cancelar(trabajo)
+
+    def cancelar_todos(self):
+        """Cancela los trabajos pendientes y en proceso; devuelve cuántos"""
+        activos = [trabajo for trabajo in self.trabajos() if not trabajo.terminado]
+        for trabajo in activos:
+            self.cancelar(trabajo)
+        return len(activos)
+
+    def buscar(self, ruta_resultado):
+        """Trabajo cuyo resultado está en la ruta indicada, o None"""
+        ruta = os.path.normcase(os.path.abspath(ruta_resultado))
+        for trabajo in self.trabajos():
+            if trabajo.ruta_resultado and os.path.normcase(os.path.abspath(trabajo.ruta_resultado)) == ruta:
+                return trabajo
+        return None
+
+    def descartar(self, trabajo):
+        """Olvida un trabajo terminado y borra su carpeta temporal"""
+        with self._lock:
+            self._trabajos.pop(trabajo.id, None)
+        if trabajo.directorio:
+            shutil.rmtree(trabajo.directorio, ignore_errors=True)
+
+    def cerrar(self, esperar=True):
+        """Detiene el grupo de hilos (los trabajos pendientes se descartan si no se espera)"""
+        self._ejecutor.shutdown(wait=esperar, cancel_futures=not esperar)
@@ -4,22 +4,27 @@ Controlador Coordinador
 Orquesta la interacción entre Modelo y Vista
 """
 
-import threading
 import os
-import tempfile
 import traceback
 from pathlib import Path
 from src.modelo import (
     Poliza, ArchivoOrigen, ArchivoPlantilla, 
     ArchivoResultado, TransformadorDatos
 )
-from src.config.polizas import CONFIGURACION_POLIZAS, TRANSFORMACIONES
+from src.modelo.proceso_transformacion import ProcesoTransformacion
+from src.modelo.cancelacion import TransformacionCancelada
+from src.modelo.progreso import describir_progreso
+from src.controlador.cola_trabajos import ColaTrabajos, ERROR, CANCELADO
+from src.controlador.bus_mensajes import BusMensajes
+from src.config.polizas import CONFIGURACION_POLIZAS, CONFIG_SISTEMA, TRANSFORMACIONES
 
-# Qt helper for thread-safe UI updates (no-op if Qt is not available)
-try:
-    from PySide6.QtCore import QTimer
-except Exception:
-    QTimer = None
+
+# Progreso de un trabajo recién encolado; el avance del pipeline ocupa el resto de la barra
+_PROGRESO_INICIAL = 20
+
+
+class HojaRequeridaNoEncontrada(Exception):
+    """El archivo origen no tiene la hoja que exige la póliza (ya se avisó en la vista)"""
 
 
 class CoordinadorPrincipal:
@@ -27,11 +32,28 @@ class CoordinadorPrincipal:
     
     def __init__(self, vista):
         self.vista = vista
+        # Mensajes, progreso y llamadas a la vista pasan por el bus (hilo de UI, por ciclos)
+        self._progreso_vista = (
+            getattr(vista, 'establecer_progreso', None) or getattr(vista, 'set_progress', None)
+        )
+        self.bus = BusMensajes(self._agregar_mensajes_vista())
         self.archivo_actual = None
+        # Archivos seleccionados que se encolan al pulsar Transformar (uno por trabajo)
+        self.archivos_actuales = []
         self.poliza_actual = None
         self.polizas_disponibles = {}
         self.transformador = None
         self.archivo_plantilla = None
+        self.proceso = None
+        self._cerrando = False
+        # Resultados ya recogidos: {ruta temporal: Trabajo}
+        self.resultados = {}
+        self.cola = ColaTrabajos(
+            self._ejecutar_transformacion,
+            al_terminar=self._trabajo_terminado,
+            trabajadores=CONFIG_SISTEMA.get('PROCESAMIENTO', {}).get('trabajadores_transformacion', 2),
+            al_cancelar=self._cancelar_en_proceso
+        )
         
         self._inicializar()
     
@@ -64,8 +86,12 @@ class CoordinadorPrincipal:
                 self.vista.solicitar_transformacion.connect(self.iniciar_transformacion)
             if hasattr(self.vista, 'archivo_seleccionado'):
                 self.vista.archivo_seleccionado.connect(self.archivo_seleccionado)
+            if hasattr(self.vista, 'archivos_seleccionados'):
+                self.vista.archivos_seleccionados.connect(self.archivos_seleccionados)
             if hasattr(self.vista, 'descargar_resultado'):
                 self.vista.descargar_resultado.connect(self.descargar_archivo)
+            if hasattr(self.vista, 'solicitar_cancelacion'):
+                self.vista.solicitar_cancelacion.connect(self.cancelar_transformacion)
         except Exception:
             pass
         
@@ -74,14 +100,26 @@ class CoordinadorPrincipal:
         
         # Buscar plantilla
         self._buscar_plantilla()
+        
+        # Arrancar los procesos de transformación (con las plantillas cargadas) en segundo plano
+        self._iniciar_proceso_transformacion()
 
     # ===== Helpers =====
     def _en_ui(self, func, *args, **kwargs):
-        """Ejecuta un callable en el hilo de UI si QTimer está disponible."""
-        if QTimer:
-            QTimer.singleShot(0, lambda: func(*args, **kwargs))
-        else:
-            func(*args, **kwargs)
+        """Ejecuta un callable en el hilo de UI, en orden con los mensajes del bus"""
+        self.bus.llamar(func, *args, **kwargs)
+
+    def _agregar_mensajes_vista(self):
+        """Callable que agrega un lote de mensajes a la vista (se resuelve una vez)"""
+        if hasattr(self.vista, 'add_messages'):
+            return self.vista.add_messages
+        agregar = getattr(self.vista, 'agregar_mensaje', None) or getattr(self.vista, 'add_message', None)
+
+        def agregar_uno_a_uno(mensajes):
+            if agregar is not None:
+                for mensaje in mensajes:
+                    agregar(mensaje)
+        return agregar_uno_a_uno
     
     def _crear_polizas(self):
         """Crea instancias de pólizas desde configuración"""
@@ -118,15 +156,51 @@ class CoordinadorPrincipal:
         
         self._add_msg("⚠ Plantilla no encontrada\n")
     
+    @staticmethod
+    def _ruta_plantilla(plantilla_nombre):
+        """Primera ubicación existente de la plantilla, o None"""
+        posibles_rutas = [
+            os.path.join(os.getcwd(), 'src', 'plantillas', plantilla_nombre),
+            os.path.join(os.getcwd(), 'plantillas', plantilla_nombre),
+            os.path.join(os.getcwd(), plantilla_nombre),
+        ]
+        for rp in posibles_rutas:
+            if os.path.exists(rp):
+                return rp
+        return None
+    
+    def _iniciar_proceso_transformacion(self):
+        """Crea los procesos hijos que transforman y los deja calientes
+        
+        Un hijo por trabajador de la cola; cada uno precarga las plantillas de las pólizas
+        en su propio pool, de modo que el proceso de la interfaz ya no las carga.
+        """
+        rutas = [
+            ruta for ruta in map(self._ruta_plantilla, ('plantilla5852.xlsx', 'plantilla5924.xlsx'))
+            if ruta
+        ]
+        self.proceso = ProcesoTransformacion(
+            procesos=CONFIG_SISTEMA.get('PROCESAMIENTO', {}).get('trabajadores_transformacion', 2),
+            plantillas=rutas
+        )
+        self.proceso.calentar()
+    
     def archivo_seleccionado(self, ruta):
         """Manejador cuando se selecciona un archivo"""
-        self.archivo_actual = ArchivoOrigen(ruta)
-        
-        if not self.archivo_actual.es_valido():
-            self.vista.mostrar_error("Error", "Archivo inválido")
+        self.archivos_seleccionados([ruta])
+    
+    def archivos_seleccionados(self, rutas):
+        """Manejador cuando se seleccionan uno o varios archivos"""
+        archivos = [ArchivoOrigen(ruta) for ruta in rutas]
+        invalidos = [archivo.nombre for archivo in archivos if not archivo.es_valido()]
+        if invalidos:
+            self.vista.mostrar_error("Error", "Archivo inválido: " + ", ".join(invalidos))
             return
+        self.archivos_actuales = archivos
+        self.archivo_actual = archivos[0] if archivos else None
         
-        self._add_msg(f"✓ Archivo seleccionado: {self.archivo_actual.nombre}\n")
+        for archivo in archivos:
+            self._add_msg(f"✓ Archivo seleccionado: {archivo.nombre}\n")
         # Progreso inicial tras selección de archivo
         try:
             self.vista.establecer_progreso(10)
@@ -134,186 +208,232 @@ class CoordinadorPrincipal:
             pass
     
     def iniciar_transformacion(self):
-        """Inicia la transformación en un thread separado"""
-        if not self.archivo_actual:
+        """Encola un trabajo por cada archivo seleccionado"""
+        if not self.archivos_actuales:
             self.vista.mostrar_error("Error", "Seleccione un archivo")
             return
         
         poliza_nombre = self.vista.obtener_poliza_seleccionada()
-        if not poliza_nombre:
+        if not poliza_nombre or poliza_nombre not in self.polizas_disponibles:
             self.vista.mostrar_error("Error", "Seleccione una póliza")
             return
         
         self.poliza_actual = self.polizas_disponibles[poliza_nombre]
         
-        # Deshabilitar controles
+        for archivo in self.archivos_actuales:
+            self.encolar_transformacion(archivo.ruta, poliza_nombre)
+        # Ya encolados: otra transformación pide volver a seleccionar archivos
+        self.archivos_actuales = []
+
+    def encolar_transformacion(self, ruta_origen, poliza_nombre):
+        """Agrega una transformación a la cola y devuelve su Trabajo
+        
+        Cada trabajo usa su propio TransformadorDatos y su propia carpeta temporal,
+        así que varios archivos pueden transformarse a la vez sin pisarse.
+        """
+        trabajo = self.cola.encolar(ruta_origen, self.polizas_disponibles[poliza_nombre])
+        if self.cola.activos() > 1:
+            self._add_msg(f"⏳ En cola: {trabajo.nombre}\n")
+        self._progreso_trabajo(trabajo, _PROGRESO_INICIAL)
+        self._actualizar_cancelable()
+        return trabajo
+
+    def cancelar_transformacion(self):
+        """Cancela las transformaciones pendientes y en curso (botón Cancelar)"""
+        if self.cola.cancelar_todos():
+            self._add_msg("⏹ Cancelando transformación...\n")
+
+    def cerrar(self):
+        """Detiene la cola, los procesos hijos y el bus al salir de la aplicación
+
+        Los trabajos en curso se cancelan y los pendientes no llegan a empezar; los
+        resultados que no se descargaron se borran con su carpeta temporal.
+        """
+        self._cerrando = True
+        self.cola.cancelar_todos()
+        self.cola.cerrar(esperar=False)
+        if self.proceso is not None:
+            self.proceso.cerrar()
+        for trabajo in list(self.resultados.values()):
+            self.cola.descartar(trabajo)
+        self.resultados.clear()
+        self.bus.detener()
+
+    def _cancelar_en_proceso(self, trabajo):
+        """Transmite la cancelación al proceso hijo que ejecuta el trabajo"""
+        if self.proceso is not None:
+            self.proceso.cancelar(trabajo.id)
+
+    def _actualizar_cancelable(self):
+        """Habilita Cancelar mientras queden trabajos pendientes o en curso"""
         try:
-            self.vista.habilitar_controles(False)
+            if hasattr(self.vista, 'set_cancelable'):
+                self.bus.estado('cancelable', self.vista.set_cancelable, self.cola.activos() > 0)
         except Exception:
             pass
-        # Avance de progreso al iniciar
+
+    def _progreso_trabajo(self, trabajo, valor):
+        """Actualiza el progreso del trabajo y muestra el promedio de la cola"""
+        trabajo.progreso = valor
         try:
-            self._set_progress(20)
+            self._set_progress(self.cola.progreso())
         except Exception:
             pass
+
+    def _detalle_progreso(self, trabajo, texto):
+        """Fase, filas/s y tiempo restante junto a la barra"""
+        if self.cola.activos() > 1:
+            texto = f"[{trabajo.nombre}] {texto}"
+        try:
+            if hasattr(self.vista, 'set_detalle_progreso'):
+                self.bus.estado('detalle_progreso', self.vista.set_detalle_progreso, texto)
+        except Exception:
+            pass
+
+    def _msg_trabajo(self, trabajo, msg):
+        """Mensaje de un trabajo; con varios en curso se antepone el archivo"""
+        if self.cola.activos() > 1:
+            msg = f"[{trabajo.nombre}] {msg}"
+        self._add_msg(msg)
+
+    def _ejecutar_transformacion(self, trabajo):
+        """Ejecuta la transformación de un trabajo (hilo de la cola) - LÓGICA REAL"""
+        try:
+            return self._transformar_trabajo(trabajo)
+        except (HojaRequeridaNoEncontrada, TransformacionCancelada):
+            raise
+        except Exception as e:
+            error_detalle = traceback.format_exc()
+            self._msg_trabajo(trabajo, f"\n✗ Error: {str(e)}\n")
+            self._add_msg(f"\nDetalle:\n{error_detalle}\n")
+            self._en_ui(self.vista.mostrar_error, "Error", str(e))
+            raise
+
+    def _transformar_trabajo(self, trabajo):
+        """Transforma el origen del trabajo y guarda el resultado en su carpeta temporal"""
+        # Mensajes y avance del proceso hijo (llegan por la cola de eventos)
+        def callback_mensaje(msg):
+            self._msg_trabajo(trabajo, msg + "\n")
         
-        # Ejecutar en thread
-        thread = threading.Thread(target=self._ejecutar_transformacion)
-        thread.daemon = True
-        thread.start()
-    
-    def _ejecutar_transformacion(self):
-        """Ejecuta la transformación de datos - LÓGICA REAL"""
-        import os
-        import tempfile
+        def callback_progreso(progreso):
+            # El avance por fases y filas ocupa la barra desde el progreso inicial
+            try:
+                self._progreso_trabajo(
+                    trabajo, _PROGRESO_INICIAL + (100 - _PROGRESO_INICIAL) * progreso.porcentaje / 100
+                )
+                self._detalle_progreso(trabajo, describir_progreso(progreso))
+            except Exception as e:
+                print(f"[ERROR callback] {e}")
+        
+        # Obtener configuración de póliza
+        poliza_config = trabajo.poliza.config
         
+        # Determinar plantilla según póliza (DV -> 5852, TC -> 5924)
+        plantilla_nombre = 'plantilla5852.xlsx'
         try:
-            # Crear transformador con callback de mensajes
-            contador_mensajes = {'count': 0}
-            
-            def callback_mensaje(msg):
-                self._add_msg(msg + "\n")
-                # Avance progresivo suave basado en mensajes
-                try:
-                    contador_mensajes['count'] += 1
-                    # Incremento pequeño y constante: +1% por cada mensaje hasta 75%
-                    # Usar _set_progress que ya está optimizado con _en_ui
-                    self._set_progress(min(75, 20 + contador_mensajes['count']))
-                except Exception as e:
-                    print(f"[ERROR callback] {e}")
-            
-            transformador = TransformadorDatos(callback_mensaje=callback_mensaje)
-            
-            # Obtener configuración de póliza
-            poliza_config = self.poliza_actual.config
-            # Avance antes de transformar
-            try:
-                self._set_progress(25)
-            except Exception:
-                pass
-            
-            # Determinar plantilla según póliza (DV -> 5852, TC -> 5924)
-            import os
-            plantilla_nombre = 'plantilla5852.xlsx'
-            try:
-                prefijo = str(poliza_config.get('prefijo', '')).upper()
-            except Exception:
-                prefijo = ''
-            if prefijo == 'TC':
-                plantilla_nombre = 'plantilla5924.xlsx'
-
-            posibles_rutas = [
-                os.path.join(os.getcwd(), 'src', 'plantillas', plantilla_nombre),
-                os.path.join(os.getcwd(), 'plantillas', plantilla_nombre),
-                os.path.join(os.getcwd(), plantilla_nombre),
-            ]
-
-
-            ruta_plantilla_elegida = None
-            for rp in posibles_rutas:
-                if os.path.exists(rp):
-                    ruta_plantilla_elegida = rp
-                    break
-
-            if not ruta_plantilla_elegida:
-                raise Exception(f"No se encontró la plantilla requerida: {plantilla_nombre}")
-
-            # Validar que el archivo origen contiene la hoja requerida según póliza
-            hoja_requerida = poliza_config.get('hoja_origen_requerida') if isinstance(poliza_config, dict) else None
-            print(f"[DEBUG] hoja_requerida: {hoja_requerida}")
-            if hoja_requerida:
-                try:
-                    from openpyxl import load_workbook
-                    wb_origen = load_workbook(self.archivo_actual.ruta, read_only=True, data_only=True)
-                    nombres_hojas = [str(n) for n in wb_origen.sheetnames]
-                    if hoja_requerida not in nombres_hojas:
-                        msg = (
-                            f"El archivo seleccionado no contiene la hoja requerida para la póliza seleccionada.\n\n"
-                            f"Póliza: {poliza_config.get('prefijo','')}\n"
-                            f"Hoja requerida: {hoja_requerida}\n"
-                            f"Hojas encontradas: {', '.join(nombres_hojas)}\n\n"
-                            f"Para DV (5852) se espera un archivo 413. Para TC (5924) se espera un archivo 455."
-                        )
-                        self._en_ui(self.vista.mostrar_error, "Hoja requerida no encontrada", msg)
-                        # Re-habilitar controles y abortar
-                        try:
-                            if hasattr(self.vista, 'habilitar_controles'):
-                                self._en_ui(self.vista.habilitar_controles, True)
-                        except Exception:
-                            pass
-                        return
-                except Exception:
-                    # Si no se puede leer, continuar y dejar que el transformador reporte el error
-                    pass
+            prefijo = str(poliza_config.get('prefijo', '')).upper()
+        except Exception:
+            prefijo = ''
+        if prefijo == 'TC':
+            plantilla_nombre = 'plantilla5924.xlsx'
+
+        ruta_plantilla_elegida = self._ruta_plantilla(plantilla_nombre)
+
+        if not ruta_plantilla_elegida:
+            raise Exception(f"No se encontró la plantilla requerida: {plantilla_nombre}")
 
-            # Ejecutar transformación
-            print("[DEBUG] Antes de llamar transformador.transformar()")
-            wb_resultado, nombre_descarga = transformador.transformar(
-                archivo_origen=self.archivo_actual.ruta,
-                archivo_plantilla=ruta_plantilla_elegida,
-                poliza_info=poliza_config
-            )
-            print(f"[DEBUG] Transformación completada: {nombre_descarga}")
-            # Avance después de transformar exitosamente
+        # Validar que el archivo origen contiene la hoja requerida según póliza
+        hoja_requerida = poliza_config.get('hoja_origen_requerida') if isinstance(poliza_config, dict) else None
+        print(f"[DEBUG] hoja_requerida: {hoja_requerida}")
+        if hoja_requerida:
+            nombres_hojas = None
             try:
-                self._set_progress(80)
+                from openpyxl import load_workbook
+                wb_origen = load_workbook(trabajo.ruta_origen, read_only=True, data_only=True)
+                nombres_hojas = [str(n) for n in wb_origen.sheetnames]
+                wb_origen.close()
             except Exception:
+                # Si no se puede leer, continuar y dejar que el transformador reporte el error
                 pass
-            
-            # Guardar en archivo temporal
-            temp_dir = tempfile.gettempdir()
-            ruta_temp = os.path.join(temp_dir, nombre_descarga)
-            
-            wb_resultado.save(ruta_temp)
+            if nombres_hojas is not None and hoja_requerida not in nombres_hojas:
+                msg = (
+                    f"El archivo seleccionado no contiene la hoja requerida para la póliza seleccionada.\n\n"
+                    f"Archivo: {trabajo.nombre}\n"
+                    f"Póliza: {poliza_config.get('prefijo','')}\n"
+                    f"Hoja requerida: {hoja_requerida}\n"
+                    f"Hojas encontradas: {', '.join(nombres_hojas)}\n\n"
+                    f"Para DV (5852) se espera un archivo 413. Para TC (5924) se espera un archivo 455."
+                )
+                self._en_ui(self.vista.mostrar_error, "Hoja requerida no encontrada", msg)
+                raise HojaRequeridaNoEncontrada(hoja_requerida)
+
+        # Ejecutar transformación en un proceso hijo; guarda en la carpeta temporal del trabajo
+        print("[DEBUG] Antes de llamar proceso.transformar()")
+        ruta_temp, nombre_descarga = self.proceso.transformar(
+            trabajo.id,
+            trabajo.ruta_origen,
+            ruta_plantilla_elegida,
+            poliza_config,
+            trabajo.directorio,
+            callback_mensaje=callback_mensaje,
+            limite_segundos=CONFIG_SISTEMA.get('PROCESAMIENTO', {}).get('limite_segundos_trabajo'),
+            callback_progreso=callback_progreso
+        )
+        print(f"[DEBUG] Transformación completada: {nombre_descarga}")
+        return ruta_temp, nombre_descarga
+
+    def _trabajo_terminado(self, trabajo):
+        """Recoge el resultado de un trabajo en cuanto termina (hilo de la cola)"""
+        self._actualizar_cancelable()
+        if trabajo.estado == CANCELADO:
+            self._msg_trabajo(trabajo, f"\n⏹ {trabajo.error}\n")
+        if trabajo.estado in (ERROR, CANCELADO) or self._cerrando:
+            self.cola.descartar(trabajo)
             try:
-                self._set_progress(90)
+                self._set_progress(self.cola.progreso())
             except Exception:
                 pass
-            
-            # Establecer archivo para descargar con nombre sugerido
+            return
+        
+        nombre_descarga = trabajo.nombre_descarga
+        # Establecer archivo para descargar con nombre sugerido
+        self._en_ui(self._establecer_resultado, trabajo)
+        
+        # Resaltar descarga y bloquear transformar
+        try:
             try:
-                if hasattr(self.vista, 'establecer_archivo_resultado'):
-                    self._en_ui(self.vista.establecer_archivo_resultado, ruta_temp, nombre_descarga)
-                elif hasattr(self.vista, 'set_archivo_resultado_temp'):
-                    self._en_ui(self.vista.set_archivo_resultado_temp, ruta_temp, nombre_descarga)
+                self._en_ui(self.vista.resaltar_descargar)
             except Exception:
-                pass
-            
-            # Resaltar descarga y bloquear transformar
-            try:
                 try:
-                    self._en_ui(self.vista.resaltar_descargar)
+                    self._en_ui(self.vista.highlight_descargar)
                 except Exception:
-                    try:
-                        self._en_ui(self.vista.highlight_descargar)
-                    except Exception:
-                        pass
-            except Exception:
-                pass
-            
-            self._add_msg(f"✓ Archivo preparado: {nombre_descarga}\n")
-            self._add_msg("\nHaz clic en 'Descargar Resultado' para elegir dónde guardarlo\n")
-            self._add_msg("\n🎉 ¡Transformación completada exitosamente!\n")
-            try:
-                self._set_progress(100)
-            except Exception:
-                pass
-            
-        except Exception as e:
-            import traceback
-            error_detalle = traceback.format_exc()
-            self._add_msg(f"\n✗ Error: {str(e)}\n")
-            self._add_msg(f"\nDetalle:\n{error_detalle}\n")
-            self._en_ui(self.vista.mostrar_error, "Error", str(e))
-            try:
-                self._set_progress(0)
-            except Exception:
-                pass
-            # Habilitar controles en caso de error
-            try:
-                self._en_ui(self.vista.habilitar_controles, True)
-            except Exception:
-                pass
+                    pass
+        except Exception:
+            pass
+        
+        self._msg_trabajo(trabajo, f"✓ Archivo preparado: {nombre_descarga}\n")
+        self._add_msg("\nHaz clic en 'Descargar Resultado' para elegir dónde guardarlo\n")
+        self._add_msg("\n🎉 ¡Transformación completada exitosamente!\n")
+        try:
+            self._set_progress(self.cola.progreso())
+        except Exception:
+            pass
+    
+    def _establecer_resultado(self, trabajo):
+        """Agrega el resultado a los que se pueden descargar (hilo de UI)
+
+        Cada resultado conserva su carpeta temporal hasta que se descarga.
+        """
+        self.resultados[trabajo.ruta_resultado] = trabajo
+        try:
+            if hasattr(self.vista, 'agregar_resultado'):
+                self.vista.agregar_resultado(trabajo.ruta_resultado, trabajo.nombre_descarga, trabajo.nombre)
+            elif hasattr(self.vista, 'establecer_archivo_resultado'):
+                self.vista.establecer_archivo_resultado(trabajo.ruta_resultado, trabajo.nombre_descarga)
+            elif hasattr(self.vista, 'set_archivo_resultado_temp'):
+                self.vista.set_archivo_resultado_temp(trabajo.ruta_resultado, trabajo.nombre_descarga)
+        except Exception:
+            pass
     
     def _mostrar_mensaje(self, mensaje):
         """Muestra mensaje en la vista"""
@@ -334,6 +454,12 @@ class CoordinadorPrincipal:
             # Copiar archivo a ubicación seleccionada
             shutil.copy2(ruta_origen, ruta_destino)
             self._add_msg(f"✓ Archivo guardado en:\n{ruta_destino}\n")
+            # El resultado ya está en su destino: liberar la carpeta temporal del trabajo
+            trabajo = self.resultados.pop(ruta_origen, None)
+            if trabajo is not None:
+                self.cola.descartar(trabajo)
+            if hasattr(self.vista, 'quitar_resultado'):
+                self.vista.quitar_resultado(ruta_origen)
             
             # Esperar a que el archivo esté completamente escrito
             time.sleep(0.5)
@@ -368,19 +494,15 @@ class CoordinadorPrincipal:
     # ===== Helpers for dual UI =====
     def _add_msg(self, msg):
         try:
-            if hasattr(self.vista, 'agregar_mensaje'):
-                self._en_ui(self.vista.agregar_mensaje, msg)
-            elif hasattr(self.vista, 'add_message'):
-                self._en_ui(self.vista.add_message, msg)
+            self.bus.mensaje(msg)
         except Exception:
             pass
 
     def _set_progress(self, value):
+        # Solo el último valor de cada ciclo del bus llega a la barra
         try:
-            if hasattr(self.vista, 'establecer_progreso'):
-                self._en_ui(self.vista.establecer_progreso, value)
-            elif hasattr(self.vista, 'set_progress'):
-                self._en_ui(self.vista.set_progress, value)
+            if self._progreso_vista is not None:
+                self.bus.estado('progreso', self._progreso_vista, value)
         except Exception:
             pass
             
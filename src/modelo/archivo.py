@@ -5,10 +5,11 @@ Maneja la lógica de lectura/escritura de archivos
 """
 
 import os
-import pandas as pd
 from openpyxl import load_workbook
 from datetime import datetime
 
+from .lector_origen import crear_lector
+
 
 class ArchivoOrigen:
     """Representa el archivo 413 de origen"""
@@ -27,12 +28,9 @@ class ArchivoOrigen:
     def cargar(self, nombre_hoja='Report_AseguradoraMensual'):
         """Carga el archivo"""
         try:
-            self.df = pd.read_excel(
-                self.ruta,
-                sheet_name=nombre_hoja,
-                header=None,
-                engine='openpyxl'
-            )
+            # Motor de lectura según CONFIG_SISTEMA['LECTURA']['motor']
+            with crear_lector(self.ruta, nombre_hoja) as lector:
+                self.df = lector.dataframe()
             self.hoja_datos = nombre_hoja
             return True
         except Exception as e:
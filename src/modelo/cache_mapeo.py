@@ -0,0 +1,127 @@
+# src/modelo/cache_mapeo.py
+"""
+Cache persistente de mapeos de columnas
+La clave es un hash de los encabezados origen y destino completos (normalizados) y
+la póliza; las entradas se guardan en JSON en la carpeta de cache del usuario (LRU)
+"""
+
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import pandas as pd
+
+from ..config import CONFIG_SISTEMA
+
+
+_VERSION = 2
+_NOMBRE_ARCHIVO = 'mapeo_columnas.json'
+
+
+def carpeta_cache_usuario():
+    """Carpeta de cache del usuario para la aplicación (según sistema operativo)"""
+    carpeta = CONFIG_SISTEMA['RUTAS'].get('cache_folder')
+    if carpeta:
+        return Path(carpeta)
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or Path.home() / 'AppData' / 'Local'
+    elif sys.platform == 'darwin':
+        base = Path.home() / 'Library' / 'Caches'
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(base) / 'TransformadorExcel'
+
+
+def clave_mapeo(headers_origen, headers_destino, poliza=None):
+    """Hash de los encabezados completos, tal como los compara el mapeo, y la póliza"""
+    origen = [
+        ' '.join(str(header).strip().upper().split()) if pd.notna(header) else None
+        for header in headers_origen
+    ]
+    destino = [
+        str(cell.value).strip().upper() if cell.value else None
+        for cell in headers_destino
+    ]
+    firma = json.dumps([_VERSION, poliza, origen, destino], ensure_ascii=False)
+    return hashlib.sha256(firma.encode('utf-8')).hexdigest()
+
+
+class CacheMapeo:
+    """Mapeos {idx_origen: col_destino} por firma de encabezados, persistidos en disco"""
+
+    def __init__(self, ruta=None, max_entradas=None):
+        self.ruta = Path(ruta) if ruta else carpeta_cache_usuario() / _NOMBRE_ARCHIVO
+        if max_entradas is None:
+            max_entradas = CONFIG_SISTEMA['PROCESAMIENTO'].get('max_mapeos_cache', 64)
+        self.max_entradas = max_entradas
+        self._entradas = None
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        """Mapeo guardado para la clave (copia) o None"""
+        with self._lock:
+            entradas = self._cargar()
+            if clave not in entradas:
+                return None
+            if next(reversed(entradas)) != clave:
+                entradas.move_to_end(clave)
+                self._guardar()
+            return dict(entradas[clave])
+
+    def guardar(self, clave, mapeo):
+        with self._lock:
+            entradas = self._cargar()
+            entradas[clave] = dict(mapeo)
+            entradas.move_to_end(clave)
+            while len(entradas) > self.max_entradas:
+                entradas.popitem(last=False)
+            self._guardar()
+
+    def _cargar(self):
+        if self._entradas is None:
+            self._entradas = OrderedDict()
+            try:
+                with open(self.ruta, encoding='utf-8') as archivo:
+                    datos = json.load(archivo)
+                if datos.get('version') == _VERSION:
+                    # JSON solo tiene claves de texto: los índices origen se restauran a int
+                    for clave, mapeo in datos.get('entradas', []):
+                        self._entradas[clave] = {int(idx): col for idx, col in mapeo.items()}
+            except (OSError, ValueError, AttributeError, TypeError):
+                self._entradas = OrderedDict()
+        return self._entradas
+
+    def _guardar(self):
+        """Escritura atómica; si la carpeta no es escribible el cache queda solo en memoria"""
+        datos = {
+            'version': _VERSION,
+            'entradas': [[clave, mapeo] for clave, mapeo in self._entradas.items()],
+        }
+        try:
+            self.ruta.parent.mkdir(parents=True, exist_ok=True)
+            descriptor, temporal = tempfile.mkstemp(dir=self.ruta.parent, suffix='.tmp')
+            try:
+                with os.fdopen(descriptor, 'w', encoding='utf-8') as archivo:
+                    json.dump(datos, archivo)
+                os.replace(temporal, self.ruta)
+            except BaseException:
+                os.unlink(temporal)
+                raise
+        except OSError:
+            pass
+
+
+_cache_global = None
+
+
+def cache_mapeo_global():
+    """Cache compartido por todas las transformaciones del proceso"""
+    global _cache_global
+    if _cache_global is None:
+        _cache_global = CacheMapeo()
+    return _cache_global
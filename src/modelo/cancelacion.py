@@ -0,0 +1,53 @@
+# src/modelo/cancelacion.py
+"""
+Cancelación cooperativa de una transformación
+Las etapas consultan el token en sus límites de bloque (lote de filas, etapa, tramo del
+guardado); al cancelarlo o vencer su plazo la transformación termina con
+TransformacionCancelada en la siguiente comprobación.
+"""
+
+import time
+
+
+class TransformacionCancelada(Exception):
+    """La transformación se canceló o superó su tiempo límite"""
+
+
+class TokenCancelacion:
+    """Indica a una transformación en curso que debe detenerse
+
+    Args:
+        consultar: callable() -> bool que también cuenta como cancelación
+            (p. ej. una bandera compartida con otro proceso)
+        limite_segundos: tiempo máximo desde la creación del token (None: sin límite)
+    """
+
+    def __init__(self, consultar=None, limite_segundos=None):
+        self._consultar = consultar
+        self.limite_segundos = limite_segundos
+        self._vence = time.monotonic() + limite_segundos if limite_segundos else None
+        self.motivo = None
+
+    def cancelar(self, motivo="Transformación cancelada por el usuario"):
+        if self.motivo is None:
+            self.motivo = motivo
+
+    @property
+    def cancelado(self):
+        if self.motivo is None:
+            if self._consultar is not None and self._consultar():
+                self.cancelar()
+            elif self._vence is not None and time.monotonic() > self._vence:
+                self.cancelar(f"Tiempo límite de {self.limite_segundos} s superado")
+        return self.motivo is not None
+
+    def comprobar(self):
+        """Lanza TransformacionCancelada si corresponde detenerse"""
+        if self.cancelado:
+            raise TransformacionCancelada(self.motivo)
+
+
+def comprobar_cancelacion(cancelacion):
+    """Comprueba un token opcional (None no cancela nunca)"""
+    if cancelacion is not None:
+        cancelacion.comprobar()
@@ -0,0 +1,202 @@
+# src/modelo/descriptor_plantilla.py
+"""
+Descriptor precompilado de la hoja destino de una plantilla
+Reúne lo que antes cada etapa buscaba por su cuenta en los encabezados (fila 5):
+columnas especiales, totales, pie, EDAD y fórmulas de la fila 6. Se compila una vez
+por contenido del archivo (hash) y se guarda como JSON junto a la plantilla.
+"""
+
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from openpyxl.cell.cell import MergedCell
+
+from .cache_mapeo import carpeta_cache_usuario
+from .escritor_xml import HojaPorFilas
+from .pool_plantillas import hash_archivo
+
+
+_VERSION = 1
+_SUFIJO = '.descriptor.json'
+
+# Descriptores ya cargados: {(ruta, mtime, tamaño, hoja): DescriptorPlantilla}
+_descriptores = {}
+_MAX_DESCRIPTORES = 8
+
+# Columnas con total en la fila de totales (nombre -> variantes del encabezado)
+COLUMNAS_TOTALES = {
+    'MONTO CREDITO': ['MONTO CREDITO', 'MONTO CRÉDITO'],
+    'PLAZO DE CREDITO': ['PLAZO DE CREDITO', 'PLAZO DE CRÉDITO'],
+    'PRIMA NETA': ['PRIMA NETA'],
+    'HGR': ['HGR']
+}
+
+
+class DescriptorPlantilla:
+    """Datos fijos de la hoja destino de una plantilla (columnas base 1)"""
+
+    CAMPOS = (
+        'hoja',
+        'col_pais_residencia',
+        'col_numero_poliza',
+        'col_nombre_producto',
+        'col_monto_credito',
+        'columnas_totales',   # [(nombre, col)] en el orden en que aparecen
+        'col_prima_neta',     # PRIMA NETA / IMP / PRIMA TOTAL de la fila de totales
+        'col_imp',
+        'col_prima_total',
+        'col_prima_neta_pie', # PRIMA NETA y HGR de las fórmulas del pie
+        'col_hgr_pie',
+        'columnas_edad',      # columnas EDAD (sus fórmulas se redondean)
+        'formulas_fila6',     # {col: fórmula} de la fila 6 de la plantilla
+    )
+
+    def __init__(self, **valores):
+        for campo in self.CAMPOS:
+            setattr(self, campo, valores.get(campo))
+
+    @classmethod
+    def compilar(cls, ws):
+        """Recorre una vez los encabezados (fila 5) y la fila 6 de la hoja"""
+        headers = [cell.value for cell in ws[5]]
+        descriptor = cls(hoja=ws.title, columnas_totales=[], columnas_edad=set(), formulas_fila6={})
+
+        for col, valor in enumerate(headers, start=1):
+            if not valor:
+                continue
+            header_upper = str(valor).upper()
+            header_str = header_upper.strip()
+            header_str_limpio = ' '.join(header_str.split())
+
+            if descriptor.col_pais_residencia is None and 'PAIS DE RESIDENCIA' in header_upper:
+                descriptor.col_pais_residencia = col
+            if descriptor.col_numero_poliza is None and 'NUMERO' in header_upper and 'POLIZA' in header_upper:
+                descriptor.col_numero_poliza = col
+            if descriptor.col_nombre_producto is None and 'NOMBRE' in header_upper and 'PRODUCTO' in header_upper:
+                descriptor.col_nombre_producto = col
+            if descriptor.col_monto_credito is None and ('MONTO CREDITO' in header_str or 'MONTO CRÉDITO' in header_str):
+                descriptor.col_monto_credito = col
+            if 'EDAD' in header_upper:
+                descriptor.columnas_edad.add(col)
+
+            # Totales: cada encabezado se asigna a lo sumo a un total
+            encontrados = {nombre for nombre, _ in descriptor.columnas_totales}
+            for nombre, variantes in COLUMNAS_TOTALES.items():
+                if nombre not in encontrados and any(
+                    variante.upper() in header_str_limpio or header_str_limpio in variante.upper()
+                    for variante in variantes
+                ):
+                    descriptor.columnas_totales.append((nombre, col))
+                    break
+
+            if 'PRIMA NETA' in header_str_limpio and descriptor.col_prima_neta is None:
+                descriptor.col_prima_neta = col
+            elif 'IMP' in header_str_limpio and descriptor.col_imp is None:
+                descriptor.col_imp = col
+            elif 'PRIMA TOTAL' in header_str_limpio and descriptor.col_prima_total is None:
+                descriptor.col_prima_total = col
+
+            if 'PRIMA NETA' in header_str and descriptor.col_prima_neta_pie is None:
+                descriptor.col_prima_neta_pie = col
+            if 'HGR' in header_str and descriptor.col_hgr_pie is None:
+                descriptor.col_hgr_pie = col
+
+        # Fórmulas de la fila 6, leídas sin crear celdas en la hoja
+        for col in range(1, min(ws.max_column, 200) + 1):
+            if isinstance(ws, HojaPorFilas):
+                valor = None if ws.es_combinada(6, col) else ws.valor_actual({}, 6, col)
+                if isinstance(valor, str) and len(valor) > 1 and valor.startswith('='):
+                    descriptor.formulas_fila6[col] = valor
+            else:
+                cell = ws._cells.get((6, col))
+                if cell is not None and not isinstance(cell, MergedCell) and cell.data_type == 'f':
+                    descriptor.formulas_fila6[col] = str(cell.value)
+        return descriptor
+
+    def a_dict(self):
+        datos = {campo: getattr(self, campo) for campo in self.CAMPOS}
+        datos['columnas_edad'] = sorted(self.columnas_edad)
+        datos['formulas_fila6'] = {str(col): formula for col, formula in self.formulas_fila6.items()}
+        return datos
+
+    @classmethod
+    def desde_dict(cls, datos):
+        descriptor = cls(**datos)
+        descriptor.columnas_totales = [tuple(par) for par in datos['columnas_totales']]
+        descriptor.columnas_edad = set(datos['columnas_edad'])
+        descriptor.formulas_fila6 = {int(col): formula for col, formula in datos['formulas_fila6'].items()}
+        return descriptor
+
+
+def _rutas_sidecar(archivo_plantilla, hash_plantilla):
+    """Junto a la plantilla y, si esa carpeta no es escribible, en la cache del usuario"""
+    ruta = Path(archivo_plantilla)
+    return [
+        ruta.with_name(ruta.name + _SUFIJO),
+        carpeta_cache_usuario() / 'plantillas' / f'{hash_plantilla}{_SUFIJO}',
+    ]
+
+
+def _leer_sidecar(rutas, hash_plantilla):
+    for ruta in rutas:
+        try:
+            with open(ruta, encoding='utf-8') as archivo:
+                datos = json.load(archivo)
+        except (OSError, ValueError):
+            continue
+        if isinstance(datos, dict) and datos.get('version') == _VERSION and datos.get('hash') == hash_plantilla:
+            return datos
+    return None
+
+
+def _escribir_sidecar(rutas, datos):
+    """Escritura atómica en la primera ubicación escribible"""
+    for ruta in rutas:
+        try:
+            ruta.parent.mkdir(parents=True, exist_ok=True)
+            manejador, temporal = tempfile.mkstemp(dir=ruta.parent, suffix='.tmp')
+            try:
+                with os.fdopen(manejador, 'w', encoding='utf-8') as archivo:
+                    json.dump(datos, archivo, ensure_ascii=False, indent=1)
+                os.replace(temporal, ruta)
+            except BaseException:
+                os.unlink(temporal)
+                raise
+            return
+        except OSError:
+            continue
+
+
+def descriptor_plantilla(archivo_plantilla, ws):
+    """Descriptor de la hoja ws de la plantilla, recién abierta (antes de escribir datos)
+
+    Se busca en memoria, luego en el JSON junto a la plantilla (válido solo si el hash
+    del contenido coincide) y, si no está, se compila desde ws y se guarda.
+    """
+    if not archivo_plantilla:
+        return DescriptorPlantilla.compilar(ws)
+    try:
+        info = os.stat(archivo_plantilla)
+    except OSError:
+        return DescriptorPlantilla.compilar(ws)
+
+    clave = (os.path.abspath(archivo_plantilla), info.st_mtime_ns, info.st_size, ws.title)
+    if clave in _descriptores:
+        return _descriptores[clave]
+
+    hash_plantilla = hash_archivo(archivo_plantilla)
+    rutas = _rutas_sidecar(archivo_plantilla, hash_plantilla)
+    datos = _leer_sidecar(rutas, hash_plantilla) or {'version': _VERSION, 'hash': hash_plantilla, 'hojas': {}}
+    if ws.title in datos['hojas']:
+        descriptor = DescriptorPlantilla.desde_dict(datos['hojas'][ws.title])
+    else:
+        descriptor = DescriptorPlantilla.compilar(ws)
+        datos['hojas'][ws.title] = descriptor.a_dict()
+        _escribir_sidecar(rutas, datos)
+
+    if len(_descriptores) >= _MAX_DESCRIPTORES:
+        _descriptores.pop(next(iter(_descriptores), None), None)
+    _descriptores[clave] = descriptor
+    return descriptor
@@ -0,0 +1,352 @@
+# src/modelo/escritor_flujo.py
+"""
+Motor de escritura en modo write_only de openpyxl
+Las filas de datos nunca quedan como celdas en memoria: se acumulan en un archivo
+temporal y se vuelcan en orden, junto con la plantilla, sobre un Workbook(write_only=True)
+"""
+
+import pickle
+import tempfile
+from copy import copy
+
+from openpyxl import Workbook
+from openpyxl.cell.cell import MergedCell, WriteOnlyCell, ERROR_CODES, TIME_TYPES
+from openpyxl.styles.cell_style import StyleArray
+from openpyxl.styles.numbers import BUILTIN_FORMATS_MAX_SIZE, BUILTIN_FORMATS_REVERSE
+from openpyxl.utils.cell import coordinate_from_string, column_index_from_string
+
+from .cancelacion import comprobar_cancelacion
+from .escritor_xml import HojaPorFilas, CeldaXml
+from .formulas_compartidas import compartir_formulas, formulas_compartidas
+from .pool_plantillas import pool_plantillas
+from .valores_cacheados import SIN_VALOR, escritura_con_valores, valores_cacheados
+
+
+# Filas de datos que se acumulan antes de volcarlas al archivo temporal
+_FILAS_POR_ESCRITURA = 500
+
+# Filas que se agregan al libro de salida entre dos comprobaciones de cancelación
+_FILAS_POR_COMPROBACION = 2000
+
+# Tablas de estilo del libro que comparten la plantilla y el libro de salida
+_TABLAS_ESTILO = (
+    '_fonts', '_fills', '_borders', '_alignments', '_protections', '_number_formats',
+    '_cell_styles', '_named_styles', '_differential_styles', '_table_styles', '_colors',
+)
+
+# Atributos de hoja que se trasladan a la hoja write_only
+_ATRIBUTOS_HOJA = (
+    'sheet_properties', 'sheet_format', 'views', 'page_setup', 'print_options', 'page_margins',
+    'protection', 'HeaderFooter', 'auto_filter', 'conditional_formatting', 'data_validations',
+    'row_breaks', 'col_breaks', 'scenarios', 'defined_names', 'sheet_state',
+    '_print_area', '_print_rows', '_print_cols', '_images', '_charts', '_tables',
+)
+
+
+def _tipo_dato(valor):
+    """data_type que openpyxl asignaría al valor (ya validado)"""
+    if isinstance(valor, str):
+        if len(valor) > 1 and valor.startswith('='):
+            return 'f'
+        return 'e' if valor in ERROR_CODES else 's'
+    if isinstance(valor, bool):
+        return 'b'
+    if isinstance(valor, TIME_TYPES):
+        return 'd'
+    return 'n'
+
+
+class HojaFlujo(HojaPorFilas):
+    """Hoja destino en modo write_only
+
+    Encabezados, totales y pie quedan en la hoja openpyxl de la plantilla (acceso
+    aleatorio); las filas de datos se emiten con escribir_fila a un archivo temporal.
+    """
+
+    def __init__(self, libro, ws):
+        self._iniciar_filas()
+        self.parent = libro
+        self.hoja = ws
+        self.title = ws.title
+        self._datos = None
+        self._pendientes = []
+        self._max_columna_datos = 0
+        for rango in ws.merged_cells.ranges:
+            for fila, col in rango.cells:
+                if fila != rango.min_row or col != rango.min_col:
+                    self._combinadas.add((fila, col))
+        # Columnas de la plantilla por fila, para no recorrer ws._cells en cada fila de datos
+        self._columnas_plantilla = {}
+        for fila, col in ws._cells:
+            self._columnas_plantilla.setdefault(fila, []).append(col)
+        self._estilos_derivados = {}
+
+    # ===== Interfaz compatible con openpyxl =====
+
+    @property
+    def column_dimensions(self):
+        return self.hoja.column_dimensions
+
+    @property
+    def row_dimensions(self):
+        return self.hoja.row_dimensions
+
+    @property
+    def merged_cells(self):
+        return self.hoja.merged_cells
+
+    @property
+    def max_row(self):
+        return max(self.hoja.max_row, self._ultima_fila_datos or 0)
+
+    @property
+    def max_column(self):
+        return max(self.hoja.max_column, self._max_columna_datos)
+
+    def cell(self, row, column):
+        """Celda de la plantilla; las filas ya emitidas son de solo lectura"""
+        if self._es_fila_escrita(row):
+            if (row, column) in self._combinadas:
+                return MergedCell(self.hoja, row, column)
+            valor = self._capturas.get(column, {}).get(row)
+            return CeldaXml(self, row, column, valor, solo_lectura=True)
+        return self.hoja.cell(row, column)
+
+    def __getitem__(self, clave):
+        if isinstance(clave, int):
+            return tuple(self.cell(clave, col) for col in range(1, self.max_column + 1))
+        letra, fila = coordinate_from_string(clave)
+        return self.cell(fila, column_index_from_string(letra))
+
+    def __setitem__(self, clave, valor):
+        self[clave].value = valor
+
+    # ===== Escritura por filas =====
+
+    def celdas_existentes(self, fila_inicio, fila_fin):
+        """Celdas de la plantilla entre dos filas (las filas emitidas ya no están en la hoja)"""
+        return [celda for (fila, _), celda in self.hoja._cells.items() if fila_inicio <= fila <= fila_fin]
+
+    def formato_plantilla(self, fila, col):
+        celda = self.hoja._cells.get((fila, col))
+        return celda.number_format if celda is not None else 'General'
+
+    def valor_actual(self, celdas, fila, col):
+        """Valor vigente de (fila, col) durante la escritura de la fila"""
+        if col in celdas:
+            return celdas[col][0]
+        celda = self.hoja._cells.get((fila, col))
+        return celda.value if celda is not None else None
+
+    def _estilo_con_formato(self, estilo, formato):
+        """Tupla StyleArray de `estilo` con el formato numérico indicado"""
+        clave = (estilo, formato)
+        if clave not in self._estilos_derivados:
+            nuevo = StyleArray(estilo) if estilo is not None else StyleArray()
+            if formato in BUILTIN_FORMATS_REVERSE:
+                nuevo.numFmtId = BUILTIN_FORMATS_REVERSE[formato]
+            else:
+                nuevo.numFmtId = self.hoja.parent._number_formats.add(formato) + BUILTIN_FORMATS_MAX_SIZE
+            self._estilos_derivados[clave] = tuple(nuevo)
+        return self._estilos_derivados[clave]
+
+    def escribir_fila(self, fila, celdas, calculados=None):
+        """Combina la fila con la de la plantilla y la deja en el archivo temporal
+
+        Args:
+            fila: número de fila (las filas se escriben en orden creciente)
+            celdas: {col: (valor, formato)}; formato None conserva el de la plantilla
+            calculados: {col: valor calculado} de las celdas de la fila que quedan con fórmula
+        """
+        calculados = calculados or {}
+        if self._datos is None:
+            self._datos = tempfile.TemporaryFile()
+        self._registrar_fila(fila)
+
+        # Las celdas de la plantilla en esta fila salen del modelo de objetos
+        plantilla = {}
+        for col in self._columnas_plantilla.pop(fila, ()):
+            celda = self.hoja._cells.pop((fila, col), None)
+            if celda is not None:
+                plantilla[col] = celda
+
+        salida = []
+        for col in sorted(set(plantilla) | set(celdas)):
+            celda = plantilla.get(col)
+            estilo = tuple(celda._style) if celda is not None and celda.has_style else None
+            if col in celdas:
+                valor, formato = celdas[col]
+                tipo = _tipo_dato(valor)
+                if formato is not None:
+                    estilo = self._estilo_con_formato(estilo, formato)
+            else:
+                valor, tipo = celda.value, celda.data_type
+            # None: sin valor calculado (los calculados nunca son None)
+            calculado = calculados.get(col, SIN_VALOR) if tipo == 'f' else SIN_VALOR
+            salida.append((col, valor, tipo, estilo, None if calculado is SIN_VALOR else calculado))
+            self._capturar(fila, col, valor)
+
+        if celdas:
+            self._max_columna_datos = max(self._max_columna_datos, max(celdas))
+        self._pendientes.append((fila, salida))
+        if len(self._pendientes) >= _FILAS_POR_ESCRITURA:
+            self._volcar()
+
+    def _volcar(self):
+        if self._pendientes:
+            pickle.dump(self._pendientes, self._datos, protocol=pickle.HIGHEST_PROTOCOL)
+            self._pendientes = []
+
+    def filas_datos(self):
+        """Genera (fila, [(col, valor, tipo, estilo, calculado)]) en orden desde el archivo temporal"""
+        if self._datos is None:
+            return
+        self._volcar()
+        self._datos.seek(0)
+        while True:
+            try:
+                bloque = pickle.load(self._datos)
+            except EOFError:
+                break
+            yield from bloque
+
+    def cerrar(self):
+        if self._datos is not None:
+            self._datos.close()
+            self._datos = None
+
+
+class LibroFlujo:
+    """Libro de salida en modo write_only construido sobre la plantilla"""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.plantilla = pool_plantillas().obtener(ruta)
+        self._hojas = {}
+
+    @property
+    def sheetnames(self):
+        return self.plantilla.sheetnames
+
+    @property
+    def worksheets(self):
+        return [self[nombre] for nombre in self.sheetnames]
+
+    def __getitem__(self, nombre):
+        if nombre not in self._hojas:
+            self._hojas[nombre] = HojaFlujo(self, self.plantilla[nombre])
+        return self._hojas[nombre]
+
+    def remove(self, hoja):
+        hoja = self._hojas.pop(hoja.title, hoja)
+        if isinstance(hoja, HojaFlujo):
+            hoja.cerrar()
+            hoja = hoja.hoja
+        self.plantilla.remove(hoja)
+
+    def create_sheet(self, titulo):
+        """Hojas nuevas (p. ej. Hoja2) son hojas openpyxl normales: se copian al guardar"""
+        return self.plantilla.create_sheet(titulo)
+
+    def close(self):
+        for hoja in self._hojas.values():
+            hoja.cerrar()
+
+    def save(self, ruta, cancelacion=None):
+        """Vuelca todas las hojas en orden sobre un Workbook(write_only=True)"""
+        salida = Workbook(write_only=True)
+        for atributo in _TABLAS_ESTILO:
+            setattr(salida, atributo, getattr(self.plantilla, atributo))
+        for atributo in ('properties', 'defined_names', 'views', 'security',
+                         'epoch', 'loaded_theme', 'code_name', '_date_formats', '_active_sheet_index'):
+            setattr(salida, atributo, getattr(self.plantilla, atributo))
+        salida.calculation = copy(self.plantilla.calculation)
+
+        # Las filas se escriben al agregarlas: el guardado abarca también la copia de las hojas
+        with escritura_con_valores(salida, cancelacion):
+            for ws in self.plantilla.worksheets:
+                destino = salida.create_sheet(ws.title)
+                self._copiar_propiedades(ws, destino)
+                hoja = self._hojas.get(ws.title)
+                if isinstance(hoja, HojaFlujo):
+                    compartir_formulas(destino, formulas_compartidas(hoja))
+                self._escribir_filas(ws, destino, hoja, cancelacion)
+            comprobar_cancelacion(cancelacion)
+            salida.save(ruta)
+
+    @staticmethod
+    def _copiar_propiedades(ws, destino):
+        for atributo in _ATRIBUTOS_HOJA:
+            if hasattr(ws, atributo):
+                setattr(destino, atributo, copy(getattr(ws, atributo)))
+        destino.merged_cells = copy(ws.merged_cells)
+        # Valores calculados de las fórmulas (totales, pie): los emite el write_cell del libro
+        destino._valores_cacheados = valores_cacheados(ws)
+        for atributo in ('row_dimensions', 'column_dimensions'):
+            origen = getattr(ws, atributo)
+            dimensiones = getattr(destino, atributo)
+            for clave, dimension in origen.items():
+                dimensiones[clave] = copy(dimension)
+                dimensiones[clave].parent = destino
+
+    def _escribir_filas(self, ws, destino, hoja, cancelacion=None):
+        """Agrega en orden las filas de la plantilla y, si corresponde, las de datos"""
+        por_fila = {}
+        for (fila, col), celda in ws._cells.items():
+            if isinstance(hoja, HojaFlujo) and hoja._es_fila_escrita(fila):
+                continue
+            por_fila.setdefault(fila, {})[col] = celda
+        filas_plantilla = sorted(por_fila)
+
+        def filas_ordenadas():
+            datos = hoja.filas_datos() if isinstance(hoja, HojaFlujo) else iter(())
+            pendiente = next(datos, None)
+            for fila in filas_plantilla:
+                while pendiente is not None and pendiente[0] < fila:
+                    yield pendiente[0], self._celdas_datos(destino, *pendiente)
+                    pendiente = next(datos, None)
+                yield fila, por_fila[fila]
+            while pendiente is not None:
+                yield pendiente[0], self._celdas_datos(destino, *pendiente)
+                pendiente = next(datos, None)
+
+        cacheados = valores_cacheados(destino)
+        actual = 0
+        for n, (fila, celdas) in enumerate(filas_ordenadas()):
+            if n % _FILAS_POR_COMPROBACION == 0:
+                comprobar_cancelacion(cancelacion)
+            # write_only numera las filas de forma consecutiva: los huecos van como filas vacías
+            while actual < fila - 1:
+                destino.append([])
+                actual += 1
+            fila_salida = [None] * max(celdas)
+            for col, celda in celdas.items():
+                if isinstance(celda, MergedCell):
+                    # write_only solo acepta Cell: las combinadas pasan únicamente su estilo
+                    if not celda.has_style:
+                        continue
+                    estilo = celda._style
+                    celda = WriteOnlyCell(destino)
+                    celda._style = copy(estilo)
+                fila_salida[col - 1] = celda
+            destino.append(fila_salida)
+            actual += 1
+            # append ya escribió la fila: sus valores calculados no se vuelven a necesitar
+            if cacheados:
+                for col in celdas:
+                    cacheados.pop((fila, col), None)
+
+    @staticmethod
+    def _celdas_datos(destino, fila, salida):
+        # Los valores ya se validaron al asignarlos: se evita volver a convertirlos
+        celdas = {}
+        for col, valor, tipo, estilo, calculado in salida:
+            celda = WriteOnlyCell(destino)
+            celda._value = valor
+            celda.data_type = tipo
+            if estilo is not None:
+                celda._style = StyleArray(estilo)
+            if calculado is not None:
+                destino._valores_cacheados[(fila, col)] = calculado
+            celdas[col] = celda
+        return celdas
@@ -0,0 +1,1230 @@
+# src/modelo/escritor_xml.py
+"""
+Motor de escritura directa sobre el paquete de la plantilla (5852/5924)
+Las partes no tocadas del zip se copian tal cual y la hoja destino se emite como XML,
+sin mantener las filas de datos como objetos de openpyxl
+"""
+
+import os
+import posixpath
+import re
+import tempfile
+import zipfile
+from datetime import datetime, date, time, timedelta
+from functools import lru_cache
+from xml.etree.ElementTree import fromstring, iterparse
+from xml.sax.saxutils import escape, quoteattr, unescape
+
+from openpyxl.cell.cell import MergedCell, ERROR_CODES, ILLEGAL_CHARACTERS_RE, TIME_FORMATS
+from openpyxl.compat.strings import safe_string
+from openpyxl.formula.translate import Translator
+from openpyxl.styles.borders import Border
+from openpyxl.styles.cell_style import CellStyle
+from openpyxl.styles.fills import Fill
+from openpyxl.styles.fonts import Font
+from openpyxl.styles.numbers import BUILTIN_FORMATS, BUILTIN_FORMATS_REVERSE, is_date_format
+from openpyxl.utils import get_column_letter
+from openpyxl.utils.cell import coordinate_from_string, column_index_from_string, range_boundaries
+from openpyxl.utils.datetime import to_excel, WINDOWS_EPOCH, CALENDAR_MAC_1904
+from openpyxl.workbook import Workbook
+from openpyxl.xml.functions import tostring
+
+from ..config import CONFIG_SISTEMA
+from .cancelacion import TransformacionCancelada, comprobar_cancelacion
+from .lector_xml import NS_MAIN, NS_REL, _ruta_relacion, _leer_relaciones, _indice_columna
+from .formulas_compartidas import formulas_compartidas
+from .pool_plantillas import pool_plantillas
+from .valores_cacheados import SIN_VALOR, escritura_con_valores, valor_xml, valores_cacheados
+
+
+TIPO_HOJA = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet'
+TIPO_CALC_CHAIN = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/calcChain'
+CONTENIDO_HOJA = 'application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml'
+
+_ATRIBUTO = re.compile(r'([\w:.-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+_ENTIDADES = {'&quot;': '"', '&apos;': "'"}
+
+# Filas de datos que se acumulan antes de volcarlas al archivo temporal
+_FILAS_POR_ESCRITURA = 500
+
+# Bytes de filas de datos que se copian al zip entre dos comprobaciones de cancelación
+_BYTES_POR_COPIA = 1 << 20
+
+# Espacio reservado en la celda maestra de cada fórmula compartida para su ref="...";
+# el rango se conoce al terminar la escritura y se completa en el archivo temporal
+_RESERVA_REF = ' ' * len(' ref="XFD1048576:XFD1048576"')
+
+_SIN_CAMBIO = object()
+
+# Pocos formatos distintos por libro: se evita repetir la expresión regular en cada celda
+_es_formato_fecha = lru_cache(maxsize=None)(is_date_format)
+
+
+def abrir_plantilla(ruta, motor=None):
+    """Abre la plantilla según CONFIG_SISTEMA['ESCRITURA']['motor'] ('openpyxl', 'write_only' o 'xml')"""
+    if motor is None:
+        motor = CONFIG_SISTEMA.get('ESCRITURA', {}).get('motor', 'openpyxl')
+    if motor == 'xml':
+        return LibroXml(ruta)
+    if motor == 'write_only':
+        from .escritor_flujo import LibroFlujo
+        return LibroFlujo(ruta)
+    # Copia de la plantilla ya cargada en el pool (se carga aquí si aún no está)
+    return pool_plantillas().obtener(ruta)
+
+
+def guardar_libro(wb, ruta, cancelacion=None):
+    """Guarda un libro abierto con abrir_plantilla comprobando la cancelación
+
+    LibroXml y LibroFlujo la comprueban por tramos; el Workbook de openpyxl, cada tanto
+    de celdas escritas (escritura_con_valores). Si se cancela se borra el archivo a medias.
+    """
+    comprobar_cancelacion(cancelacion)
+    cancelada = None
+    try:
+        if isinstance(wb, Workbook):
+            with escritura_con_valores(wb, cancelacion):
+                wb.save(ruta)
+        else:
+            wb.save(ruta, cancelacion)
+    except TransformacionCancelada as e:
+        cancelada = TransformacionCancelada(*e.args)
+    # Fuera del except: sin el traceback se libera (y cierra) el zip que openpyxl dejó abierto
+    if cancelada is not None:
+        if os.path.exists(ruta):
+            os.remove(ruta)
+        raise cancelada
+
+
+def _atributos(texto):
+    """Convierte 'a="1" b="2"' en {'a': '1', 'b': '2'} (valores sin escapar)"""
+    return {m.group(1): unescape(m.group(2) if m.group(2) is not None else m.group(3), _ENTIDADES)
+            for m in _ATRIBUTO.finditer(texto)}
+
+
+def _prefijo(texto, raiz):
+    """Prefijo de espacio de nombres del elemento raíz ('' o 'x:')"""
+    m = re.search(rf'<([\w.-]+:)?{raiz}\b', texto)
+    return (m.group(1) or '') if m else ''
+
+
+def _xml_celda(ref, valor, estilo, calculado=SIN_VALOR, compartida=None):
+    """Serializa una celda igual que openpyxl (inlineStr); las fórmulas llevan el valor calculado si se conoce
+
+    compartida: (si, atributos de la maestra o None) para escribir la fórmula como compartida
+    """
+    s = f' s="{estilo}"' if estilo else ''
+    if valor is None or valor == '':
+        if valor is None and not estilo:
+            return ''
+        return f'<c r="{ref}"{s}/>'
+    if isinstance(valor, bool):
+        return f'<c r="{ref}"{s} t="b"><v>{int(valor)}</v></c>'
+    if isinstance(valor, (int, float)):
+        return f'<c r="{ref}"{s} t="n"><v>{safe_string(valor)}</v></c>'
+    if isinstance(valor, str):
+        if len(valor) > 1 and valor.startswith('='):
+            if compartida is None:
+                f = f'<f>{escape(valor[1:])}</f>'
+            elif compartida[1] is None:
+                f = f'<f t="shared" si="{compartida[0]}"/>'
+            else:
+                f = f'<f t="shared" si="{compartida[0]}"{compartida[1]}>{escape(valor[1:])}</f>'
+            if calculado is SIN_VALOR:
+                return f'<c r="{ref}"{s}>{f}<v></v></c>'
+            tipo, texto = valor_xml(calculado)
+            t = f' t="{tipo}"' if tipo else ''
+            return f'<c r="{ref}"{s}{t}>{f}<v>{escape(texto)}</v></c>'
+        if valor in ERROR_CODES:
+            return f'<c r="{ref}"{s} t="e"><v>{valor}</v></c>'
+        espacio = ' xml:space="preserve"' if valor != valor.strip() else ''
+        return f'<c r="{ref}"{s} t="inlineStr"><is><t{espacio}>{escape(valor)}</t></is></c>'
+    if isinstance(valor, (datetime, date, time, timedelta)):
+        return f'<c r="{ref}"{s} t="n"><v>{safe_string(to_excel(valor))}</v></c>'
+    return f'<c r="{ref}"{s} t="inlineStr"><is><t>{escape(str(valor))}</t></is></c>'
+
+
+def _celda_sin_valor(xml, p=''):
+    """True si el XML de una celda tiene fórmula pero no valor calculado"""
+    return f'<{p}f' in xml and (f'<{p}v>' not in xml or f'<{p}v></{p}v>' in xml)
+
+
+def _hoja_con_formulas_sin_valor(contenido):
+    """True si alguna celda de una hoja sin modificar (XML en bytes) tiene fórmula sin valor"""
+    texto = contenido.decode('utf-8')
+    p = _prefijo(texto, 'worksheet')
+    return any(
+        _celda_sin_valor(m.group(0), p)
+        for m in re.finditer(rf'<{p}c\b[^>]*?(?:/>|>.*?</{p}c>)', texto, re.S)
+    )
+
+
+def _normalizar_valor(valor):
+    """Aplica las mismas validaciones que openpyxl al asignar un valor a una celda"""
+    if isinstance(valor, str):
+        valor = valor[:32767]
+        if next(ILLEGAL_CHARACTERS_RE.finditer(valor), None):
+            raise ValueError(f"{valor} cannot be used in worksheets.")
+    elif valor is not None and not isinstance(valor, (bool, int, float, datetime, date, time, timedelta)):
+        raise ValueError("Cannot convert {0!r} to Excel".format(valor))
+    return valor
+
+
+class EstilosXml:
+    """Registro de estilos sobre xl/styles.xml de la plantilla
+
+    Los estilos existentes no se tocan; los nuevos (formatos, fuentes, rellenos,
+    bordes y xf) se agregan al final de cada sección.
+    """
+
+    def __init__(self, contenido):
+        self._texto = contenido.decode('utf-8')
+        self._p = _prefijo(self._texto, 'styleSheet')
+        raiz = fromstring(contenido)
+
+        def seccion(nombre):
+            nodo = raiz.find(f'{{{NS_MAIN}}}{nombre}')
+            return list(nodo) if nodo is not None else []
+
+        self._formatos = {int(el.get('numFmtId')): el.get('formatCode') for el in seccion('numFmts')}
+        self._fuentes = [Font.from_tree(el) for el in seccion('fonts')]
+        self._rellenos = [Fill.from_tree(el) for el in seccion('fills')]
+        self._bordes = [Border.from_tree(el) for el in seccion('borders')]
+        self._xfs = [CellStyle.from_tree(el) for el in seccion('cellXfs')] or [CellStyle()]
+
+        self._indices = {
+            'fonts': self._indexar(self._fuentes),
+            'fills': self._indexar(self._rellenos),
+            'borders': self._indexar(self._bordes),
+        }
+        self._indice_xfs = {}
+        for idx, xf in enumerate(self._xfs):
+            self._indice_xfs.setdefault(self._clave(xf), idx)
+        self._derivados = {}
+        self._nuevos = {'numFmts': [], 'fonts': [], 'fills': [], 'borders': [], 'cellXfs': []}
+
+    @staticmethod
+    def _indexar(lista):
+        indice = {}
+        for idx, obj in enumerate(lista):
+            try:
+                indice.setdefault(obj, idx)
+            except TypeError:
+                pass
+        return indice
+
+    @staticmethod
+    def _clave(xf):
+        return (xf.numFmtId, xf.fontId, xf.fillId, xf.borderId, xf.xfId,
+                xf.quotePrefix, xf.pivotButton, xf.alignment, xf.protection)
+
+    @property
+    def modificado(self):
+        return any(self._nuevos.values())
+
+    # ===== Consulta =====
+
+    def formato(self, id_xf):
+        """Código de formato numérico de un xf"""
+        id_fmt = self._xfs[id_xf].numFmtId or 0
+        return self._formatos.get(id_fmt, BUILTIN_FORMATS.get(id_fmt, 'General'))
+
+    def fuente(self, id_xf):
+        return self._fuentes[self._xfs[id_xf].fontId or 0]
+
+    def relleno(self, id_xf):
+        return self._rellenos[self._xfs[id_xf].fillId or 0]
+
+    def borde(self, id_xf):
+        return self._bordes[self._xfs[id_xf].borderId or 0]
+
+    def alineacion(self, id_xf):
+        return self._xfs[id_xf].alignment
+
+    # ===== Registro =====
+
+    def _registrar(self, seccion, lista, obj):
+        """Índice del objeto en su sección (lo agrega si no existe)"""
+        indice = self._indices[seccion]
+        if obj in indice:
+            return indice[obj]
+        lista.append(obj)
+        indice[obj] = len(lista) - 1
+        xml = '<border/>' if obj is None else tostring(obj.to_tree()).decode('utf-8')
+        self._nuevos[seccion].append(xml)
+        return indice[obj]
+
+    def _id_formato(self, codigo):
+        if codigo in BUILTIN_FORMATS_REVERSE:
+            return BUILTIN_FORMATS_REVERSE[codigo]
+        for id_fmt, existente in self._formatos.items():
+            if existente == codigo:
+                return id_fmt
+        id_fmt = max([163] + list(self._formatos)) + 1
+        self._formatos[id_fmt] = codigo
+        self._nuevos['numFmts'].append(f'<numFmt numFmtId="{id_fmt}" formatCode={quoteattr(codigo)}/>')
+        return id_fmt
+
+    def derivar(self, id_xf, number_format=_SIN_CAMBIO, font=_SIN_CAMBIO, fill=_SIN_CAMBIO,
+                border=_SIN_CAMBIO, alignment=_SIN_CAMBIO):
+        """Id del xf resultante de cambiar un atributo de estilo sobre id_xf"""
+        clave_memo = (id_xf, number_format if number_format is not _SIN_CAMBIO else None,
+                      id(font), id(fill), id(border), id(alignment))
+        if clave_memo in self._derivados:
+            return self._derivados[clave_memo][0]
+
+        base = self._xfs[id_xf]
+        xf = CellStyle(
+            numFmtId=base.numFmtId, fontId=base.fontId, fillId=base.fillId, borderId=base.borderId,
+            xfId=base.xfId, quotePrefix=base.quotePrefix, pivotButton=base.pivotButton,
+            alignment=base.alignment, protection=base.protection,
+        )
+        if number_format is not _SIN_CAMBIO:
+            xf.numFmtId = self._id_formato(number_format)
+        if font is not _SIN_CAMBIO:
+            xf.fontId = self._registrar('fonts', self._fuentes, font)
+        if fill is not _SIN_CAMBIO:
+            xf.fillId = self._registrar('fills', self._rellenos, fill)
+        if border is not _SIN_CAMBIO:
+            xf.borderId = self._registrar('borders', self._bordes, border)
+        if alignment is not _SIN_CAMBIO:
+            xf.alignment = alignment
+
+        clave = self._clave(xf)
+        if clave not in self._indice_xfs:
+            xf.applyNumberFormat = bool(xf.numFmtId) or None
+            xf.applyFont = bool(xf.fontId) or None
+            xf.applyFill = bool(xf.fillId) or None
+            xf.applyBorder = bool(xf.borderId) or None
+            self._xfs.append(xf)
+            self._indice_xfs[clave] = len(self._xfs) - 1
+            self._nuevos['cellXfs'].append(tostring(xf.to_tree()).decode('utf-8'))
+        # Se guardan los objetos para que sus id() no se reutilicen mientras viva el memo
+        self._derivados[clave_memo] = (self._indice_xfs[clave], font, fill, border, alignment)
+        return self._indice_xfs[clave]
+
+    # ===== Serialización =====
+
+    def contenido(self):
+        """styles.xml de la plantilla con los estilos nuevos agregados al final de cada sección"""
+        texto = self._texto
+        p = self._p
+        for seccion in ('fonts', 'fills', 'borders', 'cellXfs', 'numFmts'):
+            nuevos = self._nuevos[seccion]
+            if not nuevos:
+                continue
+            fragmento = ''.join(nuevos)
+            if p:
+                fragmento = re.sub(r'<(\w+)', rf'<{p}\1', fragmento)
+            m = re.search(rf'<{p}{seccion}\b([^>]*?)(/?)>', texto)
+            if m is None:
+                # numFmts es el primer hijo de styleSheet
+                raiz = re.search(rf'<{p}styleSheet\b[^>]*>', texto)
+                bloque = f'<{p}{seccion} count="{len(nuevos)}">{fragmento}</{p}{seccion}>'
+                texto = texto[:raiz.end()] + bloque + texto[raiz.end():]
+                continue
+            atributos = re.sub(r'\s*count\s*=\s*"[^"]*"', '', m.group(1))
+            total = self._total(seccion)
+            apertura = f'<{p}{seccion}{atributos} count="{total}">'
+            if m.group(2):
+                texto = texto[:m.start()] + apertura + fragmento + f'</{p}{seccion}>' + texto[m.end():]
+            else:
+                cierre = texto.index(f'</{p}{seccion}>', m.end())
+                texto = texto[:m.start()] + apertura + texto[m.end():cierre] + fragmento + texto[cierre:]
+        return texto.encode('utf-8')
+
+    def _total(self, seccion):
+        return {
+            'numFmts': len(self._formatos),
+            'fonts': len(self._fuentes),
+            'fills': len(self._rellenos),
+            'borders': len(self._bordes),
+            'cellXfs': len(self._xfs),
+        }[seccion]
+
+
+class _CeldaPlantilla:
+    """Celda tal como viene en la hoja de la plantilla"""
+
+    __slots__ = ('estilo', 'formula', 'atributos_formula', 'valor', 'xml')
+
+    def __init__(self, estilo, formula, atributos_formula, valor, xml):
+        self.estilo = estilo
+        self.formula = formula
+        self.atributos_formula = atributos_formula
+        self.valor = valor
+        self.xml = xml
+
+
+class DimensionColumna:
+    """Ancho de columna modificado (equivalente mínimo de ColumnDimension)"""
+
+    def __init__(self):
+        self.width = None
+
+
+class _Dimensiones(dict):
+    def __missing__(self, letra):
+        dimension = self[letra] = DimensionColumna()
+        return dimension
+
+
+class CeldaXml:
+    """Celda editable de la hoja fuera del bloque de datos (totales, pie, Hoja2)"""
+
+    __slots__ = ('parent', 'row', 'column', '_value', '_estilo', '_modificada', '_solo_lectura')
+
+    def __init__(self, hoja, row, column, valor=None, estilo=0, solo_lectura=False):
+        self.parent = hoja
+        self.row = row
+        self.column = column
+        self._value = valor
+        self._estilo = estilo
+        self._modificada = False
+        self._solo_lectura = solo_lectura
+
+    def __repr__(self):
+        return f"<CeldaXml {self.parent.title!r}.{self.coordinate}>"
+
+    @property
+    def coordinate(self):
+        return f"{get_column_letter(self.column)}{self.row}"
+
+    @property
+    def has_style(self):
+        return bool(self._estilo)
+
+    @property
+    def data_type(self):
+        valor = self._value
+        if isinstance(valor, str):
+            return 'f' if len(valor) > 1 and valor.startswith('=') else 's'
+        return 'n'
+
+    def _modificar(self):
+        if self._solo_lectura:
+            raise ValueError(f"La fila {self.row} ya fue escrita en el archivo")
+        self._modificada = True
+
+    def _derivar(self, **cambio):
+        self._modificar()
+        self._estilo = self.parent.parent.estilos.derivar(self._estilo, **cambio)
+
+    @property
+    def value(self):
+        return self._value
+
+    @value.setter
+    def value(self, valor):
+        valor = _normalizar_valor(valor)
+        self._modificar()
+        if isinstance(valor, (datetime, date, time, timedelta)) and not _es_formato_fecha(self.number_format):
+            self._derivar(number_format=TIME_FORMATS[type(valor)])
+        self._value = valor
+
+    @property
+    def number_format(self):
+        return self.parent.parent.estilos.formato(self._estilo)
+
+    @number_format.setter
+    def number_format(self, codigo):
+        self._derivar(number_format=codigo)
+
+    @property
+    def font(self):
+        return self.parent.parent.estilos.fuente(self._estilo)
+
+    @font.setter
+    def font(self, fuente):
+        self._derivar(font=fuente)
+
+    @property
+    def fill(self):
+        return self.parent.parent.estilos.relleno(self._estilo)
+
+    @fill.setter
+    def fill(self, relleno):
+        self._derivar(fill=relleno)
+
+    @property
+    def border(self):
+        return self.parent.parent.estilos.borde(self._estilo)
+
+    @border.setter
+    def border(self, borde):
+        self._derivar(border=borde)
+
+    @property
+    def alignment(self):
+        return self.parent.parent.estilos.alineacion(self._estilo)
+
+    @alignment.setter
+    def alignment(self, alineacion):
+        self._derivar(alignment=alineacion)
+
+
+class HojaPorFilas:
+    """Base de las hojas destino que reciben cada fila de datos ya armada
+
+    TransferenciaDatos arma {col: (valor, formato)} con asignar/valor_actual y
+    la entrega completa a escribir_fila; las subclases deciden cómo emitirla.
+    """
+
+    def _iniciar_filas(self):
+        self._combinadas = set()
+        self._capturas = {}
+        self._primera_fila_datos = None
+        self._ultima_fila_datos = None
+
+    def es_combinada(self, fila, col):
+        return (fila, col) in self._combinadas
+
+    def _es_fila_escrita(self, fila):
+        return self._primera_fila_datos is not None and self._primera_fila_datos <= fila <= self._ultima_fila_datos
+
+    def capturar_columna(self, columna):
+        """Conserva en memoria los valores escritos de una columna (p. ej. para Hoja2)"""
+        if columna:
+            self._capturas.setdefault(columna, {})
+
+    def _registrar_fila(self, fila):
+        if self._primera_fila_datos is None:
+            self._primera_fila_datos = fila
+        self._ultima_fila_datos = fila
+
+    def _capturar(self, fila, col, valor):
+        if col in self._capturas:
+            self._capturas[col][fila] = valor
+
+    def asignar(self, celdas, fila, col, valor, formato=None):
+        """Registra en celdas {col: (valor, formato)} una asignación con la semántica de openpyxl"""
+        valor = _normalizar_valor(valor)
+        anterior = celdas.get(col)
+        formato_actual = anterior[1] if anterior is not None else None
+        if isinstance(valor, (datetime, date, time, timedelta)):
+            vigente = formato_actual if formato_actual is not None else self.formato_plantilla(fila, col)
+            if not _es_formato_fecha(vigente):
+                formato_actual = TIME_FORMATS[type(valor)]
+        celdas[col] = (valor, formato if formato is not None else formato_actual)
+
+    def celdas_existentes(self, fila_inicio, fila_fin):
+        raise NotImplementedError
+
+    def formato_plantilla(self, fila, col):
+        raise NotImplementedError
+
+    def valor_actual(self, celdas, fila, col):
+        raise NotImplementedError
+
+    def escribir_fila(self, fila, celdas, calculados=None):
+        raise NotImplementedError
+
+
+class HojaXml(HojaPorFilas):
+    """Hoja del paquete con interfaz mínima compatible con openpyxl
+
+    Las filas de datos se emiten directamente como XML a un archivo temporal
+    (escribir_fila); el resto de celdas (encabezados, totales, pie) se modela
+    de forma dispersa con CeldaXml.
+    """
+
+    def __init__(self, libro, titulo, ruta_parte, contenido=None):
+        self.parent = libro
+        self.title = titulo
+        self.ruta_parte = ruta_parte
+        self.column_dimensions = _Dimensiones()
+        self._modificada = contenido is None
+        self._iniciar_filas()
+        self._filas_plantilla = {}
+        self._celdas = {}
+        self._fila_limpieza = None
+        self._datos = None
+        self._pendientes = []
+        self._max_fila = 0
+        self._max_columna = 0
+        # Celdas maestras de fórmulas compartidas: por volcar [(índice en _pendientes, posición, col)]
+        # y ya volcadas {col: byte del archivo temporal donde va su ref}
+        self._maestras_pendientes = []
+        self._posiciones_ref = {}
+        # Alguna fórmula escrita sin valor calculado: el libro pide recalcular al abrir
+        self.formulas_sin_valor = False
+        if contenido is None:
+            self._p = ''
+            self._prefijo = (
+                f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                f'<worksheet xmlns="{NS_MAIN}" xmlns:r="{NS_REL}">'
+                f'<dimension ref="A1"/><sheetViews><sheetView workbookViewId="0"/></sheetViews>'
+                f'<sheetFormatPr defaultRowHeight="15"/>'
+            )
+            self._sufijo = '<pageMargins left="0.7" right="0.7" top="0.75" bottom="0.75" header="0.3" footer="0.3"/></worksheet>'
+        else:
+            self._leer_plantilla(contenido.decode('utf-8'))
+
+    # ===== Lectura de la plantilla =====
+
+    def _leer_plantilla(self, texto):
+        p = self._p = _prefijo(texto, 'worksheet')
+        m = re.search(rf'<{p}sheetData\b[^>]*?(/?)>', texto)
+        if m is None:
+            raise ValueError(f"La hoja '{self.title}' no tiene sheetData")
+        self._prefijo = texto[:m.start()]
+        if m.group(1):
+            contenido = ''
+            self._sufijo = texto[m.end():]
+        else:
+            fin = texto.index(f'</{p}sheetData>', m.end())
+            contenido = texto[m.end():fin]
+            self._sufijo = texto[fin + len(f'</{p}sheetData>'):]
+
+        for ref in re.findall(rf'<{p}mergeCell\b[^>]*?\bref="([^"]+)"', self._sufijo):
+            min_col, min_row, max_col, max_row = range_boundaries(ref)
+            for fila in range(min_row, max_row + 1):
+                for col in range(min_col, max_col + 1):
+                    if fila != min_row or col != min_col:
+                        self._combinadas.add((fila, col))
+            # openpyxl cuenta las celdas combinadas en las dimensiones de la hoja
+            self._max_fila = max(self._max_fila, max_row)
+            self._max_columna = max(self._max_columna, max_col)
+
+        patron_fila = re.compile(rf'<{p}row\b([^>]*?)(?:/>|>(.*?)</{p}row>)', re.S)
+        patron_celda = re.compile(rf'<{p}c\b([^>]*?)(?:/>|>(.*?)</{p}c>)', re.S)
+        patron_formula = re.compile(rf'<{p}f\b([^>]*?)(?:/>|>(.*?)</{p}f>)', re.S)
+        patron_valor = re.compile(rf'<{p}v>(.*?)</{p}v>', re.S)
+        patron_texto = re.compile(rf'<{p}t\b[^>]*?(?:/>|>(.*?)</{p}t>)', re.S)
+        patron_fonetica = re.compile(rf'<{p}rPh\b.*?</{p}rPh>', re.S)
+        maestras = {}
+
+        numero_fila = 0
+        for mf in patron_fila.finditer(contenido):
+            atributos = _atributos(mf.group(1))
+            numero_fila = int(atributos.get('r', numero_fila + 1))
+            extra = ''.join(
+                f' {k}={quoteattr(v)}' for k, v in atributos.items() if k not in ('r', 'spans')
+            )
+            celdas = {}
+            col = 0
+            for mc in patron_celda.finditer(mf.group(2) or ''):
+                atr = _atributos(mc.group(1))
+                col = _indice_columna(atr['r']) if 'r' in atr else col + 1
+                interior = mc.group(2) or ''
+                estilo = int(atr.get('s', 0))
+                formula = atributos_formula = None
+                valor = None
+                mformula = patron_formula.search(interior)
+                if mformula is not None:
+                    atr_f = _atributos(mformula.group(1))
+                    texto_f = unescape(mformula.group(2) or '', _ENTIDADES)
+                    coordenada = f"{get_column_letter(col)}{numero_fila}"
+                    if atr_f.get('t') == 'shared':
+                        si = atr_f.get('si')
+                        if texto_f:
+                            maestras[si] = (texto_f, coordenada)
+                        elif si in maestras:
+                            origen, ref_origen = maestras[si]
+                            texto_f = Translator(f"={origen}", origin=ref_origen).translate_formula(coordenada)[1:]
+                        atributos_formula = ''
+                    else:
+                        atributos_formula = ''.join(f' {k}={quoteattr(v)}' for k, v in atr_f.items())
+                    formula = texto_f
+                    valor = f"={texto_f}"
+                else:
+                    valor = self._valor_celda(atr.get('t', 'n'), interior, patron_valor, patron_texto, patron_fonetica)
+                celdas[col] = _CeldaPlantilla(estilo, formula, atributos_formula, valor, mc.group(0))
+                self._max_columna = max(self._max_columna, col)
+            self._filas_plantilla[numero_fila] = (extra, celdas)
+            if celdas:
+                self._max_fila = max(self._max_fila, numero_fila)
+
+    def _valor_celda(self, tipo, interior, patron_valor, patron_texto, patron_fonetica):
+        """Valor de una celda de la plantilla (sin conversión de fechas)"""
+        if tipo == 'inlineStr':
+            interior = patron_fonetica.sub('', interior)
+            return ''.join(unescape(t or '', _ENTIDADES) for t in patron_texto.findall(interior))
+        mv = patron_valor.search(interior)
+        if mv is None:
+            return None
+        texto = unescape(mv.group(1), _ENTIDADES)
+        if tipo == 's':
+            textos = self.parent.textos_compartidos
+            idx = int(texto)
+            return textos[idx] if idx < len(textos) else None
+        if tipo in ('str', 'e'):
+            return texto
+        if tipo == 'b':
+            return texto == '1'
+        try:
+            numero = float(texto)
+        except ValueError:
+            return texto
+        return int(numero) if numero.is_integer() and '.' not in texto and 'E' not in texto.upper() else numero
+
+    # ===== Interfaz compatible con openpyxl =====
+
+    @property
+    def max_row(self):
+        return max(1, self._max_fila)
+
+    @property
+    def max_column(self):
+        return max(1, self._max_columna)
+
+    def __getitem__(self, clave):
+        if isinstance(clave, int):
+            return tuple(self.cell(clave, col) for col in range(1, self.max_column + 1))
+        letra, fila = coordinate_from_string(clave)
+        return self.cell(fila, column_index_from_string(letra))
+
+    def __setitem__(self, clave, valor):
+        self[clave].value = valor
+
+    def _valor_plantilla(self, fila, celda):
+        if celda.formula is not None:
+            return celda.valor
+        if self._fila_limpieza is not None and fila >= self._fila_limpieza:
+            return None
+        return celda.valor
+
+    def cell(self, row, column):
+        """Retorna la celda (row, column), creándola si no existe"""
+        if (row, column) in self._combinadas:
+            return MergedCell(self, row, column)
+        if self._es_fila_escrita(row):
+            # Fila ya emitida: solo lectura con el valor capturado (si la columna se captura)
+            valor = self._capturas.get(column, {}).get(row)
+            return CeldaXml(self, row, column, valor, solo_lectura=True)
+        celda = self._celdas.get((row, column))
+        if celda is None:
+            plantilla = self._filas_plantilla.get(row, (None, {}))[1].get(column)
+            if plantilla is not None:
+                celda = CeldaXml(self, row, column, self._valor_plantilla(row, plantilla), plantilla.estilo)
+            else:
+                celda = CeldaXml(self, row, column)
+            self._celdas[(row, column)] = celda
+            self._max_fila = max(self._max_fila, row)
+            self._max_columna = max(self._max_columna, column)
+        return celda
+
+    # ===== Escritura por filas =====
+
+    def limpiar_valores(self, desde_fila):
+        """Vacía los valores (no las fórmulas ni estilos) de la plantilla desde una fila"""
+        self._fila_limpieza = desde_fila
+        self._modificada = True
+        for (fila, _), celda in self._celdas.items():
+            if fila >= desde_fila and celda.data_type != 'f':
+                celda._value = None
+
+    def celdas_existentes(self, fila_inicio, fila_fin):
+        """Celdas de la plantilla o ya creadas entre dos filas (sin las combinadas ni las emitidas)"""
+        claves = {
+            (fila, col)
+            for fila, (_, plantilla) in self._filas_plantilla.items() if fila_inicio <= fila <= fila_fin
+            for col in plantilla
+        }
+        claves.update(clave for clave in self._celdas if fila_inicio <= clave[0] <= fila_fin)
+        return [
+            self.cell(fila, col) for fila, col in sorted(claves)
+            if (fila, col) not in self._combinadas and not self._es_fila_escrita(fila)
+        ]
+
+    def formato_plantilla(self, fila, col):
+        celda = self._filas_plantilla.get(fila, (None, {}))[1].get(col)
+        return self.parent.estilos.formato(celda.estilo if celda is not None else 0)
+
+    def valor_actual(self, celdas, fila, col):
+        """Valor vigente de (fila, col) durante la escritura de la fila"""
+        if col in celdas:
+            return celdas[col][0]
+        celda = self._filas_plantilla.get(fila, (None, {}))[1].get(col)
+        return self._valor_plantilla(fila, celda) if celda is not None else None
+
+    def escribir_fila(self, fila, celdas, calculados=None):
+        """Emite una fila de datos completa combinándola con la fila de la plantilla
+
+        Args:
+            fila: número de fila (las filas se escriben en orden creciente)
+            celdas: {col: (valor, formato)}; formato None conserva el de la plantilla
+            calculados: {col: valor calculado} de las celdas de la fila que quedan con fórmula
+        """
+        calculados = calculados or {}
+        compartidas = formulas_compartidas(self)
+        if self._datos is None:
+            self._datos = tempfile.TemporaryFile()
+        self._registrar_fila(fila)
+        self._modificada = True
+        # Celdas de la fila consultadas antes de escribirla
+        for col in [c for (f, c) in self._celdas if f == fila]:
+            del self._celdas[(fila, col)]
+
+        extra, plantilla = self._filas_plantilla.pop(fila, ('', {}))
+        estilos = self.parent.estilos
+        partes = []
+        maestras = []
+        for col in sorted(set(plantilla) | set(celdas)):
+            celda = plantilla.get(col)
+            estilo = celda.estilo if celda is not None else 0
+            compartida = None
+            if col in celdas:
+                valor, formato = celdas[col]
+                if formato is not None:
+                    estilo = estilos.derivar(estilo, number_format=formato)
+                if compartidas is not None and isinstance(valor, str) and valor.startswith('='):
+                    compartida = compartidas.celda(fila, col, valor)
+                    if compartida is not None:
+                        si, es_maestra = compartida
+                        compartida = (si, _RESERVA_REF if es_maestra else None)
+                        if es_maestra:
+                            maestras.append((si, col))
+            else:
+                valor = self._valor_plantilla(fila, celda)
+                if celda.formula is not None and celda.atributos_formula:
+                    # Fórmulas con atributos propios (p. ej. matriciales) se conservan tal cual
+                    s = f' s="{estilo}"' if estilo else ''
+                    partes.append(f'<c r="{get_column_letter(col)}{fila}"{s}>'
+                                  f'<f{celda.atributos_formula}>{escape(celda.formula)}</f></c>')
+                    self.formulas_sin_valor = True
+                    continue
+            calculado = calculados.get(col, SIN_VALOR)
+            self._registrar_sin_valor(valor, calculado)
+            partes.append(_xml_celda(f"{get_column_letter(col)}{fila}", valor, estilo, calculado, compartida))
+            self._capturar(fila, col, valor)
+
+        self._max_fila = max(self._max_fila, fila)
+        if celdas:
+            self._max_columna = max(self._max_columna, max(celdas))
+        if partes or extra:
+            xml = f'<row r="{fila}"{extra}>{"".join(partes)}</row>'
+            for si, col in maestras:
+                marca = f' si="{si}"{_RESERVA_REF}>'
+                self._maestras_pendientes.append((len(self._pendientes), xml.index(marca) + len(f' si="{si}"'), col))
+            self._pendientes.append(xml)
+            if len(self._pendientes) >= _FILAS_POR_ESCRITURA:
+                self._volcar()
+
+    def _volcar(self):
+        if self._pendientes:
+            inicio = self._datos.tell()
+            for indice, posicion, col in self._maestras_pendientes:
+                previo = ''.join(self._pendientes[:indice]) + self._pendientes[indice][:posicion]
+                self._posiciones_ref[col] = inicio + len(previo.encode('utf-8'))
+            self._maestras_pendientes = []
+            self._datos.write(''.join(self._pendientes).encode('utf-8'))
+            self._pendientes = []
+
+    def _completar_refs(self):
+        """Escribe el ref="..." definitivo de cada maestra en el espacio reservado"""
+        compartidas = formulas_compartidas(self)
+        for col, posicion in self._posiciones_ref.items():
+            self._datos.seek(posicion)
+            self._datos.write(f' ref="{compartidas.ref(col)}"'.encode('utf-8'))
+        self._datos.seek(0, 2)
+
+    # ===== Serialización =====
+
+    def _filas_restantes(self):
+        """XML de las filas que no pertenecen al bloque de datos, ordenadas"""
+        filas = set(self._filas_plantilla) | {f for (f, _) in self._celdas}
+        calculados = valores_cacheados(self)
+        antes, despues = [], []
+        for fila in sorted(filas):
+            if self._es_fila_escrita(fila):
+                continue
+            extra, plantilla = self._filas_plantilla.get(fila, ('', {}))
+            partes = []
+            for col in sorted(set(plantilla) | {c for (f, c) in self._celdas if f == fila}):
+                celda = self._celdas.get((fila, col))
+                base = plantilla.get(col)
+                ref = f"{get_column_letter(col)}{fila}"
+                if celda is not None and celda._modificada:
+                    calculado = calculados.get((fila, col), SIN_VALOR)
+                    self._registrar_sin_valor(celda._value, calculado)
+                    partes.append(_xml_celda(ref, celda._value, celda._estilo, calculado))
+                elif base is None:
+                    continue
+                elif base.atributos_formula == '':
+                    # Fórmula compartida: su celda maestra puede haberse reescrito
+                    self._registrar_sin_valor(base.valor, SIN_VALOR)
+                    partes.append(_xml_celda(ref, base.valor, base.estilo))
+                elif base.formula is not None or self._fila_limpieza is None or fila < self._fila_limpieza:
+                    if base.formula is not None and _celda_sin_valor(base.xml, self._p):
+                        self.formulas_sin_valor = True
+                    partes.append(base.xml)
+                else:
+                    partes.append(_xml_celda(ref, None, base.estilo))
+            if not partes and not extra:
+                continue
+            xml = f'<row r="{fila}"{extra}>{"".join(partes)}</row>'
+            if self._primera_fila_datos is not None and fila > self._ultima_fila_datos:
+                despues.append(xml)
+            else:
+                antes.append(xml)
+        return ''.join(antes), ''.join(despues)
+
+    def _registrar_sin_valor(self, valor, calculado):
+        if calculado is SIN_VALOR and isinstance(valor, str) and len(valor) > 1 and valor.startswith('='):
+            self.formulas_sin_valor = True
+
+    def _prefijo_actualizado(self):
+        prefijo = self._prefijo
+        p = self._p
+        ref = f"A1:{get_column_letter(self.max_column)}{self.max_row}"
+        prefijo = re.sub(rf'<{p}dimension\b[^>]*/>', f'<{p}dimension ref="{ref}"/>', prefijo, count=1)
+        anchos = {column_index_from_string(letra): dim.width
+                  for letra, dim in self.column_dimensions.items() if dim.width is not None}
+        if anchos:
+            prefijo = self._actualizar_columnas(prefijo, anchos)
+        return prefijo
+
+    def _actualizar_columnas(self, prefijo, anchos):
+        """Aplica anchos nuevos sobre <cols>, partiendo rangos existentes si hace falta"""
+        p = self._p
+        m = re.search(rf'<{p}cols\b[^>]*>(.*?)</{p}cols>', prefijo, re.S)
+        rangos = []
+        if m is not None:
+            for mc in re.finditer(rf'<{p}col\b([^>]*?)/?>', m.group(1)):
+                atr = _atributos(mc.group(1))
+                rangos.append([int(atr.pop('min')), int(atr.pop('max')), atr])
+        for col, ancho in anchos.items():
+            nuevos = []
+            for minimo, maximo, atr in rangos:
+                if minimo <= col <= maximo:
+                    if minimo < col:
+                        nuevos.append([minimo, col - 1, dict(atr)])
+                    if col < maximo:
+                        nuevos.append([col + 1, maximo, dict(atr)])
+                else:
+                    nuevos.append([minimo, maximo, atr])
+            nuevos.append([col, col, {'width': safe_string(float(ancho)), 'customWidth': '1'}])
+            rangos = sorted(nuevos, key=lambda r: r[0])
+        cols = ''.join(
+            f'<{p}col min="{minimo}" max="{maximo}"' + ''.join(f' {k}={quoteattr(v)}' for k, v in atr.items()) + '/>'
+            for minimo, maximo, atr in rangos
+        )
+        bloque = f'<{p}cols>{cols}</{p}cols>'
+        if m is not None:
+            return prefijo[:m.start()] + bloque + prefijo[m.end():]
+        return prefijo + bloque
+
+    def escribir_en(self, destino, cancelacion=None):
+        """Escribe la hoja completa en un archivo binario abierto (p. ej. entrada del zip)"""
+        p = self._p
+        antes, despues = self._filas_restantes()
+        destino.write(self._prefijo_actualizado().encode('utf-8'))
+        destino.write(f'<{p}sheetData>'.encode('utf-8'))
+        destino.write(antes.encode('utf-8'))
+        if self._datos is not None:
+            self._volcar()
+            self._completar_refs()
+            self._datos.seek(0)
+            while True:
+                comprobar_cancelacion(cancelacion)
+                tramo = self._datos.read(_BYTES_POR_COPIA)
+                if not tramo:
+                    break
+                destino.write(tramo)
+        destino.write(despues.encode('utf-8'))
+        destino.write(f'</{p}sheetData>'.encode('utf-8'))
+        destino.write(self._sufijo.encode('utf-8'))
+
+    def cerrar(self):
+        if self._datos is not None:
+            self._datos.close()
+            self._datos = None
+
+
+class LibroXml:
+    """Libro basado en el zip de la plantilla con interfaz mínima compatible con openpyxl"""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._zip = zipfile.ZipFile(ruta)
+        self._nombres = self._zip.namelist()
+        self._partes = {}
+        self._eliminadas = set()
+        self._hojas = {}
+
+        raices = _leer_relaciones(self._zip, '')
+        self._ruta_libro = next(
+            (ruta_parte for tipo, ruta_parte in raices.values() if tipo.endswith('/officeDocument')),
+            'xl/workbook.xml'
+        )
+        self._relaciones = _leer_relaciones(self._zip, self._ruta_libro)
+        texto = self._leer(self._ruta_libro).decode('utf-8')
+        self._p = _prefijo(texto, 'workbook')
+        self.epoch = CALENDAR_MAC_1904 if re.search(r'date1904\s*=\s*"(1|true)"', texto) else WINDOWS_EPOCH
+
+        # [título, sheetId, rId, ruta]
+        self._hojas_libro = []
+        p = self._p
+        for m in re.finditer(rf'<{p}sheet\b([^>]*?)/?>', texto):
+            atr = _atributos(m.group(1))
+            rid = next((v for k, v in atr.items() if k.endswith(':id')), None)
+            ruta_hoja = self._relaciones.get(rid, ('', None))[1]
+            self._hojas_libro.append([atr.get('name'), int(atr.get('sheetId', 0)), rid, ruta_hoja])
+
+        ruta_estilos = next((r for t, r in self._relaciones.values() if t.endswith('/styles')), None)
+        self.estilos = EstilosXml(self._leer(ruta_estilos)) if ruta_estilos else None
+        ruta_textos = next((r for t, r in self._relaciones.values() if t.endswith('/sharedStrings')), None)
+        self.textos_compartidos = self._leer_textos(ruta_textos)
+
+    def _leer(self, nombre):
+        if nombre in self._partes:
+            return self._partes[nombre]
+        return self._zip.read(nombre)
+
+    def _leer_textos(self, ruta):
+        textos = []
+        if not ruta or ruta not in self._nombres:
+            return textos
+        tag_si, tag_t, tag_rph = (f'{{{NS_MAIN}}}{t}' for t in ('si', 't', 'rPh'))
+        with self._zip.open(ruta) as f:
+            for _, elem in iterparse(f):
+                if elem.tag == tag_si:
+                    partes = []
+                    for hijo in elem:
+                        if hijo.tag == tag_t:
+                            partes.append(hijo.text or '')
+                        elif hijo.tag != tag_rph:
+                            t = hijo.find(tag_t)
+                            if t is not None:
+                                partes.append(t.text or '')
+                    textos.append(''.join(partes))
+                    elem.clear()
+        return textos
+
+    # ===== Interfaz compatible con openpyxl =====
+
+    @property
+    def sheetnames(self):
+        return [h[0] for h in self._hojas_libro]
+
+    @property
+    def worksheets(self):
+        return [self[nombre] for nombre in self.sheetnames]
+
+    def __getitem__(self, nombre):
+        for titulo, _, _, ruta_hoja in self._hojas_libro:
+            if titulo == nombre:
+                if ruta_hoja not in self._hojas:
+                    self._hojas[ruta_hoja] = HojaXml(self, titulo, ruta_hoja, self._leer(ruta_hoja))
+                return self._hojas[ruta_hoja]
+        raise KeyError(f"Worksheet {nombre} does not exist.")
+
+    def remove(self, hoja):
+        """Quita una hoja del libro (su parte se descarta al guardar)"""
+        for idx, (titulo, _, rid, ruta_hoja) in enumerate(self._hojas_libro):
+            if titulo == hoja.title:
+                del self._hojas_libro[idx]
+                self._eliminadas.add((idx, rid, ruta_hoja))
+                hoja = self._hojas.pop(ruta_hoja, hoja)
+                if isinstance(hoja, HojaXml):
+                    hoja.cerrar()
+                return
+
+    def create_sheet(self, titulo):
+        """Agrega una hoja vacía al final del libro"""
+        usados = set(self._nombres) | set(self._hojas)
+        n = 1
+        while f'xl/worksheets/sheet{n}.xml' in usados:
+            n += 1
+        ruta_hoja = f'xl/worksheets/sheet{n}.xml'
+        ids = {h[1] for h in self._hojas_libro} | {0}
+        rids = set(self._relaciones) | {h[2] for h in self._hojas_libro}
+        k = 1
+        while f'rId{k}' in rids:
+            k += 1
+        hoja = HojaXml(self, titulo, ruta_hoja)
+        self._hojas[ruta_hoja] = hoja
+        self._hojas_libro.append([titulo, max(ids) + 1, None, ruta_hoja])
+        self._relaciones[f'rId{k}'] = (TIPO_HOJA, ruta_hoja)
+        self._hojas_libro[-1][2] = f'rId{k}'
+        return hoja
+
+    def close(self):
+        for hoja in self._hojas.values():
+            hoja.cerrar()
+        self._zip.close()
+
+    # ===== Guardado =====
+
+    def save(self, ruta, cancelacion=None):
+        """Escribe el libro: partes sin cambios copiadas tal cual y hojas modificadas regeneradas"""
+        modificadas = {r: h for r, h in self._hojas.items() if h._modificada}
+        partes = dict(self._partes)
+        eliminadas = {ruta_hoja for _, _, ruta_hoja in self._eliminadas}
+
+        estructura_cambiada = bool(self._eliminadas) or any(
+            h[3] not in self._nombres for h in self._hojas_libro
+        )
+        actualizar_libro = bool(modificadas) or estructura_cambiada
+        if actualizar_libro:
+            partes.update(self._paquete_actualizado(eliminadas))
+            # calcChain queda desactualizado al cambiar fórmulas
+            for tipo, ruta_parte in self._relaciones.values():
+                if tipo == TIPO_CALC_CHAIN:
+                    eliminadas.add(ruta_parte)
+        if self.estilos is not None and self.estilos.modificado:
+            ruta_estilos = next(r for t, r in self._relaciones.values() if t.endswith('/styles'))
+            partes[ruta_estilos] = self.estilos.contenido()
+
+        eliminadas |= self._partes_huerfanas(partes, eliminadas)
+
+        with zipfile.ZipFile(ruta, 'w', zipfile.ZIP_DEFLATED) as zout:
+            for info in self._zip.infolist():
+                nombre = info.filename
+                if nombre in eliminadas or nombre in modificadas or (actualizar_libro and nombre == self._ruta_libro):
+                    continue
+                if nombre in partes:
+                    zout.writestr(nombre, partes.pop(nombre))
+                else:
+                    zout.writestr(info, self._zip.read(nombre), compress_type=zipfile.ZIP_DEFLATED)
+            for nombre, contenido in partes.items():
+                if nombre not in eliminadas:
+                    zout.writestr(nombre, contenido)
+            for ruta_hoja, hoja in modificadas.items():
+                comprobar_cancelacion(cancelacion)
+                with zout.open(ruta_hoja, 'w', force_zip64=True) as destino:
+                    hoja.escribir_en(destino, cancelacion)
+            if actualizar_libro:
+                # Al final: el recálculo al abrir depende de lo que quedó escrito en las hojas
+                zout.writestr(self._ruta_libro, self._libro_actualizado(self._formulas_sin_valor(modificadas)))
+
+    def _formulas_sin_valor(self, modificadas):
+        """True si alguna hoja del libro guardado tiene fórmulas sin valor calculado"""
+        for _, _, _, ruta_hoja in self._hojas_libro:
+            hoja = modificadas.get(ruta_hoja)
+            if hoja is not None:
+                if hoja.formulas_sin_valor:
+                    return True
+            elif _hoja_con_formulas_sin_valor(self._leer(ruta_hoja)):
+                return True
+        return False
+
+    def _libro_actualizado(self, recalcular):
+        """workbook.xml con la lista de hojas vigente; recalcular pide a Excel recalcular al abrir"""
+        texto = self._leer(self._ruta_libro).decode('utf-8')
+        p = self._p
+        m = re.search(rf'xmlns:([\w.-]+)="{re.escape(NS_REL)}"', texto)
+        prefijo_r = m.group(1) if m else 'r'
+        if m is None:
+            texto = re.sub(rf'<{p}workbook\b', f'<{p}workbook xmlns:r="{NS_REL}"', texto, count=1)
+
+        ms = re.search(rf'<{p}sheets\b[^>]*>(.*?)</{p}sheets>', texto, re.S)
+        existentes = {}
+        for mh in re.finditer(rf'<{p}sheet\b([^>]*?)/?>', ms.group(1)):
+            atr = _atributos(mh.group(1))
+            rid = next((v for k, v in atr.items() if k.endswith(':id')), None)
+            existentes[rid] = mh.group(0)
+        hojas = ''.join(
+            existentes.get(rid) or
+            f'<{p}sheet name={quoteattr(titulo)} sheetId="{id_hoja}" {prefijo_r}:id="{rid}"/>'
+            for titulo, id_hoja, rid, _ in self._hojas_libro
+        )
+        texto = texto[:ms.start(1)] + hojas + texto[ms.end(1):]
+
+        # Índices locales de nombres definidos y pestaña activa tras quitar hojas
+        for idx, _, _ in sorted(self._eliminadas, reverse=True):
+            texto = self._desplazar_indices_hoja(texto, idx)
+
+        # Las fórmulas llevan su valor calculado; solo si alguna quedó sin él Excel debe recalcular al abrir
+        mc = re.search(rf'<{p}calcPr\b([^>]*?)/>', texto)
+        recalculo = ' fullCalcOnLoad="1"' if recalcular else ''
+        if mc is not None:
+            atributos = re.sub(r'\s*fullCalcOnLoad\s*=\s*"[^"]*"', '', mc.group(1)).rstrip()
+            texto = texto[:mc.start()] + f'<{p}calcPr{atributos}{recalculo}/>' + texto[mc.end():]
+        elif recalcular:
+            ancla = re.search(rf'</{p}definedNames>|<{p}definedNames\s*/>|</{p}sheets>', texto)
+            texto = texto[:ancla.end()] + f'<{p}calcPr calcId="124519" fullCalcOnLoad="1"/>' + texto[ancla.end():]
+        return texto.encode('utf-8')
+
+    def _desplazar_indices_hoja(self, texto, idx):
+        p = self._p
+
+        def nombre_definido(m):
+            local = re.search(r'localSheetId="(\d+)"', m.group(0))
+            if local is None:
+                return m.group(0)
+            n = int(local.group(1))
+            if n == idx:
+                return ''
+            if n > idx:
+                return m.group(0).replace(local.group(0), f'localSheetId="{n - 1}"', 1)
+            return m.group(0)
+
+        texto = re.sub(rf'<{p}definedName\b[^>]*>.*?</{p}definedName>', nombre_definido, texto, flags=re.S)
+
+        def vista(m):
+            etiqueta = m.group(0)
+            for atributo in ('activeTab', 'firstSheet'):
+                ma = re.search(rf'{atributo}="(\d+)"', etiqueta)
+                if ma is not None and int(ma.group(1)) >= idx:
+                    n = max(0, int(ma.group(1)) - 1) if int(ma.group(1)) > idx else 0
+                    etiqueta = etiqueta.replace(ma.group(0), f'{atributo}="{n}"', 1)
+            return etiqueta
+
+        return re.sub(rf'<{p}workbookView\b[^>]*>', vista, texto)
+
+    def _paquete_actualizado(self, eliminadas):
+        """Relaciones del libro y [Content_Types].xml acordes a las hojas agregadas/quitadas"""
+        partes = {}
+        carpeta, nombre = posixpath.split(self._ruta_libro)
+        ruta_rels = posixpath.join(carpeta, '_rels', nombre + '.rels')
+        rels = self._leer(ruta_rels).decode('utf-8')
+        tipos = self._leer('[Content_Types].xml').decode('utf-8')
+
+        quitar_rids = {rid for _, rid, _ in self._eliminadas}
+        quitar_rids |= {rid for rid, (tipo, _) in self._relaciones.items() if tipo == TIPO_CALC_CHAIN}
+        quitar_partes = set(eliminadas) | {r for t, r in self._relaciones.values() if t == TIPO_CALC_CHAIN}
+        for rid in quitar_rids:
+            rels = re.sub(rf'<Relationship\b[^>]*\bId="{re.escape(rid)}"[^>]*/>', '', rels)
+        for ruta_parte in quitar_partes:
+            tipos = re.sub(rf'<Override\b[^>]*\bPartName="/{re.escape(ruta_parte)}"[^>]*/>', '', tipos)
+
+        for titulo, _, rid, ruta_hoja in self._hojas_libro:
+            if ruta_hoja in self._nombres:
+                continue
+            destino = posixpath.relpath(ruta_hoja, carpeta or '.')
+            rels = rels.replace(
+                '</Relationships>',
+                f'<Relationship Id="{rid}" Type="{TIPO_HOJA}" Target="{destino}"/></Relationships>'
+            )
+            tipos = tipos.replace(
+                '</Types>',
+                f'<Override PartName="/{ruta_hoja}" ContentType="{CONTENIDO_HOJA}"/></Types>'
+            )
+        partes[ruta_rels] = rels.encode('utf-8')
+        partes['[Content_Types].xml'] = tipos.encode('utf-8')
+        return partes
+
+    def _partes_huerfanas(self, partes, eliminadas):
+        """Partes que quedan sin ninguna relación que las alcance (p. ej. dibujos de una hoja quitada)"""
+        existentes = (set(self._nombres) | set(partes) | set(self._hojas)) - eliminadas
+        alcanzadas = set()
+        pendientes = ['']
+        while pendientes:
+            parte = pendientes.pop()
+            carpeta, nombre = posixpath.split(parte)
+            ruta_rels = posixpath.join(carpeta, '_rels', nombre + '.rels')
+            if ruta_rels not in existentes:
+                continue
+            alcanzadas.add(ruta_rels)
+            contenido = partes.get(ruta_rels) or self._leer(ruta_rels)
+            for m in re.finditer(rb'<Relationship\b[^>]*>', contenido):
+                atr = _atributos(m.group(0).decode('utf-8'))
+                if atr.get('TargetMode') == 'External':
+                    continue
+                destino = _ruta_relacion(parte or '_', atr.get('Target', ''))
+                if destino in existentes and destino not in alcanzadas:
+                    alcanzadas.add(destino)
+                    pendientes.append(destino)
+        huerfanas = set()
+        for nombre in existentes - alcanzadas:
+            if nombre == '[Content_Types].xml' or nombre.endswith('/'):
+                continue
+            if nombre.endswith('.rels'):
+                carpeta = posixpath.dirname(posixpath.dirname(nombre))
+                origen = posixpath.join(carpeta, posixpath.basename(nombre)[:-5])
+                if origen in alcanzadas or nombre == '_rels/.rels':
+                    continue
+            huerfanas.add(nombre)
+        return huerfanas
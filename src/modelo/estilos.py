@@ -4,6 +4,19 @@ Estilos reutilizables para celdas Excel
 """
 
 from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
+from openpyxl.styles.cell_style import StyleArray
+from openpyxl.styles.numbers import BUILTIN_FORMATS_MAX_SIZE, BUILTIN_FORMATS_REVERSE
+from openpyxl.styles.styleable import StyleableObject
+
+
+# Atributo de celda -> (colección del libro, campo del StyleArray)
+_COLECCIONES = {
+    'font': ('_fonts', 'fontId'),
+    'fill': ('_fills', 'fillId'),
+    'border': ('_borders', 'borderId'),
+    'alignment': ('_alignments', 'alignmentId'),
+    'protection': ('_protections', 'protectionId'),
+}
 
 
 class EstilosExcel:
@@ -11,6 +24,8 @@ class EstilosExcel:
     
     def __init__(self):
         self._preparar_estilos()
+        # {(id(libro), combinacion): (libro, ((campo, índice), ...))}
+        self._indices_libro = {}
     
     def _preparar_estilos(self):
         """Pre-crea estilos para mejor rendimiento"""
@@ -34,3 +49,47 @@ class EstilosExcel:
         self.fill_amarillo = PatternFill(start_color='FFFF00', end_color='FFFF00', fill_type='solid')
         self.fill_gris = PatternFill(start_color='D3D3D3', end_color='D3D3D3', fill_type='solid')
         self.fill_azul = PatternFill(start_color='D9E1F2', end_color='D9E1F2', fill_type='solid')
+    
+    def combinacion(self, **atributos):
+        """Combinación de atributos de estilo (font, fill, border, alignment, number_format)
+        
+        Se aplica en el orden dado, igual que asignar los atributos uno a uno.
+        """
+        return tuple(atributos.items())
+    
+    def _indices(self, libro, combinacion):
+        """Registra una vez por libro los estilos de la combinación y retorna sus índices"""
+        clave = (id(libro), combinacion)
+        registro = self._indices_libro.get(clave)
+        if registro is None:
+            indices = []
+            for atributo, valor in combinacion:
+                if atributo == 'number_format':
+                    if valor in BUILTIN_FORMATS_REVERSE:
+                        indices.append(('numFmtId', BUILTIN_FORMATS_REVERSE[valor]))
+                    else:
+                        indices.append(('numFmtId', libro._number_formats.add(valor) + BUILTIN_FORMATS_MAX_SIZE))
+                else:
+                    coleccion, campo = _COLECCIONES[atributo]
+                    indices.append((campo, getattr(libro, coleccion).add(valor)))
+            # Se guarda el libro para que su id() no se reutilice mientras viva la entrada
+            registro = self._indices_libro[clave] = (libro, tuple(indices))
+        return registro[1]
+    
+    def aplicar(self, cell, combinacion):
+        """Aplica una combinación a una celda por índice de estilo (sin búsquedas por atributo)"""
+        if isinstance(cell, StyleableObject):
+            indices = self._indices(cell.parent.parent, combinacion)
+            if cell._style is None:
+                cell._style = StyleArray()
+            for campo, indice in indices:
+                setattr(cell._style, campo, indice)
+        else:
+            # Celdas de los motores de escritura por filas: asignación normal
+            for atributo, valor in combinacion:
+                setattr(cell, atributo, valor)
+    
+    def aplicar_rango(self, celdas, combinacion):
+        """Aplica una combinación a un conjunto de celdas (fila o columna)"""
+        for cell in celdas:
+            self.aplicar(cell, combinacion)
@@ -0,0 +1,151 @@
+# src/modelo/fechas.py
+"""
+Normalización de fechas para columnas FECHA
+El formato se infiere una vez por columna y cada bloque se convierte como vector;
+los textos que no encajan pasan por pd.to_datetime con memoización acotada
+"""
+
+import warnings
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+
+from ..config import CONFIG_SISTEMA
+
+
+_MAX_CACHE = CONFIG_SISTEMA['PROCESAMIENTO'].get('max_cache_fechas', 4096)
+
+# Marca de texto que no se pudo convertir
+_FALLO = object()
+
+
+@lru_cache(maxsize=_MAX_CACHE)
+def parsear_fecha(texto):
+    """pd.to_datetime(texto) memoizado; None si no se puede convertir"""
+    try:
+        return pd.to_datetime(texto)
+    except Exception:
+        return None
+
+
+def _clave_fecha(valor):
+    """Parte del texto que se interpreta como fecha (sin la hora), o None si no aplica"""
+    if ' ' in valor:
+        valor = valor.split(' ')[0]
+    if '-' in valor or '/' in valor:
+        return valor
+    return None
+
+
+def _formatos_candidatos(muestra):
+    """Formatos a probar en la columna, inferidos de un texto de muestra
+
+    Si el año va al final, el día y el mes son ambiguos: se prueba primero mes/día
+    y luego día/mes, igual que la inferencia por valor de pd.to_datetime (dayfirst=False).
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        formato = guess_datetime_format(muestra)
+    if not formato or '%z' in formato or '%Z' in formato:
+        return []
+    if '%d' in formato and '%m' in formato and not formato.startswith(('%Y', '%y')):
+        intercambiado = formato.replace('%d', '\0').replace('%m', '%d').replace('\0', '%m')
+        mes_primero = formato.index('%m') < formato.index('%d')
+        return [formato, intercambiado] if mes_primero else [intercambiado, formato]
+    return [formato]
+
+
+class NormalizadorFechas:
+    """Convierte los valores de una columna FECHA a date (texto original si no se puede)"""
+
+    def __init__(self, max_cache=_MAX_CACHE):
+        self._formatos = None
+        self._cache = OrderedDict()
+        self._max_cache = max_cache
+
+    def normalizar(self, valores, textos):
+        """Normaliza un bloque de la columna
+
+        Args:
+            valores: arreglo object con los valores origen (sin vacíos)
+            textos: arreglo object con su texto normalizado
+
+        Returns:
+            np.ndarray: date por celda convertible, el texto en el resto
+        """
+        salida = textos.copy()
+        claves = {}
+        for i, valor in enumerate(valores):
+            if isinstance(valor, datetime):  # incluye pd.Timestamp
+                salida[i] = valor.date()
+            elif isinstance(valor, str):
+                clave = _clave_fecha(valor)
+                if clave is not None:
+                    claves.setdefault(clave, []).append(i)
+
+        if claves:
+            fechas = self._convertir(list(claves))
+            for clave, posiciones in claves.items():
+                fecha = fechas[clave]
+                if fecha is not _FALLO:
+                    for i in posiciones:
+                        salida[i] = fecha
+        return salida
+
+    def _convertir(self, claves):
+        """{clave: date o _FALLO} para textos únicos, usando la memoria de la columna"""
+        resultado = {}
+        pendientes = []
+        for clave in claves:
+            if clave in self._cache:
+                self._cache.move_to_end(clave)
+                resultado[clave] = self._cache[clave]
+            else:
+                pendientes.append(clave)
+
+        if pendientes:
+            if self._formatos is None:
+                self._formatos = _formatos_candidatos(pendientes[0])
+            nuevos = self._convertir_vector(pendientes)
+            for clave in pendientes:
+                fecha = nuevos.get(clave)
+                if fecha is None:
+                    fecha = self._convertir_valor(clave)
+                resultado[clave] = fecha
+                self._guardar(clave, fecha)
+        return resultado
+
+    def _convertir_vector(self, pendientes):
+        """Convierte con los formatos de la columna; lo que no encaja queda fuera"""
+        nuevos = {}
+        restantes = pd.Series(pendientes, dtype=object)
+        for formato in self._formatos:
+            if restantes.empty:
+                break
+            convertidas = pd.to_datetime(restantes, format=formato, errors='coerce')
+            validas = convertidas.notna().to_numpy()
+            if validas.any():
+                nuevos.update(zip(restantes[validas], convertidas[validas].dt.date))
+            restantes = restantes[~validas]
+        return nuevos
+
+    @staticmethod
+    def _convertir_valor(clave):
+        fecha = parsear_fecha(clave)
+        if fecha is None:
+            return _FALLO
+        try:
+            fecha = fecha.date() if hasattr(fecha, 'date') else fecha
+            if fecha:
+                return fecha.date() if hasattr(fecha, 'date') else fecha
+        except Exception:
+            pass
+        return _FALLO
+
+    def _guardar(self, clave, fecha):
+        self._cache[clave] = fecha
+        if len(self._cache) > self._max_cache:
+            self._cache.popitem(last=False)
@@ -0,0 +1,87 @@
+# src/modelo/formulas_compartidas.py
+"""
+Fórmulas compartidas de Excel para las fórmulas copiadas de la fila 6
+En cada columna la primera fila de datos guarda el texto completo
+(<f t="shared" ref="X7:X100005" si="n">) y el resto solo la referencia al grupo
+(<f t="shared" si="n"/>); Excel desplaza las referencias igual que FormulaCompilada.
+"""
+
+from openpyxl.formula.translate import Translator
+from openpyxl.utils import get_column_letter
+
+
+def _desplaza_como_excel(formula, col, fila_plantilla):
+    """True si Excel obtiene las mismas fórmulas que FormulaCompilada al desplazar la maestra
+
+    FormulaCompilada deja fija toda referencia con '$' (también $W6) y Excel solo fija
+    la parte marcada; esas columnas se siguen escribiendo con el texto completo.
+    """
+    letra = get_column_letter(col)
+    fila_maestra = fila_plantilla + 1
+    maestra = formula.en_fila(1)
+    try:
+        traductor = Translator(maestra, origin=f"{letra}{fila_maestra}")
+        return all(
+            traductor.translate_formula(f"{letra}{fila_maestra + salto}") == formula.en_fila(1 + salto)
+            for salto in (1, 997)
+        )
+    except Exception:
+        return False
+
+
+class FormulasCompartidas:
+    """Grupos de fórmulas compartidas de una hoja, uno por columna con fórmula en la fila 6
+
+    transferir_datos registra cada celda que conserva la fórmula copiada; los escritores
+    consultan celda() al emitir cada fórmula, que vuelve a comprobar el texto.
+
+    Args:
+        formulas: {col: FormulaCompilada} de la fila plantilla
+        fila_plantilla: fila de la que se copian las fórmulas
+    """
+
+    def __init__(self, formulas, fila_plantilla=6):
+        self.fila_plantilla = fila_plantilla
+        self._formulas = {
+            col: formula for col, formula in formulas.items()
+            if _desplaza_como_excel(formula, col, fila_plantilla)
+        }
+        # col -> [si, fila de la maestra, última fila del grupo]
+        self._grupos = {}
+
+    def registrar(self, fila, col):
+        """Suma al grupo de su columna una celda que conserva la fórmula copiada (filas en orden)"""
+        if col not in self._formulas or fila <= self.fila_plantilla:
+            return
+        grupo = self._grupos.get(col)
+        if grupo is None:
+            self._grupos[col] = [len(self._grupos), fila, fila]
+        elif fila > grupo[2]:
+            grupo[2] = fila
+
+    def celda(self, fila, col, formula):
+        """(si, es_maestra) si la fórmula de (fila, col) se escribe como compartida, o None"""
+        grupo = self._grupos.get(col)
+        if grupo is None or not grupo[1] <= fila <= grupo[2]:
+            return None
+        if fila == grupo[1]:
+            return grupo[0], True
+        if formula != self._formulas[col].en_fila(fila - self.fila_plantilla):
+            return None
+        return grupo[0], False
+
+    def ref(self, col):
+        """Rango del grupo de la columna (p. ej. 'X7:X100005')"""
+        _, inicio, fin = self._grupos[col]
+        letra = get_column_letter(col)
+        return f"{letra}{inicio}:{letra}{fin}"
+
+
+def formulas_compartidas(ws):
+    """FormulasCompartidas asociadas a la hoja o None"""
+    return getattr(ws, '_formulas_compartidas', None)
+
+
+def compartir_formulas(ws, compartidas):
+    """Asocia a la hoja los grupos que usarán sus escritores"""
+    ws._formulas_compartidas = compartidas
@@ -0,0 +1,699 @@
+# src/modelo/formulas_fila.py
+"""
+Evaluador de las fórmulas de la fila plantilla (fila 6)
+Calcula por bloques de filas, sobre arreglos numpy, el valor de las fórmulas que se
+copian a cada fila de datos: aritmética, comparaciones, &, ROUND, IF, diferencias de
+fechas y referencias a la misma fila. Lo que queda fuera de ese subconjunto se reporta
+y la celda se guarda sin valor calculado (Excel la calcula al abrir).
+"""
+
+import math
+import re
+from datetime import datetime, date, time, timedelta
+from decimal import Decimal, InvalidOperation, ROUND_DOWN, ROUND_HALF_UP, ROUND_UP
+
+import numpy as np
+from openpyxl.formula.tokenizer import Token, Tokenizer, TokenizerError
+from openpyxl.utils.cell import column_index_from_string
+from openpyxl.utils.datetime import to_excel
+
+from .valores_cacheados import SIN_VALOR
+
+
+FILA_PLANTILLA = 6
+
+# Marca, en las entradas, de la celda que queda con la fórmula de su columna
+CALCULAR = object()
+
+_REFERENCIA = re.compile(r'^(\$?)([A-Z]{1,3})(\$?)(\d+)$')
+_NUMERO_TEXTO = re.compile(r'^\s*[+-]?(\d+(\.\d*)?|\.\d+)([eE][+-]?\d+)?\s*$')
+_EPOCA = np.datetime64('1899-12-30', 'D')
+# Seriales de fecha válidos: desde el 1/3/1900 (antes Excel cuenta el 29/2/1900) hasta el 31/12/9999
+_SERIAL_MINIMO = 61
+_SERIAL_MAXIMO = 2958466
+
+_OPERADORES_COMPARACION = ('=', '<>', '<', '>', '<=', '>=')
+
+
+class FormulaNoSoportada(Exception):
+    """La fórmula usa algo fuera del subconjunto que se calcula"""
+
+
+# ===== Conversión de valores de celda =====
+
+def _es_formula(valor):
+    return isinstance(valor, str) and len(valor) > 1 and valor.startswith('=')
+
+
+def _numero(valor):
+    """(número, válido) de un valor tal como lo toma Excel en una operación aritmética"""
+    if valor is None:
+        return 0.0, True
+    if isinstance(valor, bool):
+        return float(valor), True
+    if isinstance(valor, (int, float)):
+        numero = float(valor)
+        return numero, math.isfinite(numero)
+    if isinstance(valor, (datetime, date, time, timedelta)):
+        try:
+            return float(to_excel(valor)), True
+        except Exception:
+            return math.nan, False
+    if isinstance(valor, str) and _NUMERO_TEXTO.match(valor):
+        return float(valor), True
+    return math.nan, False
+
+
+def _numero_referencia(valor):
+    """Número de una celda dentro de SUM/MIN/MAX (texto, lógicos y vacías se ignoran: nan)"""
+    if isinstance(valor, bool) or valor is None or isinstance(valor, str):
+        return math.nan
+    numero, valido = _numero(valor)
+    return numero if valido else math.nan
+
+
+def _logico(valor):
+    """(lógico, válido) de un valor usado como condición"""
+    if valor is None:
+        return False, True
+    if isinstance(valor, bool):
+        return valor, True
+    numero, valido = _numero(valor)
+    if not valido or isinstance(valor, str):
+        return False, False
+    return numero != 0, True
+
+
+def _texto(valor):
+    """(texto, válido) de un valor en una concatenación (&)"""
+    if valor is None:
+        return '', True
+    if isinstance(valor, str):
+        return valor, True
+    if isinstance(valor, bool):
+        return ('TRUE' if valor else 'FALSE'), True
+    numero, valido = _numero(valor)
+    if not valido:
+        return '', False
+    if numero.is_integer() and abs(numero) < 1e15:
+        return str(int(numero)), True
+    texto = '%.15g' % numero
+    return texto, 'e' not in texto
+
+
+def _comparable(valor, otro):
+    """Clave de comparación de Excel: números < texto < lógicos; vacía toma el tipo del otro lado"""
+    if valor is None:
+        valor = '' if isinstance(otro, str) else (False if isinstance(otro, bool) else 0)
+    if isinstance(valor, bool):
+        return 2, valor
+    if isinstance(valor, str):
+        return 1, valor.lower()
+    return 0, _numero(valor)[0]
+
+
+def _comparar(a, b, operador):
+    clave_a, clave_b = _comparable(a, b), _comparable(b, a)
+    if operador == '=':
+        return clave_a == clave_b
+    if operador == '<>':
+        return clave_a != clave_b
+    if operador == '<':
+        return clave_a < clave_b
+    if operador == '>':
+        return clave_a > clave_b
+    if operador == '<=':
+        return clave_a <= clave_b
+    return clave_a >= clave_b
+
+
+def _redondear(numero, digitos, modo):
+    """ROUND/ROUNDUP/ROUNDDOWN de Excel (sobre 15 cifras significativas, empates lejos de cero)"""
+    try:
+        cuanto = Decimal(1).scaleb(-int(digitos))
+        return float(Decimal('%.15g' % numero).quantize(cuanto, rounding=modo))
+    except (InvalidOperation, ValueError, OverflowError):
+        return math.nan
+
+
+_v_numero = np.frompyfunc(_numero, 1, 2)
+_v_numero_referencia = np.frompyfunc(_numero_referencia, 1, 1)
+_v_logico = np.frompyfunc(_logico, 1, 2)
+_v_texto = np.frompyfunc(_texto, 1, 2)
+_v_comparar = np.frompyfunc(_comparar, 3, 1)
+_v_redondear = np.frompyfunc(_redondear, 3, 1)
+_v_es_formula = np.frompyfunc(_es_formula, 1, 1)
+
+
+# ===== Vectores (datos, válidos) =====
+
+def _numeros(vector):
+    datos, validos = vector
+    if datos.dtype.kind == 'f':
+        return datos, validos & np.isfinite(datos)
+    if datos.dtype.kind == 'b':
+        return datos.astype(float), validos
+    numeros, ok = _v_numero(datos)
+    return numeros.astype(float), validos & ok.astype(bool)
+
+
+def _logicos(vector):
+    datos, validos = vector
+    if datos.dtype.kind == 'b':
+        return datos, validos
+    if datos.dtype.kind == 'f':
+        return datos != 0, validos & np.isfinite(datos)
+    logicos, ok = _v_logico(datos)
+    return logicos.astype(bool), validos & ok.astype(bool)
+
+
+def _objetos(datos):
+    if datos.dtype == object:
+        return datos
+    salida = np.empty(len(datos), dtype=object)
+    salida[:] = datos.tolist()
+    return salida
+
+
+def _constante(valor, n):
+    if isinstance(valor, bool):
+        return np.full(n, valor, dtype=bool), np.ones(n, dtype=bool)
+    if isinstance(valor, float):
+        return np.full(n, valor, dtype=float), np.ones(n, dtype=bool)
+    datos = np.empty(n, dtype=object)
+    datos[:] = [valor] * n
+    return datos, np.ones(n, dtype=bool)
+
+
+def _fechas(serial, validos):
+    """Días desde la época como datetime64 y máscara de seriales de fecha válidos"""
+    validos = validos & (serial >= _SERIAL_MINIMO) & (serial < _SERIAL_MAXIMO)
+    dias = np.where(validos, np.floor(np.where(validos, serial, _SERIAL_MINIMO)), _SERIAL_MINIMO)
+    return _EPOCA + dias.astype('int64').astype('timedelta64[D]'), validos
+
+
+def _partes_fecha(fechas):
+    anios = fechas.astype('datetime64[Y]')
+    meses = fechas.astype('datetime64[M]')
+    return (anios.astype(int) + 1970,
+            (meses - anios).astype(int) + 1,
+            (fechas - meses).astype(int) + 1)
+
+
+# ===== Análisis sintáctico =====
+
+class _Analizador:
+    """Árbol de una fórmula a partir de los tokens de openpyxl (precedencia de Excel)"""
+
+    def __init__(self, formula, valor_fijo):
+        try:
+            tokens = Tokenizer(formula).items
+        except TokenizerError as e:
+            raise FormulaNoSoportada(f"no se pudo leer ({e})")
+        self.tokens = [t for t in tokens if t.type != Token.WSPACE]
+        self.pos = 0
+        self.valor_fijo = valor_fijo
+
+    def analizar(self):
+        if not self.tokens:
+            raise FormulaNoSoportada("fórmula vacía")
+        nodo = self._comparacion()
+        if self.pos != len(self.tokens):
+            raise FormulaNoSoportada(f"'{self.tokens[self.pos].value}' inesperado")
+        return nodo
+
+    def _actual(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def _es_operador(self, tipo, valores):
+        token = self._actual()
+        return token is not None and token.type == tipo and token.value in valores
+
+    def _binario(self, siguiente, operadores):
+        nodo = siguiente()
+        while self._es_operador(Token.OP_IN, operadores):
+            operador = self.tokens[self.pos].value
+            self.pos += 1
+            nodo = ('op', operador, nodo, siguiente())
+        return nodo
+
+    def _comparacion(self):
+        return self._binario(self._concatenacion, _OPERADORES_COMPARACION)
+
+    def _concatenacion(self):
+        return self._binario(self._suma, ('&',))
+
+    def _suma(self):
+        return self._binario(self._producto, ('+', '-'))
+
+    def _producto(self):
+        return self._binario(self._potencia, ('*', '/'))
+
+    def _potencia(self):
+        return self._binario(self._porcentaje, ('^',))
+
+    def _porcentaje(self):
+        nodo = self._unario()
+        while self._es_operador(Token.OP_POST, ('%',)):
+            self.pos += 1
+            nodo = ('porcentaje', nodo)
+        return nodo
+
+    def _unario(self):
+        if self._es_operador(Token.OP_PRE, ('-', '+')):
+            operador = self.tokens[self.pos].value
+            self.pos += 1
+            nodo = self._unario()
+            return ('negativo', nodo) if operador == '-' else ('positivo', nodo)
+        return self._primario()
+
+    def _primario(self):
+        token = self._actual()
+        if token is None:
+            raise FormulaNoSoportada("fórmula incompleta")
+        self.pos += 1
+        if token.type == Token.PAREN and token.subtype == Token.OPEN:
+            nodo = self._comparacion()
+            self._cerrar(Token.PAREN)
+            return nodo
+        if token.type == Token.FUNC and token.subtype == Token.OPEN:
+            return self._funcion(token.value[:-1].upper())
+        if token.type == Token.OPERAND:
+            return self._operando(token)
+        raise FormulaNoSoportada(f"'{token.value}' no soportado")
+
+    def _cerrar(self, tipo):
+        token = self._actual()
+        if token is None or token.type != tipo or token.subtype != Token.CLOSE:
+            raise FormulaNoSoportada("paréntesis sin cerrar")
+        self.pos += 1
+
+    def _funcion(self, nombre):
+        if nombre not in _FUNCIONES:
+            raise FormulaNoSoportada(f"función {nombre}")
+        argumentos = []
+        token = self._actual()
+        if token is not None and token.type == Token.FUNC and token.subtype == Token.CLOSE:
+            self.pos += 1
+        else:
+            while True:
+                token = self._actual()
+                if token is not None and (
+                    token.type == Token.SEP or (token.type == Token.FUNC and token.subtype == Token.CLOSE)
+                ):
+                    raise FormulaNoSoportada(f"argumento vacío en {nombre}")
+                argumentos.append(self._comparacion())
+                token = self._actual()
+                if token is not None and token.type == Token.SEP and token.subtype == Token.ARG:
+                    self.pos += 1
+                    continue
+                self._cerrar(Token.FUNC)
+                break
+        minimo, maximo = _FUNCIONES[nombre][1:]
+        if not minimo <= len(argumentos) <= maximo:
+            raise FormulaNoSoportada(f"{nombre} con {len(argumentos)} argumentos")
+        return ('funcion', nombre, argumentos)
+
+    def _operando(self, token):
+        if token.subtype == Token.NUMBER:
+            return ('constante', float(token.value))
+        if token.subtype == Token.TEXT:
+            return ('constante', token.value[1:-1].replace('""', '"'))
+        if token.subtype == Token.LOGICAL:
+            return ('constante', token.value.upper() == 'TRUE')
+        if token.subtype == Token.RANGE:
+            return self._referencia(token.value)
+        raise FormulaNoSoportada(f"'{token.value}' no soportado")
+
+    def _referencia(self, texto):
+        if '!' in texto:
+            raise FormulaNoSoportada("referencia a otra hoja")
+        extremos = [self._celda(parte) for parte in texto.split(':')]
+        if len(extremos) == 1:
+            return extremos[0]
+        if len(extremos) == 2 and all(nodo[0] == 'referencia' for nodo in extremos):
+            desde, hasta = sorted((extremos[0][1], extremos[1][1]))
+            return ('rango', list(range(desde, hasta + 1)))
+        raise FormulaNoSoportada(f"rango {texto}")
+
+    def _celda(self, texto):
+        m = _REFERENCIA.match(texto.upper())
+        if m is None:
+            raise FormulaNoSoportada(f"referencia {texto}")
+        col = column_index_from_string(m.group(2))
+        fila = int(m.group(4))
+        # Igual que FormulaCompilada: una referencia con '$' no se desplaza al copiarse
+        if m.group(1) or m.group(3):
+            if fila >= FILA_PLANTILLA:
+                raise FormulaNoSoportada(f"referencia fija a la fila de datos {texto}")
+            valor = self.valor_fijo(fila, col)
+            if _es_formula(valor):
+                raise FormulaNoSoportada(f"{texto} contiene una fórmula")
+            return ('constante', float(valor) if isinstance(valor, int) and not isinstance(valor, bool) else valor)
+        if fila != FILA_PLANTILLA:
+            raise FormulaNoSoportada(f"referencia a otra fila {texto}")
+        return ('referencia', col)
+
+
+def _referencias(nodo):
+    """Columnas de la misma fila que lee un árbol"""
+    tipo = nodo[0]
+    if tipo == 'referencia':
+        return {nodo[1]}
+    if tipo == 'rango':
+        return set(nodo[1])
+    if tipo == 'op':
+        return _referencias(nodo[2]) | _referencias(nodo[3])
+    if tipo in ('negativo', 'positivo', 'porcentaje'):
+        return _referencias(nodo[1])
+    if tipo == 'funcion':
+        return set().union(*(_referencias(argumento) for argumento in nodo[2]))
+    return set()
+
+
+# ===== Evaluación =====
+
+class _Contexto:
+    """Columnas de un bloque: {col: (datos, válidos)}"""
+
+    def __init__(self, n):
+        self.n = n
+        self.columnas = {}
+
+    def columna(self, col):
+        if col not in self.columnas:
+            datos = np.empty(self.n, dtype=object)
+            self.columnas[col] = (datos, np.ones(self.n, dtype=bool))
+        return self.columnas[col]
+
+
+def _evaluar(nodo, contexto):
+    tipo = nodo[0]
+    n = contexto.n
+    if tipo == 'constante':
+        valor = nodo[1]
+        if valor is None:
+            return _constante(0.0, n)
+        if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+            return _constante(float(valor), n)
+        return _constante(valor, n)
+    if tipo == 'referencia':
+        return contexto.columna(nodo[1])
+    if tipo == 'rango':
+        raise FormulaNoSoportada("rango fuera de SUM/MIN/MAX")
+    if tipo == 'negativo':
+        datos, validos = _numeros(_evaluar(nodo[1], contexto))
+        return -datos, validos
+    if tipo == 'positivo':
+        return _evaluar(nodo[1], contexto)
+    if tipo == 'porcentaje':
+        datos, validos = _numeros(_evaluar(nodo[1], contexto))
+        return datos / 100, validos
+    if tipo == 'op':
+        return _operacion(nodo[1], _evaluar(nodo[2], contexto), _evaluar(nodo[3], contexto))
+    nombre, argumentos = nodo[1], nodo[2]
+    return _FUNCIONES[nombre][0](argumentos, contexto)
+
+
+def _operacion(operador, a, b):
+    if operador in _OPERADORES_COMPARACION:
+        validos = a[1] & b[1]
+        if a[0].dtype.kind == 'f' and b[0].dtype.kind == 'f':
+            x, y = a[0], b[0]
+            resultado = {'=': x == y, '<>': x != y, '<': x < y, '>': x > y, '<=': x <= y, '>=': x >= y}[operador]
+            return resultado, validos
+        return _v_comparar(_objetos(a[0]), _objetos(b[0]), operador).astype(bool), validos
+    if operador == '&':
+        texto_a, ok_a = _v_texto(_objetos(a[0]))
+        texto_b, ok_b = _v_texto(_objetos(b[0]))
+        return texto_a + texto_b, a[1] & b[1] & ok_a.astype(bool) & ok_b.astype(bool)
+
+    x, validos_x = _numeros(a)
+    y, validos_y = _numeros(b)
+    validos = validos_x & validos_y
+    with np.errstate(all='ignore'):
+        if operador == '+':
+            resultado = x + y
+        elif operador == '-':
+            resultado = x - y
+        elif operador == '*':
+            resultado = x * y
+        elif operador == '/':
+            validos = validos & (y != 0)
+            resultado = x / np.where(y != 0, y, 1)
+        else:
+            resultado = np.power(x, y)
+    return resultado, validos & np.isfinite(resultado)
+
+
+def _f_redondeo(modo):
+    def funcion(argumentos, contexto):
+        x, validos_x = _numeros(_evaluar(argumentos[0], contexto))
+        d, validos_d = _numeros(_evaluar(argumentos[1], contexto))
+        validos = validos_x & validos_d
+        resultado = np.full(contexto.n, np.nan)
+        if validos.any():
+            resultado[validos] = _v_redondear(x[validos], d[validos], modo).astype(float)
+        return resultado, validos & np.isfinite(resultado)
+    return funcion
+
+
+def _f_int(argumentos, contexto):
+    x, validos = _numeros(_evaluar(argumentos[0], contexto))
+    return np.floor(x), validos
+
+
+def _f_abs(argumentos, contexto):
+    x, validos = _numeros(_evaluar(argumentos[0], contexto))
+    return np.abs(x), validos
+
+
+def _f_if(argumentos, contexto):
+    condicion, validos_c = _logicos(_evaluar(argumentos[0], contexto))
+    si = _evaluar(argumentos[1], contexto)
+    no = _evaluar(argumentos[2], contexto) if len(argumentos) > 2 else _constante(False, contexto.n)
+    validos = validos_c & np.where(condicion, si[1], no[1])
+    if si[0].dtype.kind == no[0].dtype.kind and si[0].dtype.kind in 'fb':
+        return np.where(condicion, si[0], no[0]), validos
+    return np.where(condicion, _objetos(si[0]), _objetos(no[0])), validos
+
+
+def _f_logica(reduccion, neutro):
+    def funcion(argumentos, contexto):
+        resultado = np.full(contexto.n, neutro)
+        validos = np.ones(contexto.n, dtype=bool)
+        for argumento in argumentos:
+            if argumento[0] in ('referencia', 'rango'):
+                columnas = [argumento[1]] if argumento[0] == 'referencia' else argumento[1]
+                for col in columnas:
+                    datos, validos_col = contexto.columna(col)
+                    # En referencias, vacías y texto se ignoran
+                    ignorar = np.array([v is None or isinstance(v, str) for v in _objetos(datos)], dtype=bool)
+                    logicos, validos_l = _logicos((datos, validos_col))
+                    resultado = reduccion(resultado, np.where(ignorar, neutro, logicos))
+                    validos &= validos_l | ignorar
+            else:
+                logicos, validos_l = _logicos(_evaluar(argumento, contexto))
+                resultado = reduccion(resultado, logicos)
+                validos &= validos_l
+        return resultado, validos
+    return funcion
+
+
+def _f_not(argumentos, contexto):
+    logicos, validos = _logicos(_evaluar(argumentos[0], contexto))
+    return ~logicos, validos
+
+
+def _f_agregado(reduccion):
+    def funcion(argumentos, contexto):
+        matriz = []
+        validos = np.ones(contexto.n, dtype=bool)
+        for argumento in argumentos:
+            if argumento[0] in ('referencia', 'rango'):
+                columnas = [argumento[1]] if argumento[0] == 'referencia' else argumento[1]
+                for col in columnas:
+                    datos, validos_col = contexto.columna(col)
+                    if datos.dtype == object:
+                        datos = _v_numero_referencia(datos).astype(float)
+                    elif datos.dtype.kind == 'b':
+                        datos = np.full(contexto.n, np.nan)
+                    matriz.append(datos)
+                    validos &= validos_col
+            else:
+                datos, validos_a = _numeros(_evaluar(argumento, contexto))
+                matriz.append(datos)
+                validos &= validos_a
+        matriz = np.vstack(matriz)
+        presentes = ~np.isnan(matriz)
+        with np.errstate(all='ignore'):
+            resultado = reduccion(np.where(presentes, matriz, 0.0), presentes)
+        return resultado, validos & np.isfinite(resultado)
+    return funcion
+
+
+def _suma(matriz, presentes):
+    return np.sum(matriz, axis=0)
+
+
+def _minimo(matriz, presentes):
+    return np.where(presentes.any(axis=0), np.min(np.where(presentes, matriz, np.inf), axis=0), 0.0)
+
+
+def _maximo(matriz, presentes):
+    return np.where(presentes.any(axis=0), np.max(np.where(presentes, matriz, -np.inf), axis=0), 0.0)
+
+
+def _f_parte_fecha(indice):
+    def funcion(argumentos, contexto):
+        serial, validos = _numeros(_evaluar(argumentos[0], contexto))
+        fechas, validos = _fechas(serial, validos)
+        return _partes_fecha(fechas)[indice].astype(float), validos
+    return funcion
+
+
+def _f_datedif(argumentos, contexto):
+    unidad = argumentos[2]
+    if unidad[0] != 'constante' or not isinstance(unidad[1], str) or unidad[1].upper() not in ('Y', 'M', 'D'):
+        raise FormulaNoSoportada("DATEDIF solo con unidad \"Y\", \"M\" o \"D\" fija")
+    inicio, validos_i = _numeros(_evaluar(argumentos[0], contexto))
+    fin, validos_f = _numeros(_evaluar(argumentos[1], contexto))
+    fechas_i, validos_i = _fechas(inicio, validos_i)
+    fechas_f, validos_f = _fechas(fin, validos_f)
+    validos = validos_i & validos_f & (np.floor(inicio) <= np.floor(fin))
+    anio_i, mes_i, dia_i = _partes_fecha(fechas_i)
+    anio_f, mes_f, dia_f = _partes_fecha(fechas_f)
+    unidad = unidad[1].upper()
+    if unidad == 'D':
+        resultado = (fechas_f - fechas_i).astype(int)
+    elif unidad == 'M':
+        resultado = (anio_f - anio_i) * 12 + (mes_f - mes_i) - (dia_f < dia_i)
+    else:
+        resultado = (anio_f - anio_i) - ((mes_f < mes_i) | ((mes_f == mes_i) & (dia_f < dia_i)))
+    return resultado.astype(float), validos
+
+
+def _f_days(argumentos, contexto):
+    fin, validos_f = _numeros(_evaluar(argumentos[0], contexto))
+    inicio, validos_i = _numeros(_evaluar(argumentos[1], contexto))
+    return np.trunc(fin) - np.trunc(inicio), validos_f & validos_i
+
+
+# Función -> (implementación, mínimo y máximo de argumentos)
+_FUNCIONES = {
+    'ROUND': (_f_redondeo(ROUND_HALF_UP), 2, 2),
+    'ROUNDUP': (_f_redondeo(ROUND_UP), 2, 2),
+    'ROUNDDOWN': (_f_redondeo(ROUND_DOWN), 2, 2),
+    'INT': (_f_int, 1, 1),
+    'ABS': (_f_abs, 1, 1),
+    'IF': (_f_if, 2, 3),
+    'AND': (_f_logica(np.logical_and, True), 1, 255),
+    'OR': (_f_logica(np.logical_or, False), 1, 255),
+    'NOT': (_f_not, 1, 1),
+    'SUM': (_f_agregado(_suma), 1, 255),
+    'MIN': (_f_agregado(_minimo), 1, 255),
+    'MAX': (_f_agregado(_maximo), 1, 255),
+    'YEAR': (_f_parte_fecha(0), 1, 1),
+    'MONTH': (_f_parte_fecha(1), 1, 1),
+    'DAY': (_f_parte_fecha(2), 1, 1),
+    'DATEDIF': (_f_datedif, 3, 3),
+    'DAYS': (_f_days, 2, 2),
+}
+
+
+class EvaluadorFormulas:
+    """Fórmulas de la fila plantilla compiladas una vez y evaluadas por bloques de filas
+
+    Args:
+        formulas: {col: texto de la fórmula tal como se escribe en la fila 6}
+        valor_fijo: función (fila, col) -> valor de la plantilla para referencias con '$'
+
+    `no_soportadas` queda con {col: motivo} de las fórmulas que no se calculan (fuera del
+    subconjunto, referencias circulares o que dependen de otra no soportada).
+    """
+
+    def __init__(self, formulas, valor_fijo):
+        self.formulas = dict(formulas)
+        self.no_soportadas = {}
+        arboles = {}
+        for col, formula in self.formulas.items():
+            try:
+                arboles[col] = _Analizador(formula, valor_fijo).analizar()
+            except FormulaNoSoportada as e:
+                self.no_soportadas[col] = str(e)
+
+        # Orden de evaluación: primero las columnas de las que dependen las demás
+        self.orden = []
+        estado = {}
+
+        def visitar(col):
+            if estado.get(col) == 'listo':
+                return col not in self.no_soportadas
+            if estado.get(col) == 'visitando':
+                self.no_soportadas.setdefault(col, "referencia circular")
+                return False
+            estado[col] = 'visitando'
+            ok = col in arboles
+            for dependencia in sorted(_referencias(arboles[col]) if ok else ()):
+                if dependencia in self.formulas and not visitar(dependencia):
+                    self.no_soportadas.setdefault(col, f"depende de la columna {dependencia}")
+                    ok = False
+            estado[col] = 'listo'
+            if ok and col not in self.no_soportadas:
+                self.orden.append(col)
+                return True
+            return False
+
+        for col in sorted(self.formulas):
+            visitar(col)
+        self._arboles = {col: arboles[col] for col in self.orden}
+        self.referencias = set().union(*(_referencias(arbol) for arbol in self._arboles.values()))
+
+    def evaluar(self, entradas, n):
+        """Valores de las fórmulas para un bloque de n filas
+
+        Args:
+            entradas: {col: arreglo object} con el valor final de cada celda leída y
+                      CALCULAR donde la celda conserva la fórmula de su columna
+        Returns:
+            dict: {col: arreglo object} con el valor calculado de cada fórmula
+                  (SIN_VALOR donde no se pudo calcular)
+        """
+        contexto = _Contexto(n)
+        pendientes = {}
+        for col, valores in entradas.items():
+            calcular = np.fromiter((v is CALCULAR for v in valores), dtype=bool, count=n)
+            datos = valores.copy()
+            datos[calcular] = None
+            # Un valor que se escribiría como fórmula tampoco tiene valor conocido
+            validos = ~calcular & ~np.asarray(_v_es_formula(datos), dtype=bool)
+            contexto.columnas[col] = (datos, validos)
+            pendientes[col] = calcular
+
+        resultados = {}
+        for col in self.orden:
+            datos, validos = _evaluar(self._arboles[col], contexto)
+            if datos.dtype.kind == 'f':
+                validos = validos & np.isfinite(datos)
+            resultados[col] = (datos, validos)
+            calcular = pendientes.get(col, np.ones(n, dtype=bool))
+            if col in contexto.columnas and not calcular.all():
+                previos, validos_previos = contexto.columnas[col]
+                contexto.columnas[col] = (
+                    np.where(calcular, _objetos(datos), previos),
+                    np.where(calcular, validos, validos_previos),
+                )
+            else:
+                contexto.columnas[col] = (datos, validos)
+
+        salida = {}
+        for col in self.formulas:
+            valores = np.empty(n, dtype=object)
+            if col in resultados:
+                datos, validos = resultados[col]
+                valores[:] = datos.tolist()
+                valores[~validos] = SIN_VALOR
+            else:
+                valores[:] = [SIN_VALOR] * n
+            salida[col] = valores
+        return salida
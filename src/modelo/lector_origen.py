@@ -0,0 +1,143 @@
+# src/modelo/lector_origen.py
+"""
+Lectura por streaming de la hoja origen (413/455)
+Entrega las filas de forma perezosa para que la memoria no crezca con el reporte
+"""
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from ..config import CONFIG_SISTEMA
+
+
+# Textos que pandas interpreta como vacíos al leer Excel (se replican para no alterar resultados)
+VALORES_NULOS = frozenset([
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan',
+    '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a',
+    'nan', 'null',
+    # Errores de Excel (pandas los convierte a NaN)
+    '#NULL!', '#DIV/0!', '#VALUE!', '#REF!', '#NAME?', '#NUM!',
+])
+
+
+def normalizar_valor(valor):
+    """Normaliza un valor crudo de celda igual que pd.read_excel"""
+    if valor is None:
+        return None
+    if isinstance(valor, str):
+        return None if valor in VALORES_NULOS else valor
+    if isinstance(valor, float) and valor.is_integer():
+        return int(valor)
+    return valor
+
+
+def crear_lector(ruta, nombre_hoja='Report_AseguradoraMensual', motor=None):
+    """Crea el lector según CONFIG_SISTEMA['LECTURA']['motor'] ('xml' u 'openpyxl')"""
+    if motor is None:
+        motor = CONFIG_SISTEMA.get('LECTURA', {}).get('motor', 'openpyxl')
+    if motor == 'xml':
+        from .lector_xml import LectorXml
+        return LectorXml(ruta, nombre_hoja)
+    return LectorOrigen(ruta, nombre_hoja)
+
+
+class LectorOrigen:
+    """Lee la hoja origen fila por fila con openpyxl en modo read_only"""
+
+    def __init__(self, ruta, nombre_hoja='Report_AseguradoraMensual'):
+        self.ruta = ruta
+        self.nombre_hoja = nombre_hoja
+        self.filas_estimadas = None
+        self._wb = None
+        self._iterador = None
+        self._buffer = []
+        self._agotado = False
+        self._seleccion = None
+
+    def __enter__(self):
+        self.abrir()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cerrar()
+        return False
+
+    def abrir(self):
+        """Abre el libro en modo lectura sin materializar la hoja"""
+        if self._wb is not None:
+            return
+        self._wb = load_workbook(self.ruta, read_only=True, data_only=True, keep_links=False)
+        if self.nombre_hoja not in self._wb.sheetnames:
+            self.cerrar()
+            raise ValueError(f"Worksheet named '{self.nombre_hoja}' not found")
+        ws = self._wb[self.nombre_hoja]
+        # La dimensión declarada sirve como estimación; luego se descarta porque puede estar mal
+        self.filas_estimadas = ws.max_row
+        ws.reset_dimensions()
+        self._iterador = ws.iter_rows(values_only=True)
+
+    def cerrar(self):
+        """Libera el archivo origen"""
+        if self._wb is not None:
+            self._wb.close()
+        self._wb = None
+        self._iterador = None
+
+    def proyectar(self, columnas):
+        """Restringe las filas siguientes a las columnas indicadas (índices base 0)
+
+        Las filas entregadas quedan con una posición por columna, en el orden dado.
+        Las filas ya leídas en buffer (sonda de encabezados) se proyectan también.
+        """
+        self._seleccion = list(columnas)
+        self._buffer = [self._proyectar(fila) for fila in self._buffer]
+
+    def _proyectar(self, fila):
+        """Toma de una fila completa solo las columnas seleccionadas"""
+        n = len(fila)
+        return tuple(fila[i] if i < n else None for i in self._seleccion)
+
+    def _siguiente(self):
+        """Lee la siguiente fila del archivo (o None al terminar)"""
+        if self._agotado or self._iterador is None:
+            return None
+        try:
+            fila = next(self._iterador)
+        except StopIteration:
+            self._agotado = True
+            return None
+        if self._seleccion is not None:
+            n = len(fila)
+            return tuple(normalizar_valor(fila[i]) if i < n else None for i in self._seleccion)
+        return tuple(normalizar_valor(v) for v in fila)
+
+    def inicio(self, n):
+        """Retorna las primeras n filas (quedan en buffer para la iteración posterior)"""
+        while len(self._buffer) < n:
+            fila = self._siguiente()
+            if fila is None:
+                break
+            self._buffer.append(fila)
+        return self._buffer[:n]
+
+    def filas(self, desde=0):
+        """Genera las filas a partir del índice `desde` (base 0) sin cargarlas todas"""
+        for fila in self._buffer[desde:]:
+            yield fila
+        idx = len(self._buffer)
+        while True:
+            fila = self._siguiente()
+            if fila is None:
+                break
+            if idx >= desde:
+                yield fila
+            idx += 1
+
+    def dataframe(self, desde=0):
+        """Materializa las filas restantes en un DataFrame (header=None, como pd.read_excel)"""
+        filas = list(self.filas(desde))
+        # pandas descarta las filas vacías del final
+        while filas and not any(v is not None for v in filas[-1]):
+            filas.pop()
+        ancho = max((len(f) for f in filas), default=0)
+        return pd.DataFrame([f + (None,) * (ancho - len(f)) for f in filas])
@@ -0,0 +1,355 @@
+# src/modelo/lector_xml.py
+"""
+Motor de lectura nativo para xlsx (413/455)
+Lee xl/worksheets/sheetN.xml directamente del zip con expat, sin el modelo de celdas de openpyxl
+"""
+
+import posixpath
+import zipfile
+from xml.etree.ElementTree import iterparse
+from xml.parsers import expat
+
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format, is_timedelta_format
+from openpyxl.utils.datetime import from_excel, from_ISO8601, WINDOWS_EPOCH, CALENDAR_MAC_1904
+
+from .lector_origen import LectorOrigen, VALORES_NULOS
+
+
+NS_MAIN = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+NS_REL = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+NS_PKG_REL = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+# Tipos de estilo numérico
+_NUMERO = 0
+_FECHA = 1
+_DURACION = 2
+
+_TAMANO_BLOQUE = 1 << 16
+
+
+def _ruta_relacion(base, destino):
+    """Resuelve el destino de una relación respecto a la carpeta de la parte origen"""
+    if destino.startswith('/'):
+        return destino.lstrip('/')
+    return posixpath.normpath(posixpath.join(posixpath.dirname(base), destino))
+
+
+def _leer_relaciones(zf, parte):
+    """Retorna {rId: (tipo, ruta)} para una parte del paquete"""
+    carpeta, nombre = posixpath.split(parte)
+    ruta_rels = posixpath.join(carpeta, '_rels', nombre + '.rels')
+    relaciones = {}
+    if ruta_rels not in zf.namelist():
+        return relaciones
+    with zf.open(ruta_rels) as f:
+        for _, elem in iterparse(f):
+            if elem.tag == f'{{{NS_PKG_REL}}}Relationship':
+                relaciones[elem.get('Id')] = (elem.get('Type', ''), _ruta_relacion(parte, elem.get('Target', '')))
+    return relaciones
+
+
+def _indice_columna(referencia):
+    """Convierte 'AB12' en el índice de columna base 1 (28)"""
+    col = 0
+    for caracter in referencia:
+        codigo = ord(caracter)
+        if 65 <= codigo <= 90:
+            col = col * 26 + codigo - 64
+        elif 97 <= codigo <= 122:
+            col = col * 26 + codigo - 96
+        else:
+            break
+    return col
+
+
+def leer_textos_compartidos(zf, ruta):
+    """Lee la tabla de shared strings una sola vez (ya normalizada como pd.read_excel)"""
+    textos = []
+    if not ruta:
+        return textos
+    tag_si = f'{{{NS_MAIN}}}si'
+    tag_t = f'{{{NS_MAIN}}}t'
+    tag_rph = f'{{{NS_MAIN}}}rPh'
+    with zf.open(ruta) as f:
+        for _, elem in iterparse(f):
+            if elem.tag != tag_si:
+                continue
+            partes = []
+            for hijo in elem:
+                if hijo.tag == tag_t:
+                    partes.append(hijo.text or '')
+                elif hijo.tag != tag_rph:
+                    # Run de texto enriquecido: <r><rPr/><t>...</t></r>
+                    t = hijo.find(tag_t)
+                    if t is not None:
+                        partes.append(t.text or '')
+            texto = ''.join(partes).replace('x005F_', '')
+            textos.append(None if texto in VALORES_NULOS else texto)
+            elem.clear()
+    return textos
+
+
+def leer_tipos_estilo(zf, ruta):
+    """Clasifica cada xf de cellXfs como número, fecha o duración según su numFmt"""
+    tipos = []
+    if not ruta:
+        return tipos
+    personalizados = {}
+    tag_numfmt = f'{{{NS_MAIN}}}numFmt'
+    tag_cellxfs = f'{{{NS_MAIN}}}cellXfs'
+    with zf.open(ruta) as f:
+        for _, elem in iterparse(f):
+            if elem.tag == tag_numfmt:
+                personalizados[int(elem.get('numFmtId'))] = elem.get('formatCode')
+            elif elem.tag == tag_cellxfs:
+                for xf in elem:
+                    id_fmt = int(xf.get('numFmtId', 0))
+                    formato = personalizados.get(id_fmt, BUILTIN_FORMATS.get(id_fmt))
+                    if is_timedelta_format(formato):
+                        tipos.append(_DURACION)
+                    elif is_date_format(formato):
+                        tipos.append(_FECHA)
+                    else:
+                        tipos.append(_NUMERO)
+                break
+    return tipos
+
+
+class LectorXml(LectorOrigen):
+    """Lector por streaming que parsea el XML de la hoja con expat"""
+
+    def __init__(self, ruta, nombre_hoja='Report_AseguradoraMensual'):
+        super().__init__(ruta, nombre_hoja)
+        self._zip = None
+        self._ruta_hoja = None
+        self._textos = []
+        self._tipos_estilo = []
+        self._epoch = WINDOWS_EPOCH
+        self._posiciones = None
+
+    def proyectar(self, columnas):
+        """Además de proyectar, evita convertir las celdas de columnas no requeridas"""
+        super().proyectar(columnas)
+        self._posiciones = {col + 1: pos for pos, col in enumerate(self._seleccion)}
+
+    def abrir(self):
+        """Ubica la hoja dentro del paquete y carga shared strings y estilos"""
+        if self._zip is not None:
+            return
+        self._zip = zipfile.ZipFile(self.ruta)
+        try:
+            self._preparar()
+        except Exception:
+            self.cerrar()
+            raise
+        self._iterador = self._filas_xml()
+
+    def _preparar(self):
+        """Lee workbook.xml, sus relaciones, shared strings y estilos"""
+        zf = self._zip
+        ruta_libro = 'xl/workbook.xml'
+        for tipo, ruta in _leer_relaciones(zf, '').values():
+            if tipo.endswith('/officeDocument'):
+                ruta_libro = ruta
+                break
+
+        relaciones = _leer_relaciones(zf, ruta_libro)
+        id_hoja = None
+        with zf.open(ruta_libro) as f:
+            for _, elem in iterparse(f):
+                if elem.tag == f'{{{NS_MAIN}}}workbookPr':
+                    if elem.get('date1904') in ('1', 'true'):
+                        self._epoch = CALENDAR_MAC_1904
+                elif elem.tag == f'{{{NS_MAIN}}}sheet' and elem.get('name') == self.nombre_hoja:
+                    id_hoja = elem.get(f'{{{NS_REL}}}id')
+        if id_hoja is None or id_hoja not in relaciones:
+            raise ValueError(f"Worksheet named '{self.nombre_hoja}' not found")
+        self._ruta_hoja = relaciones[id_hoja][1]
+
+        ruta_textos = ruta_estilos = None
+        for tipo, ruta in relaciones.values():
+            if tipo.endswith('/sharedStrings'):
+                ruta_textos = ruta
+            elif tipo.endswith('/styles'):
+                ruta_estilos = ruta
+        self._textos = leer_textos_compartidos(zf, ruta_textos)
+        self._tipos_estilo = leer_tipos_estilo(zf, ruta_estilos)
+        self.filas_estimadas = self._leer_dimension()
+
+    def _leer_dimension(self):
+        """Lee <dimension ref="A1:X123"> del inicio de la hoja (solo como estimación)"""
+        with self._zip.open(self._ruta_hoja) as f:
+            cabecera = f.read(4096).decode('utf-8', 'ignore')
+        inicio = cabecera.find('<dimension ')
+        if inicio < 0:
+            return None
+        ref = cabecera[inicio:].split('ref="', 1)[-1].split('"', 1)[0]
+        final = ref.split(':')[-1]
+        digitos = ''.join(c for c in final if c.isdigit())
+        return int(digitos) if digitos else None
+
+    def cerrar(self):
+        """Libera el zip origen"""
+        if self._zip is not None:
+            self._zip.close()
+        self._zip = None
+        self._iterador = None
+
+    def _filas_xml(self):
+        """Genera las filas de la hoja a medida que expat las completa"""
+        lector = self
+        textos = self._textos
+        tipos_estilo = self._tipos_estilo
+        n_estilos = len(tipos_estilo)
+        epoch = self._epoch
+
+        listas = []
+        celdas = {}
+        columnas = {}
+        fila_actual = 0
+        col = 0
+        tipo = None
+        estilo = 0
+        texto_celda = ''
+        capturar = False
+        fonetica = False
+        posiciones_fila = None
+        # Nombres de etiqueta (algunos generadores usan prefijo, p. ej. 'x:c')
+        tag_c = 'c'
+        tag_v = 'v'
+        tag_t = 't'
+        tag_row = 'row'
+        tag_rph = 'rPh'
+
+        def convertir(tipo, texto, estilo):
+            if not texto:
+                return None
+            if tipo is None or tipo == 'n':
+                clase = tipos_estilo[estilo] if estilo < n_estilos else _NUMERO
+                if '.' in texto or 'E' in texto or 'e' in texto:
+                    numero = float(texto)
+                    if clase == _NUMERO and numero.is_integer():
+                        return int(numero)
+                else:
+                    numero = int(texto)
+                if clase == _NUMERO:
+                    return numero
+                try:
+                    return from_excel(numero, epoch, timedelta=clase == _DURACION)
+                except (OverflowError, ValueError):
+                    return None
+            if tipo == 's':
+                return textos[int(texto)]
+            if tipo == 'str' or tipo == 'inlineStr':
+                return None if texto in VALORES_NULOS else texto
+            if tipo == 'b':
+                return bool(int(texto))
+            if tipo == 'd':
+                return from_ISO8601(texto)
+            # 'e' (errores de Excel): pandas los deja en NaN
+            return None
+
+        def inicio(nombre, attrs):
+            nonlocal fila_actual, col, tipo, estilo, texto_celda, capturar, fonetica, posiciones_fila
+            if nombre == tag_v:
+                capturar = True
+            elif nombre == tag_c:
+                ref = attrs.get('r')
+                if ref:
+                    letras = ref.rstrip('0123456789')
+                    col = columnas.get(letras)
+                    if col is None:
+                        col = columnas[letras] = _indice_columna(letras)
+                else:
+                    col += 1
+                tipo = attrs.get('t')
+                s = attrs.get('s')
+                estilo = int(s) if s else 0
+                texto_celda = ''
+            elif nombre == tag_t:
+                capturar = not fonetica
+            elif nombre == tag_row:
+                r = attrs.get('r')
+                fila_actual = int(r) if r else fila_actual + 1
+                col = 0
+                celdas.clear()
+                # La proyección se fija por fila (puede cambiar entre bloques del parser)
+                posiciones_fila = lector._posiciones
+            elif nombre == tag_rph:
+                fonetica = True
+
+        def fin(nombre):
+            nonlocal capturar, fonetica
+            if nombre == tag_v:
+                capturar = False
+            elif nombre == tag_c:
+                if texto_celda:
+                    posiciones = posiciones_fila
+                    if posiciones is None:
+                        valor = convertir(tipo, texto_celda, estilo)
+                        if valor is not None:
+                            celdas[col] = valor
+                    elif col in posiciones:
+                        # Solo se convierten las columnas proyectadas
+                        valor = convertir(tipo, texto_celda, estilo)
+                        if valor is not None:
+                            celdas[posiciones[col] + 1] = valor
+            elif nombre == tag_t:
+                capturar = False
+            elif nombre == tag_row:
+                proyectada = posiciones_fila is not None
+                ancho = len(posiciones_fila) if proyectada else (max(celdas) if celdas else 0)
+                fila = [None] * ancho
+                for c, valor in celdas.items():
+                    fila[c - 1] = valor
+                listas.append((fila_actual, tuple(fila), proyectada))
+            elif nombre == tag_rph:
+                fonetica = False
+
+        def texto(datos):
+            nonlocal texto_celda
+            if capturar:
+                texto_celda += datos
+
+        def raiz(nombre, attrs):
+            # Se detecta el prefijo en la etiqueta raíz y se instalan los manejadores reales
+            nonlocal tag_c, tag_v, tag_t, tag_row, tag_rph
+            if ':' in nombre:
+                prefijo = nombre.rsplit(':', 1)[0] + ':'
+                tag_c, tag_v, tag_t = prefijo + 'c', prefijo + 'v', prefijo + 't'
+                tag_row, tag_rph = prefijo + 'row', prefijo + 'rPh'
+            parser.StartElementHandler = inicio
+            parser.EndElementHandler = fin
+            parser.CharacterDataHandler = texto
+
+        parser = expat.ParserCreate()
+        parser.buffer_text = True
+        parser.StartElementHandler = raiz
+
+        fila_anterior = 0
+        with self._zip.open(self._ruta_hoja) as f:
+            while True:
+                bloque = f.read(_TAMANO_BLOQUE)
+                parser.Parse(bloque, not bloque)
+                for numero_fila, fila, proyectada in listas:
+                    # Filas ausentes en el XML se entregan vacías para conservar los índices
+                    for _ in range(fila_anterior + 1, numero_fila):
+                        yield self._proyectar(()) if self._seleccion is not None else ()
+                    fila_anterior = numero_fila
+                    if self._seleccion is not None and not proyectada:
+                        # Fila parseada antes de fijar la proyección
+                        fila = self._proyectar(fila)
+                    yield fila
+                listas.clear()
+                if not bloque:
+                    break
+
+    def _siguiente(self):
+        """Las filas del motor XML ya vienen normalizadas"""
+        if self._agotado or self._iterador is None:
+            return None
+        try:
+            return next(self._iterador)
+        except StopIteration:
+            self._agotado = True
+            return None
@@ -1,146 +1,226 @@
 # src/modelo/mapeo_columnas.py
 """
 Lógica de mapeo inteligente entre columnas origen y destino
+Los encabezados destino se compilan una vez en un índice (tablas exactas, trigramas
+y palabras) para que cada encabezado origen se resuelva sin recorrer todo el destino
 """
 
 import pandas as pd
 
+from .cache_mapeo import clave_mapeo
 
-def obtener_mapeo_columnas(headers_origen, headers_destino, cache_mapeo=None, cache_headers=None):
+
+# Reglas con las que se puede mapear una columna (en orden de prioridad)
+REGLA_CACHE = 'cache'
+REGLA_CONOCIDO = 'conocido'
+REGLA_EXACTO = 'exacto'
+REGLA_PARCIAL = 'parcial'
+REGLA_PALABRA = 'palabra'
+
+# Largo mínimo de una coincidencia parcial (encabezado contenido en otro)
+_LARGO_MINIMO_PARCIAL = 5
+
+# Índices destino compilados, por encabezados de la plantilla
+_indices_compilados = {}
+_MAX_INDICES = 8
+
+MAPEOS_CONOCIDOS = {
+    'PRIMER APELLIDO': ['PRIMER APELLIDO'],
+    'SEGUNDO APELLIDO': ['SEGUNDO APELLIDO'],
+    'PRIMER NOMBRE': ['PRIMER NOMBRE'],
+    'SEGUNDO NOMBRE': ['SEGUNDO NOMBRE'],
+    'OFICINA': ['OFICINA'],
+    'TIPO IDENTIFICACION': ['TIPO IDENTIFICACION', 'TIPO IDENTIFICACIÓN'],
+    'NUMERO DE IDENTIFICACION': ['NUMERO DE IDENTIFICACION', 'NUMERO DE IDENTIFICACIÓN', 'NÚMERO DE IDENTIFICACION'],
+    'FECHA DE NACIMIENTO': ['FECHA DE NACIMIENTO'],
+    'SEXO/GENERO': ['SEXO/GENERO', 'SEXO', 'GENERO'],
+    'ESTADO CIVIL': ['ESTADO CIVIL'],
+    'NACIONALIDAD': ['NACIONALIDAD ACTUAL', 'NACIONALIDAD', 'NACIONALIDAD ACTUAL '],
+    'PAIS DE ORIGEN': ['PAIS DE ORIGEN', 'PAÍS DE ORIGEN', 'PAIS DE ORIGEN '],
+    'PROVINCIA': ['PROVINCIA', 'PROVINCIA ', ' PROVINCIA', 'PROVINCIA DE', 'PROVINCIA DEL'],
+    'CIUDAD': ['CIUDAD', 'CIUDAD ', ' CIUDAD', 'CIUDAD DE', 'CIUDAD DEL'],
+    'DIRECCION ': ['DIRECCION', 'DIRECCIÓN', 'DIRECCION '],
+    'TELEFONO CASA': ['TELEFONO CASA', 'TELÉFONO CASA'],
+    'TELEFONO TRABAJO': ['TELEFONO TRABAJO', 'TELÉFONO TRABAJO'],
+    'CELULAR': ['CELULAR'],
+    'DIRECCION TRABAJO': ['DIRECCION TRABAJO', 'DIRECCIÓN TRABAJO'],
+    'EMAIL': ['EMAIL', 'CORREO', 'E-MAIL'],
+    'OCUPACION': ['OCUPACION', 'OCUPACIÓN'],
+    'ACTIVIDAD ECONOMICA': ['ACTIVIDAD ECONOMICA', 'ACTIVIDAD ECONÓMICA'],
+    'INGRESOS': ['INGRESOS'],
+    'PATRIMONIO': ['PATRIMONIO'],
+    'MONTO CREDITO': ['MONTO CREDITO', 'MONTO CRÉDITO'],
+    'FECHA DE INICIO DE CREDITO': ['FECHA DE INICIO DE CREDITO', 'FECHA DE INICIO DE CRÉDITO'],
+    'FECHA DE TERMINACION DE CREDITO': ['FECHA DE TERMINACION DE CREDITO', 'FECHA DE TERMINACIÓN DE CRÉDITO'],
+    'PLAZO DE CREDITO': ['PLAZO DE CREDITO', 'PLAZO DE CRÉDITO'],
+    'PRIMA NETA': ['PRIMA NETA'],
+}
+
+
+def normalizar_encabezado(valor):
+    """Mayúsculas y espacios colapsados"""
+    return ' '.join(str(valor).strip().upper().split())
+
+
+def _trigramas(texto):
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class IndiceEncabezados:
+    """Encabezados destino compilados para resolver el mapeo en tiempo lineal"""
+
+    def __init__(self, headers_destino):
+        # Nombre destino -> columna (base 1); una repetición se queda con la última columna
+        self.nombres = {}
+        # Palabra -> [(columna, nombre, tiene_pocas_palabras)] en orden de columnas
+        self.parciales = {}
+        for idx, cell in enumerate(headers_destino):
+            if cell.value:
+                nombre_limpio = str(cell.value).strip().upper()
+                self.nombres[nombre_limpio] = idx + 1
+                nombre_sin_espacios = nombre_limpio.replace('  ', ' ')
+                if nombre_sin_espacios != nombre_limpio:
+                    self.nombres[nombre_sin_espacios] = idx + 1
+                pocas_palabras = len(nombre_limpio.split()) <= 5
+                for palabra in nombre_limpio.split():
+                    if len(palabra) > 2:
+                        self.parciales.setdefault(palabra, []).append((idx + 1, nombre_limpio, pocas_palabras))
+
+        # Posición de cada nombre: define el desempate de las coincidencias parciales
+        self.orden = {nombre: pos for pos, nombre in enumerate(self.nombres)}
+        self.largos = sorted({len(nombre) for nombre in self.nombres}, reverse=True)
+        self.trigramas = {}
+        for nombre in self.nombres:
+            for trigrama in _trigramas(nombre):
+                self.trigramas.setdefault(trigrama, []).append(nombre)
+
+        # Columna destino de cada mapeo conocido (la primera variante presente)
+        self.conocidos = []
+        for clave, posibles_dest in MAPEOS_CONOCIDOS.items():
+            for nombre_dest in posibles_dest:
+                nombre_dest_limpio = ' '.join(nombre_dest.split())
+                col = self.nombres.get(nombre_dest_limpio) or self.nombres.get(nombre_dest)
+                if col:
+                    self.conocidos.append((' '.join(clave.split()), col))
+                    break
+
+    def mapear(self, headers_origen):
+        """Mapeo {idx_origen: col_destino} y la regla que resolvió cada columna"""
+        mapeo = {}
+        reglas = {}
+        usadas = set()
+
+        def asignar(idx_origen, col, regla):
+            mapeo[idx_origen] = col
+            reglas[idx_origen] = regla
+            usadas.add(col)
+
+        encabezados = [
+            normalizar_encabezado(header) if pd.notna(header) else None
+            for header in headers_origen
+        ]
+
+        for idx_origen, header in enumerate(encabezados):
+            if header is not None:
+                col = self._conocido(header)
+                if col:
+                    asignar(idx_origen, col, REGLA_CONOCIDO)
+
+        for idx_origen, header in enumerate(encabezados):
+            if idx_origen in mapeo or header is None:
+                continue
+            if header in self.nombres:
+                asignar(idx_origen, self.nombres[header], REGLA_EXACTO)
+                continue
+            col = self._parcial(header)
+            if col:
+                asignar(idx_origen, col, REGLA_PARCIAL)
+                continue
+            col = self._por_palabra(header, usadas)
+            if col:
+                asignar(idx_origen, col, REGLA_PALABRA)
+
+        return mapeo, reglas
+
+    def _conocido(self, header):
+        """Primer mapeo conocido que coincide o se contiene en el encabezado (o al revés)"""
+        for clave, col in self.conocidos:
+            if header == clave or clave in header or header in clave:
+                return col
+        return None
+
+    def _parcial(self, header):
+        """Nombre destino con la coincidencia de substring más larga (el primero ante empates)"""
+        if len(header) < _LARGO_MINIMO_PARCIAL:
+            return None
+        # Un nombre que contiene al encabezado gana a cualquier nombre contenido en él
+        trigramas = [self.trigramas.get(t, ()) for t in _trigramas(header)]
+        for nombre in min(trigramas, key=len):
+            if header in nombre:
+                return self.nombres[nombre]
+        # Nombres contenidos en el encabezado, del más largo al más corto
+        for largo in self.largos:
+            if largo >= len(header):
+                continue
+            if largo < _LARGO_MINIMO_PARCIAL:
+                break
+            candidatos = [
+                header[i:i + largo] for i in range(len(header) - largo + 1)
+                if header[i:i + largo] in self.nombres
+            ]
+            if candidatos:
+                return self.nombres[min(candidatos, key=self.orden.__getitem__)]
+        return None
+
+    def _por_palabra(self, header, usadas):
+        """Primera columna libre y corta que comparte una palabra con el encabezado"""
+        for palabra in header.split():
+            if len(palabra) > 2:
+                for col, _, pocas_palabras in self.parciales.get(palabra, ()):
+                    if col not in usadas and pocas_palabras:
+                        return col
+        return None
+
+
+def indice_encabezados(headers_destino):
+    """Índice compilado para los encabezados destino (se reutiliza entre ejecuciones)"""
+    clave = tuple(cell.value for cell in headers_destino)
+    indice = _indices_compilados.get(clave)
+    if indice is None:
+        indice = IndiceEncabezados(headers_destino)
+        if len(_indices_compilados) >= _MAX_INDICES:
+            _indices_compilados.pop(next(iter(_indices_compilados), None), None)
+        _indices_compilados[clave] = indice
+    return indice
+
+
+def obtener_mapeo_columnas(headers_origen, headers_destino, cache=None, poliza=None, reglas=None):
     """
     Obtiene mapeo de columnas replicando lógica del transformador original
-    
+
     Args:
         headers_origen: Lista de headers del archivo origen
         headers_destino: Lista de celdas de headers del archivo destino
-        cache_mapeo: Cache de mapeo previo (opcional)
-        cache_headers: Cache de headers previos (opcional)
-    
+        cache: CacheMapeo donde buscar/guardar el resultado (opcional)
+        poliza: Identificador de la póliza, parte de la clave del cache
+        reglas: dict que se completa con {idx_origen: regla} (opcional)
+
     Returns:
         dict: Mapeo {idx_origen: idx_destino}
     """
-    # Usar cache si headers no cambiaron
-    if cache_mapeo is not None and cache_headers is not None:
-        if len(cache_headers) == len(headers_destino):
-            cache_val = cache_headers[0].value if hasattr(cache_headers[0], 'value') else None
-            current_val = headers_destino[0].value if hasattr(headers_destino[0], 'value') else None
-            if cache_val == current_val:
-                return cache_mapeo.copy()
-
-    mapeo = {}
-    nombres_destino = {}
-    nombres_destino_parciales = {}
-
-    for idx, cell in enumerate(headers_destino):
-        if cell.value:
-            nombre_limpio = str(cell.value).strip().upper()
-            nombres_destino[nombre_limpio] = idx + 1
-            nombre_sin_espacios = nombre_limpio.replace('  ', ' ')
-            if nombre_sin_espacios != nombre_limpio:
-                nombres_destino[nombre_sin_espacios] = idx + 1
-            palabras = nombre_limpio.split()
-            for palabra in palabras:
-                if len(palabra) > 2:
-                    if palabra not in nombres_destino_parciales:
-                        nombres_destino_parciales[palabra] = []
-                    nombres_destino_parciales[palabra].append((idx + 1, nombre_limpio))
-
-    mapeos_conocidos = {
-        'PRIMER APELLIDO': ['PRIMER APELLIDO'],
-        'SEGUNDO APELLIDO': ['SEGUNDO APELLIDO'],
-        'PRIMER NOMBRE': ['PRIMER NOMBRE'],
-        'SEGUNDO NOMBRE': ['SEGUNDO NOMBRE'],
-        'OFICINA': ['OFICINA'],
-        'TIPO IDENTIFICACION': ['TIPO IDENTIFICACION', 'TIPO IDENTIFICACIÓN'],
-        'NUMERO DE IDENTIFICACION': ['NUMERO DE IDENTIFICACION', 'NUMERO DE IDENTIFICACIÓN', 'NÚMERO DE IDENTIFICACION'],
-        'FECHA DE NACIMIENTO': ['FECHA DE NACIMIENTO'],
-        'SEXO/GENERO': ['SEXO/GENERO', 'SEXO', 'GENERO'],
-        'ESTADO CIVIL': ['ESTADO CIVIL'],
-        'NACIONALIDAD': ['NACIONALIDAD ACTUAL', 'NACIONALIDAD', 'NACIONALIDAD ACTUAL '],
-        'PAIS DE ORIGEN': ['PAIS DE ORIGEN', 'PAÍS DE ORIGEN', 'PAIS DE ORIGEN '],
-        'PROVINCIA': ['PROVINCIA', 'PROVINCIA ', ' PROVINCIA', 'PROVINCIA DE', 'PROVINCIA DEL'],
-        'CIUDAD': ['CIUDAD', 'CIUDAD ', ' CIUDAD', 'CIUDAD DE', 'CIUDAD DEL'],
-        'DIRECCION ': ['DIRECCION', 'DIRECCIÓN', 'DIRECCION '],
-        'TELEFONO CASA': ['TELEFONO CASA', 'TELÉFONO CASA'],
-        'TELEFONO TRABAJO': ['TELEFONO TRABAJO', 'TELÉFONO TRABAJO'],
-        'CELULAR': ['CELULAR'],
-        'DIRECCION TRABAJO': ['DIRECCION TRABAJO', 'DIRECCIÓN TRABAJO'],
-        'EMAIL': ['EMAIL', 'CORREO', 'E-MAIL'],
-        'OCUPACION': ['OCUPACION', 'OCUPACIÓN'],
-        'ACTIVIDAD ECONOMICA': ['ACTIVIDAD ECONOMICA', 'ACTIVIDAD ECONÓMICA'],
-        'INGRESOS': ['INGRESOS'],
-        'PATRIMONIO': ['PATRIMONIO'],
-        'MONTO CREDITO': ['MONTO CREDITO', 'MONTO CRÉDITO'],
-        'FECHA DE INICIO DE CREDITO': ['FECHA DE INICIO DE CREDITO', 'FECHA DE INICIO DE CRÉDITO'],
-        'FECHA DE TERMINACION DE CREDITO': ['FECHA DE TERMINACION DE CREDITO', 'FECHA DE TERMINACIÓN DE CRÉDITO'],
-        'PLAZO DE CREDITO': ['PLAZO DE CREDITO', 'PLAZO DE CRÉDITO'],
-        'PRIMA NETA': ['PRIMA NETA'],
-    }
-
-    for idx_origen, header_orig in enumerate(headers_origen):
-        if pd.notna(header_orig):
-            header_orig_str = str(header_orig).strip().upper()
-            header_orig_str_limpio = ' '.join(header_orig_str.split())
-
-            for key_orig, posibles_dest in mapeos_conocidos.items():
-                key_orig_limpio = ' '.join(key_orig.split())
-                if header_orig_str_limpio == key_orig_limpio or key_orig_limpio in header_orig_str_limpio or header_orig_str_limpio in key_orig_limpio:
-                    for nombre_dest in posibles_dest:
-                        nombre_dest_limpio = ' '.join(nombre_dest.split())
-                        if nombre_dest_limpio in nombres_destino:
-                            mapeo[idx_origen] = nombres_destino[nombre_dest_limpio]
-                            break
-                        if nombre_dest in nombres_destino:
-                            mapeo[idx_origen] = nombres_destino[nombre_dest]
-                            break
-                    if idx_origen in mapeo:
-                        break
-                elif key_orig in ['PROVINCIA', 'CIUDAD'] and key_orig in header_orig_str_limpio:
-                    for nom_dest, col_idx in nombres_destino.items():
-                        if key_orig in nom_dest and 'PAIS' not in nom_dest:
-                            if idx_origen not in mapeo or len(nom_dest) <= len(key_orig) + 5:
-                                mapeo[idx_origen] = col_idx
-                            break
-                    if idx_origen in mapeo:
-                        break
-
-    for idx_origen, header_orig in enumerate(headers_origen):
-        if idx_origen in mapeo:
-            continue
-        if pd.notna(header_orig):
-            header_orig_str = str(header_orig).strip().upper()
-            header_orig_str_limpio = ' '.join(header_orig_str.split())
-
-            if header_orig_str_limpio in nombres_destino:
-                mapeo[idx_origen] = nombres_destino[header_orig_str_limpio]
-                continue
-
-            mejor_coincidencia = None
-            mejor_puntaje = 0
-            for nom_dest, col_idx in nombres_destino.items():
-                if header_orig_str_limpio == nom_dest:
-                    mejor_coincidencia = col_idx
-                    mejor_puntaje = 100
-                    break
-                elif header_orig_str_limpio in nom_dest or nom_dest in header_orig_str_limpio:
-                    coincidencia_len = min(len(header_orig_str_limpio), len(nom_dest))
-                    if coincidencia_len > mejor_puntaje:
-                        mejor_puntaje = coincidencia_len
-                        mejor_coincidencia = col_idx
-
-            if mejor_coincidencia and mejor_puntaje >= 5:
-                mapeo[idx_origen] = mejor_coincidencia
-                continue
-
-            palabras_origen = [p for p in header_orig_str_limpio.split() if len(p) > 2]
-            for palabra in palabras_origen:
-                if palabra in nombres_destino_parciales:
-                    for col_idx, nom_dest in nombres_destino_parciales[palabra]:
-                        if col_idx not in mapeo.values():
-                            if len(nom_dest.split()) <= 5:
-                                mapeo[idx_origen] = col_idx
-                                break
-                    if idx_origen in mapeo:
-                        break
+    # Un diseño de reporte ya visto (mismos encabezados completos y póliza) no se recalcula
+    clave = None
+    if cache is not None:
+        clave = clave_mapeo(headers_origen, headers_destino, poliza)
+        mapeo = cache.obtener(clave)
+        if mapeo is not None:
+            if reglas is not None:
+                reglas.update(dict.fromkeys(mapeo, REGLA_CACHE))
+            return mapeo
 
+    mapeo, reglas_mapeo = indice_encabezados(headers_destino).mapear(headers_origen)
+    if reglas is not None:
+        reglas.update(reglas_mapeo)
+    if clave is not None:
+        cache.guardar(clave, mapeo)
     return mapeo
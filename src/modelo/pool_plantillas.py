@@ -0,0 +1,162 @@
+# src/modelo/pool_plantillas.py
+"""
+Pool de plantillas precargadas
+Cada plantilla se carga una sola vez (en segundo plano al iniciar la aplicación) y
+se conserva como snapshot serializado; cada transformación recibe una copia propia.
+"""
+
+import copyreg
+import hashlib
+import io
+import logging
+import os
+import pickle
+import threading
+
+from openpyxl import load_workbook
+from openpyxl.worksheet.dimensions import DimensionHolder
+
+logger = logging.getLogger(__name__)
+
+
+def hash_archivo(ruta):
+    """sha256 del contenido del archivo"""
+    resumen = hashlib.sha256()
+    with open(ruta, 'rb') as archivo:
+        for bloque in iter(lambda: archivo.read(1 << 20), b''):
+            resumen.update(bloque)
+    return resumen.hexdigest()
+
+
+def _firma(ruta):
+    info = os.stat(ruta)
+    return info.st_mtime_ns, info.st_size
+
+
+def _nuevo_holder():
+    return DimensionHolder.__new__(DimensionHolder)
+
+
+def _reducir_holder(holder):
+    # defaultdict no serializa sus atributos (worksheet, reference...): se agregan como estado
+    return _nuevo_holder, (), dict(vars(holder)), None, iter(holder.items())
+
+
+def _serializar(wb):
+    """Snapshot del Workbook; las DimensionHolder conservan sus atributos"""
+    salida = io.BytesIO()
+    pickler = pickle.Pickler(salida, protocol=pickle.HIGHEST_PROTOCOL)
+    pickler.dispatch_table = copyreg.dispatch_table.copy()
+    pickler.dispatch_table[DimensionHolder] = _reducir_holder
+    pickler.dump(wb)
+    return salida.getvalue()
+
+
+def _clonar(snapshot):
+    """Workbook independiente a partir de un snapshot
+
+    La fábrica de row_dimensions/column_dimensions es un método de la hoja: se vuelve
+    a enlazar para que ws.column_dimensions['X'] cree la dimensión como en openpyxl.
+    """
+    wb = pickle.loads(snapshot)
+    for ws in wb.worksheets:
+        if hasattr(ws, 'row_dimensions'):
+            ws.row_dimensions.default_factory = ws._add_row
+            ws.column_dimensions.default_factory = ws._add_column
+    return wb
+
+
+class _Entrada:
+    """Snapshot de una plantilla; `lista` se activa cuando terminó la carga"""
+
+    def __init__(self, firma):
+        self.firma = firma
+        self.hash = None
+        self.snapshot = None
+        self.error = None
+        self.lista = threading.Event()
+
+
+class PoolPlantillas:
+    """Plantillas openpyxl cargadas una vez y entregadas como clones independientes
+
+    Una entrada se invalida si cambia el mtime/tamaño del archivo y además su hash
+    (un archivo copiado con otra fecha pero igual contenido se sigue reutilizando).
+    """
+
+    def __init__(self):
+        self._entradas = {}
+        self._lock = threading.Lock()
+
+    def precargar(self, rutas):
+        """Carga las plantillas en un hilo de fondo (no bloquea la interfaz)"""
+        def cargar():
+            for ruta in rutas:
+                try:
+                    self._entrada(ruta)
+                except Exception as e:
+                    logger.warning("No se pudo precargar %s: %s", ruta, e)
+
+        hilo = threading.Thread(target=cargar, name='precarga-plantillas', daemon=True)
+        hilo.start()
+        return hilo
+
+    def obtener(self, ruta):
+        """Workbook nuevo de la plantilla (clon del snapshot, independiente de los demás)"""
+        return _clonar(self._entrada(ruta).snapshot)
+
+    def _entrada(self, ruta):
+        ruta = os.path.abspath(ruta)
+        firma = _firma(ruta)
+        cargar = False
+        with self._lock:
+            entrada = self._entradas.get(ruta)
+        # El hash se calcula fuera del lock: no bloquea a quien pide otra plantilla
+        hash_actual = None
+        if entrada is not None and entrada.firma != firma and entrada.lista.is_set() and entrada.hash is not None:
+            hash_actual = hash_archivo(ruta)
+        with self._lock:
+            if entrada is not self._entradas.get(ruta):
+                entrada = self._entradas.get(ruta)
+                hash_actual = None
+            if entrada is not None and entrada.firma != firma and entrada.lista.is_set():
+                if hash_actual is not None and entrada.hash == hash_actual:
+                    entrada.firma = firma
+                else:
+                    entrada = None
+            if entrada is None:
+                entrada = self._entradas[ruta] = _Entrada(firma)
+                cargar = True
+
+        if cargar:
+            try:
+                entrada.hash = hash_archivo(ruta)
+                wb = load_workbook(ruta, data_only=False)
+                entrada.snapshot = _serializar(wb)
+                wb.close()
+            except Exception as e:
+                entrada.error = e
+            finally:
+                entrada.lista.set()
+        else:
+            entrada.lista.wait()
+
+        if entrada.error is not None:
+            with self._lock:
+                if self._entradas.get(ruta) is entrada:
+                    del self._entradas[ruta]
+            raise entrada.error
+        return entrada
+
+
+_pool_global = None
+_pool_lock = threading.Lock()
+
+
+def pool_plantillas():
+    """Pool compartido por todas las transformaciones del proceso"""
+    global _pool_global
+    with _pool_lock:
+        if _pool_global is None:
+            _pool_global = PoolPlantillas()
+        return _pool_global
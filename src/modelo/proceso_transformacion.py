@@ -0,0 +1,200 @@
+# src/modelo/proceso_transformacion.py
+"""
+Transformación en procesos aparte
+El pipeline corre en procesos hijos que siguen vivos entre trabajos (pandas, openpyxl
+y las plantillas ya cargados), de modo que los bucles por celda no compiten por el GIL
+con la interfaz. Mensajes y avance vuelven por una cola, el resultado como ruta del archivo y
+las cancelaciones llegan al hijo por una lista de ids compartida.
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .cancelacion import TokenCancelacion, TransformacionCancelada
+from .escritor_xml import guardar_libro
+from .progreso import Progreso
+
+# Cola de eventos y lista de trabajos cancelados del proceso hijo (las asigna _iniciar_hijo)
+_eventos = None
+_cancelados = None
+
+# Ids de trabajos cancelados que se recuerdan (lista circular compartida con los hijos)
+_MAX_CANCELADOS = 64
+
+# Mensaje que cierra los eventos de un trabajo: la cola y el resultado viajan por
+# tuberías distintas y los últimos mensajes pueden llegar después del resultado
+_FIN = None
+
+# Segundos que se esperan los mensajes pendientes de un trabajo ya terminado
+_ESPERA_FIN = 5
+
+
+def _iniciar_hijo(eventos, cancelados, plantillas):
+    """Inicializador de cada hijo: guarda la cola y deja cargado lo que usa el pipeline"""
+    global _eventos, _cancelados
+    _eventos = eventos
+    _cancelados = cancelados
+    from .transformador import TransformadorDatos  # noqa: F401 (importa pandas y openpyxl)
+    from src.config.polizas import CONFIG_SISTEMA
+    if plantillas and CONFIG_SISTEMA.get('ESCRITURA', {}).get('motor', 'openpyxl') != 'xml':
+        from .pool_plantillas import pool_plantillas
+        pool_plantillas().precargar(plantillas)
+
+
+def _listo():
+    """Tarea vacía: obliga a crear el hijo antes del primer trabajo"""
+    return os.getpid()
+
+
+def _transformar(id_trabajo, ruta_origen, ruta_plantilla, poliza_info, directorio, limite_segundos=None):
+    """Transforma y guarda en el directorio indicado (proceso hijo)
+
+    Returns:
+        (ruta del resultado, nombre de descarga)
+    """
+    from .transformador import TransformadorDatos
+
+    def callback_mensaje(msg):
+        _eventos.put((id_trabajo, msg))
+
+    def callback_progreso(progreso):
+        _eventos.put((id_trabajo, progreso))
+
+    cancelacion = TokenCancelacion(lambda: id_trabajo in _cancelados[:], limite_segundos)
+    try:
+        transformador = TransformadorDatos(callback_mensaje=callback_mensaje, callback_progreso=callback_progreso)
+        wb_resultado, nombre_descarga = transformador.transformar(
+            archivo_origen=ruta_origen,
+            archivo_plantilla=ruta_plantilla,
+            poliza_info=poliza_info,
+            cancelacion=cancelacion
+        )
+        ruta_resultado = os.path.join(directorio, nombre_descarga)
+        transformador.progreso.fase('guardado')
+        try:
+            guardar_libro(wb_resultado, ruta_resultado, cancelacion)
+        finally:
+            wb_resultado.close()
+        transformador.progreso.terminar()
+        callback_mensaje(f"⏱ Tiempos: {transformador.progreso.resumen()}")
+        return ruta_resultado, nombre_descarga
+    finally:
+        _eventos.put((id_trabajo, _FIN))
+
+
+class ProcesoTransformacion:
+    """Grupo de procesos hijos que ejecutan transformaciones
+
+    Args:
+        procesos: transformaciones que se ejecutan a la vez
+        plantillas: rutas de plantillas que cada hijo precarga al iniciar
+    """
+
+    def __init__(self, procesos=1, plantillas=()):
+        self.procesos = max(1, int(procesos))
+        self.plantillas = list(plantillas)
+        # spawn en todas las plataformas: el hijo no hereda los hilos de Qt
+        self._contexto = multiprocessing.get_context('spawn')
+        self._eventos = self._contexto.Queue()
+        self._cancelados = self._contexto.Array('q', _MAX_CANCELADOS)
+        self._siguiente_cancelado = 0
+        self._lock = threading.Lock()
+        # id de trabajo -> (callable(mensaje), callable(Progreso), Event que marca el fin de sus mensajes)
+        self._oyentes = {}
+        self._ejecutor = self._crear_ejecutor()
+        self._lector = threading.Thread(target=self._leer_eventos, name='eventos-transformacion', daemon=True)
+        self._lector.start()
+
+    def _crear_ejecutor(self):
+        return ProcessPoolExecutor(
+            max_workers=self.procesos,
+            mp_context=self._contexto,
+            initializer=_iniciar_hijo,
+            initargs=(self._eventos, self._cancelados, self.plantillas)
+        )
+
+    def _leer_eventos(self):
+        """Reparte mensajes y avance de los hijos a quien espera cada trabajo (hilo propio)"""
+        while True:
+            evento = self._eventos.get()
+            if evento is None:
+                return
+            id_trabajo, dato = evento
+            with self._lock:
+                al_mensaje, al_progreso, fin = self._oyentes.get(id_trabajo, (None, None, None))
+            if dato is _FIN:
+                if fin is not None:
+                    fin.set()
+                continue
+            oyente = al_progreso if isinstance(dato, Progreso) else al_mensaje
+            if oyente is not None:
+                try:
+                    oyente(dato)
+                except Exception as e:
+                    print(f"[ERROR eventos] {e}")
+
+    def calentar(self):
+        """Crea los hijos en segundo plano para que el primer trabajo no espere el arranque"""
+        with self._lock:
+            ejecutor = self._ejecutor
+        for _ in range(self.procesos):
+            ejecutor.submit(_listo)
+
+    def transformar(self, id_trabajo, ruta_origen, ruta_plantilla, poliza_info, directorio, callback_mensaje=None,
+                    limite_segundos=None, callback_progreso=None):
+        """Ejecuta una transformación en un hijo y espera su resultado
+
+        limite_segundos cuenta desde que el hijo empieza el trabajo; al superarlo, igual
+        que con cancelar(), termina con TransformacionCancelada. callback_progreso recibe
+        el avance (Progreso) por fases y por filas.
+
+        Returns:
+            (ruta del resultado, nombre de descarga)
+        """
+        fin = threading.Event()
+        with self._lock:
+            self._oyentes[id_trabajo] = (callback_mensaje, callback_progreso, fin)
+            ejecutor = self._ejecutor
+        try:
+            resultado = ejecutor.submit(
+                _transformar, id_trabajo, ruta_origen, ruta_plantilla, poliza_info, directorio, limite_segundos
+            ).result()
+        except CancelledError:
+            # cerrar() descartó el trabajo antes de que un hijo lo empezara: no hay mensajes que esperar
+            raise TransformacionCancelada("Transformación cancelada al cerrar la aplicación")
+        except BrokenProcessPool:
+            # Un hijo murió (memoria, señal): se reemplaza el grupo para los trabajos siguientes
+            self._reiniciar(ejecutor)
+            raise RuntimeError("El proceso de transformación terminó inesperadamente")
+        except Exception:
+            fin.wait(_ESPERA_FIN)
+            raise
+        else:
+            fin.wait(_ESPERA_FIN)
+            return resultado
+        finally:
+            with self._lock:
+                self._oyentes.pop(id_trabajo, None)
+
+    def cancelar(self, id_trabajo):
+        """Pide al hijo que ejecuta (o ejecutará) el trabajo que se detenga"""
+        with self._cancelados.get_lock():
+            self._cancelados[self._siguiente_cancelado] = id_trabajo
+            self._siguiente_cancelado = (self._siguiente_cancelado + 1) % _MAX_CANCELADOS
+
+    def _reiniciar(self, roto):
+        with self._lock:
+            if self._ejecutor is not roto:
+                return
+            self._ejecutor = self._crear_ejecutor()
+        roto.shutdown(wait=False, cancel_futures=True)
+
+    def cerrar(self):
+        """Termina los hijos y el hilo lector"""
+        with self._lock:
+            ejecutor = self._ejecutor
+        ejecutor.shutdown(wait=True, cancel_futures=True)
+        self._eventos.put(None)
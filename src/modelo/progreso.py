@@ -0,0 +1,145 @@
+# src/modelo/progreso.py
+"""
+Progreso de una transformación por fases y por filas
+La transferencia de filas domina el tiempo: su avance se mide con las filas leídas frente
+a las estimadas del origen, con filas/s y tiempo restante, y se informa cada
+'actualizacion_ui_cada_n_filas' filas; las demás fases avanzan la barra al empezar.
+"""
+
+import time
+from collections import namedtuple
+
+from ..config import CONFIG_SISTEMA
+
+# (fase, porcentaje de la barra que ocupa), en el orden del pipeline; la transferencia
+# ocupa lo que dejan las demás
+FASES = (
+    ('lectura', 3),
+    ('mapeo', 2),
+    ('transferencia', None),
+    ('totales', 2),
+    ('pie', 2),
+    ('tabla_dinamica', 1),
+    ('guardado', None),
+)
+
+# Parte de la barra del guardado según el motor de escritura: con openpyxl el guardado
+# serializa todas las celdas y tarda lo mismo que la transferencia
+_PESO_GUARDADO = {'openpyxl': 45, 'write_only': 30, 'xml': 10}
+
+NOMBRES_FASES = {
+    'lectura': 'Lectura',
+    'mapeo': 'Mapeo',
+    'transferencia': 'Transferencia',
+    'totales': 'Totales',
+    'pie': 'Pie de página',
+    'tabla_dinamica': 'Tabla dinámica',
+    'guardado': 'Guardado',
+    'fin': 'Completado',
+}
+
+# Estado que se envía al callback (las filas solo se informan en la transferencia)
+Progreso = namedtuple('Progreso', 'fase porcentaje filas filas_totales filas_por_segundo segundos_restantes')
+
+
+def _inicios(motor):
+    """{fase: (porcentaje inicial, porcentaje que ocupa)} para un motor de escritura"""
+    pesos = dict(FASES)
+    pesos['guardado'] = _PESO_GUARDADO.get(motor, _PESO_GUARDADO['openpyxl'])
+    pesos['transferencia'] = 100 - sum(peso for peso in pesos.values() if peso is not None)
+    inicio, inicios = 0, {}
+    for fase, _ in FASES:
+        inicios[fase] = (inicio, pesos[fase])
+        inicio += pesos[fase]
+    return inicios
+
+
+def describir_progreso(progreso):
+    """Texto corto para la vista, p. ej. 'Transferencia: 40.000 de ~100.000 filas · 12.500 filas/s · ~5 s'"""
+    texto = NOMBRES_FASES.get(progreso.fase, progreso.fase)
+    if progreso.filas is None:
+        return texto
+    texto += f": {progreso.filas:,}".replace(',', '.')
+    if progreso.filas_totales:
+        texto += f" de ~{progreso.filas_totales:,}".replace(',', '.')
+    texto += " filas"
+    if progreso.filas_por_segundo:
+        texto += f" · {progreso.filas_por_segundo:,.0f} filas/s".replace(',', '.')
+    if progreso.segundos_restantes is not None:
+        texto += f" · ~{progreso.segundos_restantes:.0f} s"
+    return texto
+
+
+class MedidorProgreso:
+    """Lleva la fase actual, las filas transferidas y la duración de cada fase
+
+    Args:
+        callback: callable(Progreso) o None
+        cada_n_filas: filas entre dos informes de la transferencia
+            (por defecto CONFIG_SISTEMA['PROCESAMIENTO']['actualizacion_ui_cada_n_filas'])
+    """
+
+    def __init__(self, callback=None, cada_n_filas=None):
+        self.callback = callback
+        if cada_n_filas is None:
+            cada_n_filas = CONFIG_SISTEMA['PROCESAMIENTO'].get('actualizacion_ui_cada_n_filas', 2000)
+        self.cada_n_filas = max(1, int(cada_n_filas))
+        self._inicios = _inicios(CONFIG_SISTEMA.get('ESCRITURA', {}).get('motor', 'openpyxl'))
+        self.filas_totales = None
+        self.duraciones = {}
+        self._fase = None
+        self._inicio_fase = None
+        self._informadas = 0
+
+    def fase(self, nombre):
+        """Cierra la fase en curso y empieza otra"""
+        ahora = time.perf_counter()
+        self._cerrar(ahora)
+        self._fase = nombre
+        self._inicio_fase = ahora
+        self._informadas = 0
+        self._enviar(Progreso(nombre, self._inicios[nombre][0], None, None, None, None))
+
+    def filas(self, procesadas, leidas):
+        """Avance de la transferencia: filas válidas escritas y filas leídas del origen
+
+        filas_totales es la estimación de filas del origen (dimensión de la hoja); las
+        válidas esperadas se estiman con la proporción de válidas leída hasta ahora.
+        """
+        if procesadas - self._informadas < self.cada_n_filas:
+            return
+        self._informadas = procesadas
+        transcurrido = time.perf_counter() - self._inicio_fase
+        inicio, peso = self._inicios['transferencia']
+        velocidad = procesadas / transcurrido if transcurrido > 0 else None
+        validas = restantes = None
+        fraccion = 0
+        if self.filas_totales and leidas:
+            fraccion = min(1.0, leidas / self.filas_totales)
+            validas = max(procesadas, round(self.filas_totales * procesadas / leidas))
+            if fraccion < 1:
+                restantes = transcurrido * (self.filas_totales - leidas) / leidas
+        self._enviar(Progreso(
+            'transferencia', inicio + peso * fraccion, procesadas, validas, velocidad, restantes
+        ))
+
+    def terminar(self):
+        """Cierra la última fase y lleva la barra al 100%"""
+        self._cerrar(time.perf_counter())
+        self._fase = None
+        self._enviar(Progreso('fin', 100, None, None, None, None))
+
+    def resumen(self):
+        """Duración de cada fase, p. ej. 'Lectura 0,2 s · Mapeo 0,1 s · Transferencia 8,4 s'"""
+        return ' · '.join(
+            f"{NOMBRES_FASES[fase]} {self.duraciones[fase]:.1f} s".replace('.', ',')
+            for fase, _ in FASES if fase in self.duraciones
+        )
+
+    def _cerrar(self, ahora):
+        if self._fase is not None:
+            self.duraciones[self._fase] = self.duraciones.get(self._fase, 0) + ahora - self._inicio_fase
+
+    def _enviar(self, progreso):
+        if self.callback is not None:
+            self.callback(progreso)
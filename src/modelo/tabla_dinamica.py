@@ -3,11 +3,81 @@
 Lógica para crear Hoja2 con tabla dinámica
 """
 
+import numpy as np
 import pandas as pd
 
 
-def crear_hoja2_tabla_dinamica(wb, ws_destino, ultima_fila_datos, headers_destino, estilos, callback=None):
-    """Crea Hoja2 con tabla dinámica agrupada por rangos de MONTO CREDITO"""
+# Rangos de 5000 hasta 40000: (-inf, 5000], (5000, 10000], ..., (35000, 40000]
+_ANCHO_RANGO = 5000
+_BORDES_RANGOS = np.arange(1, 9) * _ANCHO_RANGO
+
+
+def _monto(valor):
+    """(monto, válido) de una celda de MONTO CREDITO: números, o textos con coma decimal"""
+    if isinstance(valor, (int, float)):
+        return float(valor), True
+    if isinstance(valor, str):
+        try:
+            return float(valor.replace(',', '.')), True
+        except ValueError:
+            pass
+    return 0.0, False
+
+
+_v_monto = np.frompyfunc(_monto, 1, 2)
+
+
+class ColumnaMontos:
+    """Valores finales de MONTO CREDITO de las filas escritas, entregados por bloque
+
+    transferir_datos agrega el arreglo de cada bloque; Hoja2 se arma con montos()
+    sin volver a leer la hoja.
+    """
+
+    def __init__(self, col):
+        self.col = col
+        self._bloques = []
+
+    def agregar(self, valores):
+        self._bloques.append(valores)
+
+    def montos(self):
+        """Arreglo float con los montos legibles, en el orden de las filas"""
+        if not self._bloques:
+            return np.empty(0)
+        montos, validos = _v_monto(np.concatenate(self._bloques))
+        return montos[validos.astype(bool)].astype(float)
+
+
+def agrupar_montos(montos):
+    """Cuenta y suma por rango de 5000
+
+    Returns:
+        DataFrame: columnas Rango, Cuenta, Suma ordenadas por inicio de rango
+    """
+    indices = np.digitize(montos, _BORDES_RANGOS, right=True)
+    sobre = indices == len(_BORDES_RANGOS)
+    if sobre.any():
+        # Sobre 40000 el rango sale de (monto - 1) // 5000 (p. ej. 40000.5 queda en 35001-40000)
+        excedentes = montos[sobre] - 1
+        if not np.isfinite(excedentes).all():
+            raise ValueError("MONTO CREDITO no finito")
+        indices[sobre] = (excedentes // _ANCHO_RANGO).astype(np.int64)
+
+    resultado = pd.Series(montos).groupby(indices).agg(['count', 'sum'])
+    inicios = resultado.index.to_numpy(dtype=np.int64) * _ANCHO_RANGO + 1
+    return pd.DataFrame({
+        'Rango': [f"{inicio}-{inicio + _ANCHO_RANGO - 1}" for inicio in inicios],
+        'Cuenta': resultado['count'].to_numpy(),
+        'Suma': resultado['sum'].to_numpy(),
+    })
+
+
+def crear_hoja2_tabla_dinamica(wb, montos, descriptor, estilos, callback=None):
+    """Crea Hoja2 con tabla dinámica agrupada por rangos de MONTO CREDITO
+
+    montos es la ColumnaMontos llenada durante transferir_datos (o None).
+    """
     try:
         # Buscar o crear Hoja2
         if 'Hoja2' in wb.sheetnames or 'HOJA2' in [s.upper() for s in wb.sheetnames]:
@@ -18,108 +88,53 @@ def crear_hoja2_tabla_dinamica(wb, ws_destino, ultima_fila_datos, headers_destin
         
         hoja2 = wb.create_sheet("Hoja2")
         
-        # Buscar columna de MONTO CREDITO
-        col_monto_credito = None
-        for idx, cell in enumerate(headers_destino):
-            if cell.value:
-                header_str = str(cell.value).strip().upper()
-                if 'MONTO CREDITO' in header_str or 'MONTO CRÉDITO' in header_str:
-                    col_monto_credito = idx + 1
-                    break
+        # Columna de MONTO CREDITO
+        col_monto_credito = descriptor.col_monto_credito
         
-        if not col_monto_credito:
+        if not col_monto_credito or montos is None:
             if callback:
                 callback("  ⚠️ No se encontró columna MONTO CREDITO para tabla dinámica")
             return
         
-        # Leer datos de MONTO CREDITO
-        datos_monto = []
-        for fila in range(6, ultima_fila_datos + 1):
-            try:
-                cell = ws_destino.cell(fila, col_monto_credito)
-                if cell.value is not None:
-                    valor = cell.value
-                    if isinstance(valor, (int, float)):
-                        datos_monto.append(float(valor))
-                    elif isinstance(valor, str):
-                        try:
-                            datos_monto.append(float(valor.replace(',', '.')))
-                        except:
-                            pass
-            except:
-                continue
+        datos_monto = montos.montos()
         
-        if not datos_monto:
+        if not len(datos_monto):
             if callback:
                 callback("  ⚠️ No se encontraron datos de MONTO CREDITO")
             return
         
-        # Crear DataFrame y agrupar por rangos
-        df = pd.DataFrame({'MONTO_CREDITO': datos_monto})
-        
-        def asignar_rango(valor):
-            if valor <= 5000:
-                return "1-5000"
-            elif valor <= 10000:
-                return "5001-10000"
-            elif valor <= 15000:
-                return "10001-15000"
-            elif valor <= 20000:
-                return "15001-20000"
-            elif valor <= 25000:
-                return "20001-25000"
-            elif valor <= 30000:
-                return "25001-30000"
-            elif valor <= 35000:
-                return "30001-35000"
-            elif valor <= 40000:
-                return "35001-40000"
-            else:
-                inicio = int((valor - 1) // 5000) * 5000 + 1
-                fin = inicio + 4999
-                return f"{inicio}-{fin}"
-        
-        df['Rango'] = df['MONTO_CREDITO'].apply(asignar_rango)
-        resultado = df.groupby('Rango').agg({'MONTO_CREDITO': ['count', 'sum']}).reset_index()
-        resultado.columns = ['Rango', 'Cuenta', 'Suma']
-        
-        # Ordenar por inicio de rango
-        def obtener_inicio_rango(rango_str):
-            try:
-                return int(rango_str.split('-')[0])
-            except:
-                return 0
-        
-        resultado['Orden'] = resultado['Rango'].apply(obtener_inicio_rango)
-        resultado = resultado.sort_values('Orden')
-        resultado = resultado.drop('Orden', axis=1)
+        resultado = agrupar_montos(datos_monto)
         
         # Escribir encabezados
         hoja2['A1'] = 'Etiquetas de fila'
         hoja2['B1'] = 'Cuenta de MONTO CREDITO'
         hoja2['C1'] = 'Suma de MONTO CREDITO'
         
-        for col in ['A1', 'B1', 'C1']:
-            cell = hoja2[col]
-            cell.font = estilos.fuente_calibri
-            cell.alignment = estilos.alineacion_centrada
-            cell.fill = estilos.fill_gris
-            cell.border = estilos.borde_celda
+        estilos.aplicar_rango(
+            [hoja2[col] for col in ['A1', 'B1', 'C1']],
+            estilos.combinacion(
+                font=estilos.fuente_calibri,
+                alignment=estilos.alineacion_centrada,
+                fill=estilos.fill_gris,
+                border=estilos.borde_celda,
+            )
+        )
         
         # Escribir datos
+        estilo_dato = estilos.combinacion(
+            font=estilos.fuente_calibri,
+            alignment=estilos.alineacion_centrada,
+            border=estilos.borde_celda,
+        )
+        estilo_dato_numero = estilo_dato + estilos.combinacion(number_format='0.00')
         fila_actual = 2
         for _, row in resultado.iterrows():
             hoja2[f'A{fila_actual}'] = row['Rango']
             hoja2[f'B{fila_actual}'] = int(row['Cuenta'])
             hoja2[f'C{fila_actual}'] = round(row['Suma'], 2)
             
-            for col in ['A', 'B', 'C']:
-                cell = hoja2[f'{col}{fila_actual}']
-                cell.font = estilos.fuente_calibri
-                cell.alignment = estilos.alineacion_centrada
-                cell.border = estilos.borde_celda
-                if col == 'C':
-                    cell.number_format = '0.00'
+            estilos.aplicar_rango([hoja2[f'A{fila_actual}'], hoja2[f'B{fila_actual}']], estilo_dato)
+            estilos.aplicar(hoja2[f'C{fila_actual}'], estilo_dato_numero)
             
             fila_actual += 1
         
@@ -131,14 +146,9 @@ def crear_hoja2_tabla_dinamica(wb, ws_destino, ultima_fila_datos, headers_destin
         hoja2[f'B{fila_actual}'] = total_cuenta
         hoja2[f'C{fila_actual}'] = total_suma
         
-        for col in ['A', 'B', 'C']:
-            cell = hoja2[f'{col}{fila_actual}']
-            cell.font = estilos.fuente_calibri
-            cell.alignment = estilos.alineacion_centrada
-            cell.border = estilos.borde_celda
-            cell.fill = estilos.fill_azul
-            if col == 'C':
-                cell.number_format = '0.00'
+        estilo_total = estilo_dato + estilos.combinacion(fill=estilos.fill_azul)
+        estilos.aplicar_rango([hoja2[f'A{fila_actual}'], hoja2[f'B{fila_actual}']], estilo_total)
+        estilos.aplicar(hoja2[f'C{fila_actual}'], estilo_total + estilos.combinacion(number_format='0.00'))
         
         # Ancho de columnas
         hoja2.column_dimensions['A'].width = 20
@@ -1,46 +1,141 @@
 # src/modelo/totales_pie.py
 """
 Lógica para agregar totales y pie de página
+Las fórmulas se escriben con su valor ya calculado en Python (acumulado durante la
+transferencia), así el archivo se puede leer sin que Excel lo recalcule
 """
 
+from datetime import datetime, date, time, timedelta
+
 from openpyxl.utils import get_column_letter
-from openpyxl.cell.cell import MergedCell
+from openpyxl.utils.datetime import to_excel
+from openpyxl.cell.cell import MergedCell, ERROR_CODES
+from openpyxl.styles import Border
+from openpyxl.styles.cell_style import StyleArray
+from openpyxl.styles.styleable import StyleableObject
 
+from .escritor_xml import HojaPorFilas
+from .valores_cacheados import SIN_VALOR, asignar_formula
 
-def agregar_totales_columnas(ws, ultima_fila_datos, headers_destino, estilos, callback=None):
-    """Agrega fórmulas SUM para columnas - PLAZO DE CREDITO usa COUNTA (clientes) - SIN DUPLICAR"""
-    columnas_totales = {
-        'MONTO CREDITO': ['MONTO CREDITO', 'MONTO CRÉDITO'],
-        'PLAZO DE CREDITO': ['PLAZO DE CREDITO', 'PLAZO DE CRÉDITO'],
-        'PRIMA NETA': ['PRIMA NETA'],
-        'HGR': ['HGR']
-    }
-    
-    # Buscar columnas
+
+def _es_formula(valor):
+    return isinstance(valor, str) and len(valor) > 1 and valor.startswith('=')
+
+
+def _operando(valor):
+    """Valor numérico de una celda en +, -, *, / (vacía = 0); SIN_VALOR si no se puede saber"""
+    if valor is None or valor == '':
+        return 0
+    if isinstance(valor, bool):
+        return int(valor)
+    if isinstance(valor, (int, float)):
+        return valor
+    return SIN_VALOR
+
+
+def _sumar(a, b):
+    return SIN_VALOR if a is SIN_VALOR or b is SIN_VALOR else a + b
+
+
+def _restar(a, b):
+    return SIN_VALOR if a is SIN_VALOR or b is SIN_VALOR else a - b
+
+
+def _dividir(numerador, denominador):
+    if numerador is SIN_VALOR or denominador is SIN_VALOR:
+        return SIN_VALOR
+    return numerador / denominador if denominador else '#DIV/0!'
+
+
+class AcumuladorTotales:
+    """Suma y conteo de las columnas con total, acumulados fila a fila en la transferencia
+
+    Replica SUM (solo números; texto y lógicos se ignoran) y COUNTA (celdas no vacías,
+    incluidas las fórmulas). La suma de una columna queda indefinida si alguna celda es
+    una fórmula sin valor calculado o un error. `valores` guarda lo escrito en las filas
+    de totales y pie para calcular las fórmulas que dependen de ellas.
+    """
+
+    def __init__(self, descriptor):
+        self.columnas = tuple(col for _, col in descriptor.columnas_totales)
+        self.filas = 0
+        self.sumas = dict.fromkeys(self.columnas, 0)
+        self.conteos = dict.fromkeys(self.columnas, 0)
+        self._sin_suma = set()
+        self.valores = {}
+
+    def registrar_fila(self, valores):
+        """valores: [(col, valor, calculado)] de una fila de datos ya escrita"""
+        self.filas += 1
+        for col, valor, calculado in valores:
+            self.registrar(col, valor, calculado)
+
+    def registrar(self, col, valor, calculado=SIN_VALOR):
+        if valor is None or valor == '':
+            return
+        self.conteos[col] += 1
+        if _es_formula(valor):
+            valor = calculado
+            if valor is SIN_VALOR:
+                self._sin_suma.add(col)
+                return
+        if isinstance(valor, bool):
+            return
+        if isinstance(valor, (int, float)):
+            self.sumas[col] += valor
+        elif isinstance(valor, (datetime, date, time, timedelta)):
+            self.sumas[col] += to_excel(valor)
+        elif isinstance(valor, str) and valor in ERROR_CODES:
+            self._sin_suma.add(col)
+
+    def suma(self, col):
+        return SIN_VALOR if col in self._sin_suma else self.sumas[col]
+
+    def conteo(self, col):
+        return self.conteos[col]
+
+    def valor(self, fila, col):
+        return self.valores.get((fila, col), SIN_VALOR)
+
+
+def agregar_totales_columnas(ws, ultima_fila_datos, descriptor, estilos, callback=None, totales=None):
+    """Agrega fórmulas SUM para columnas - PLAZO DE CREDITO usa COUNTA (clientes) - SIN DUPLICAR
+
+    totales (AcumuladorTotales) trae lo acumulado en la transferencia; si cubre todas las
+    filas de datos, cada fórmula se guarda también con su valor calculado.
+    """
+    # Columnas con total ya ubicadas en el descriptor de la plantilla
     columnas_encontradas = {}
-    for idx, cell in enumerate(headers_destino):
-        if cell.value:
-            header_str = str(cell.value).strip().upper()
-            header_str_limpio = ' '.join(header_str.split())
-            
-            for col_nombre, variantes in columnas_totales.items():
-                if col_nombre not in columnas_encontradas:
-                    for variante in variantes:
-                        variante_upper = variante.upper()
-                        if variante_upper in header_str_limpio or header_str_limpio in variante_upper:
-                            col_num = idx + 1
-                            col_letter = get_column_letter(col_num)
-                            columnas_encontradas[col_nombre] = (col_num, col_letter)
-                            if callback:
-                                callback(f"  → Columna '{col_nombre}' encontrada en {col_letter}")
-                            break
-                    if col_nombre in columnas_encontradas:
-                        break
+    for col_nombre, col_num in descriptor.columnas_totales:
+        col_letter = get_column_letter(col_num)
+        columnas_encontradas[col_nombre] = (col_num, col_letter)
+        if callback:
+            callback(f"  → Columna '{col_nombre}' encontrada en {col_letter}")
     
     # Fila de totales
     fila_total = ultima_fila_datos + 1
     formulas_agregadas = 0
     
+    # Sin acumulado que corresponda a las filas 6..ultima las fórmulas van sin valor
+    calcular = totales is not None and totales.filas > 0 and totales.filas == ultima_fila_datos - 5
+    if totales is None:
+        totales = AcumuladorTotales(descriptor)
+    
+    # Estilos de la fila de totales (se registran una vez y se aplican por índice)
+    estilo_total = estilos.combinacion(
+        font=estilos.fuente_calibri_negrita,
+        alignment=estilos.alineacion_centrada,
+        border=None,
+        number_format='#,##0.00',
+        fill=estilos.fill_amarillo,
+    )
+    estilo_etiqueta = estilos.combinacion(
+        font=estilos.fuente_calibri_negrita,
+        alignment=estilos.alineacion_centrada,
+        border=None,
+        fill=estilos.fill_amarillo,
+    )
+    
     # Agregar SUM o COUNTA según columna
     for col_nombre, (col_num, col_letter) in columnas_encontradas.items():
         try:
@@ -52,17 +147,16 @@ def agregar_totales_columnas(ws, ultima_fila_datos, headers_destino, estilos, ca
             if col_nombre == 'PLAZO DE CREDITO':
                 formula = f"=COUNTA({col_letter}6:{col_letter}{ultima_fila_datos})"
                 label_desc = "clientes (COUNTA)"
+                valor = totales.conteo(col_num) if calcular else SIN_VALOR
             else:
                 formula = f"=SUM({col_letter}6:{col_letter}{ultima_fila_datos})"
                 label_desc = "suma (SUM)"
+                valor = totales.suma(col_num) if calcular else SIN_VALOR
             
             # Sobrescribir siempre con la fórmula correcta (incluso si tiene valor previo)
-            cell_total.value = formula
-            cell_total.font = estilos.fuente_calibri_negrita
-            cell_total.alignment = estilos.alineacion_centrada
-            cell_total.border = None  # SIN BORDES en fila de totales
-            cell_total.number_format = '#,##0.00'
-            cell_total.fill = estilos.fill_amarillo
+            asignar_formula(cell_total, formula, valor)
+            totales.valores[(fila_total, col_num)] = valor
+            estilos.aplicar(cell_total, estilo_total)  # SIN BORDES en fila de totales
             
             formulas_agregadas += 1
             if callback:
@@ -74,32 +168,17 @@ def agregar_totales_columnas(ws, ultima_fila_datos, headers_destino, estilos, ca
                 cell_clientes = ws.cell(fila_total, col_anterior)
                 if not isinstance(cell_clientes, MergedCell):
                     cell_clientes.value = "CLIENTES"
-                    cell_clientes.font = estilos.fuente_calibri_negrita
-                    cell_clientes.alignment = estilos.alineacion_centrada
-                    cell_clientes.border = None  # SIN BORDES en fila de totales
-                    cell_clientes.fill = estilos.fill_amarillo
+                    totales.valores[(fila_total, col_anterior)] = "CLIENTES"
+                    estilos.aplicar(cell_clientes, estilo_etiqueta)  # SIN BORDES en fila de totales
                     if callback:
                         callback(f"  ✓ Etiqueta 'CLIENTES' agregada en {get_column_letter(col_anterior)}{fila_total}")
         except Exception:
             continue
     
     # IMP y PRIMA TOTAL también van en fila_total (misma fila que otros totales)
-    # Buscar columnas AL, AM, AN
-    col_al = None  # PRIMA NETA
-    col_am = None  # IMP
-    col_an = None  # PRIMA TOTAL
-    
-    for idx, cell in enumerate(headers_destino):
-        if cell.value:
-            header_str = str(cell.value).strip().upper()
-            header_str_limpio = ' '.join(header_str.split())
-            
-            if 'PRIMA NETA' in header_str_limpio and col_al is None:
-                col_al = idx + 1
-            elif 'IMP' in header_str_limpio and col_am is None:
-                col_am = idx + 1
-            elif 'PRIMA TOTAL' in header_str_limpio and col_an is None:
-                col_an = idx + 1
+    col_al = descriptor.col_prima_neta  # PRIMA NETA
+    col_am = descriptor.col_imp  # IMP
+    col_an = descriptor.col_prima_total  # PRIMA TOTAL
     
     # AM (IMP): =AL{fila_total}*4% - EN LA MISMA FILA_TOTAL
     if col_am is not None and col_al is not None:
@@ -110,12 +189,11 @@ def agregar_totales_columnas(ws, ultima_fila_datos, headers_destino, estilos, ca
             
             if not isinstance(cell_am, MergedCell):
                 formula_am = f"={col_letter_al}{fila_total}*4%"
-                cell_am.value = formula_am
-                cell_am.font = estilos.fuente_calibri_negrita
-                cell_am.alignment = estilos.alineacion_centrada
-                cell_am.border = None  # SIN BORDES en fila de totales
-                cell_am.number_format = '#,##0.00'
-                cell_am.fill = estilos.fill_amarillo
+                prima_neta = _operando(totales.valor(fila_total, col_al))
+                valor_am = SIN_VALOR if prima_neta is SIN_VALOR else prima_neta * 0.04
+                asignar_formula(cell_am, formula_am, valor_am)
+                totales.valores[(fila_total, col_am)] = valor_am
+                estilos.aplicar(cell_am, estilo_total)  # SIN BORDES en fila de totales
                 if callback:
                     callback(f"  ✓ Fórmula IMP agregada en {col_letter_am}{fila_total}")
         except Exception:
@@ -131,12 +209,10 @@ def agregar_totales_columnas(ws, ultima_fila_datos, headers_destino, estilos, ca
             
             if not isinstance(cell_an, MergedCell):
                 formula_an = f"=+{col_letter_al}{fila_total}+{col_letter_am}{fila_total}"
-                cell_an.value = formula_an
-                cell_an.font = estilos.fuente_calibri_negrita
-                cell_an.alignment = estilos.alineacion_centrada
-                cell_an.border = None  # SIN BORDES en fila de totales
-                cell_an.number_format = '#,##0.00'
-                cell_an.fill = estilos.fill_amarillo
+                valor_an = _sumar(_operando(totales.valor(fila_total, col_al)), _operando(totales.valor(fila_total, col_am)))
+                asignar_formula(cell_an, formula_an, valor_an)
+                totales.valores[(fila_total, col_an)] = valor_an
+                estilos.aplicar(cell_an, estilo_total)  # SIN BORDES en fila de totales
                 if callback:
                     callback(f"  ✓ Fórmula PRIMA TOTAL agregada en {col_letter_an}{fila_total}")
         except Exception:
@@ -146,24 +222,45 @@ def agregar_totales_columnas(ws, ultima_fila_datos, headers_destino, estilos, ca
         callback(f"  ✓ {formulas_agregadas} total(es) agregado(s) en fila {fila_total}")
 
 
+def celdas_existentes(ws, fila_inicio, fila_fin):
+    """Celdas que ya existen entre fila_inicio y fila_fin inclusive (no crea celdas nuevas)"""
+    if isinstance(ws, HojaPorFilas):
+        return ws.celdas_existentes(fila_inicio, fila_fin)
+    return [celda for (fila, _), celda in ws._cells.items() if fila_inicio <= fila <= fila_fin]
+
+
+def quitar_bordes_filas(ws, fila_inicio, fila_fin):
+    """Quita los bordes de las celdas existentes entre dos filas; retorna cuántas se tocaron.
+    El costo depende de las celdas reales, no del rectángulo max_row × max_column.
+    """
+    no_border = Border()
+    id_borde = None
+    celdas = celdas_existentes(ws, fila_inicio, fila_fin)
+    for celda in celdas:
+        if isinstance(celda, StyleableObject):
+            # Celdas openpyxl: el borde vacío se registra una vez y se asigna su índice en bloque
+            if id_borde is None:
+                id_borde = celda.parent.parent._borders.add(no_border)
+            if celda._style is None:
+                celda._style = StyleArray()
+            celda._style.borderId = id_borde
+        else:
+            try:
+                celda.border = no_border
+            except Exception:
+                pass
+    return len(celdas)
+
+
 def limpiar_bordes_todas_filas_excepto_pie(ws, fila_pie_inicio, callback=None):
     """Quita TODOS los bordes de todas las filas después del pie de página"""
     try:
-        from openpyxl.styles import Border
-        no_border = Border()
-        
         # Comenzar después del pie (al final del pie)
         fila_inicio = fila_pie_inicio + 1
         max_row = ws.max_row
         
         if fila_inicio <= max_row:
-            for fila in range(fila_inicio, max_row + 1):
-                for col in range(1, ws.max_column + 1):
-                    try:
-                        cell = ws.cell(fila, col)
-                        cell.border = no_border
-                    except Exception:
-                        pass
+            quitar_bordes_filas(ws, fila_inicio, max_row)
             
             if callback:
                 filas_limpiadas = max_row - fila_inicio + 1
@@ -179,22 +276,13 @@ def limpiar_bordes_entre_filas(ws, fila_inicio, fila_fin, callback=None):
     antes de construir el pie de página.
     """
     try:
-        from openpyxl.styles import Border
-        no_border = Border()
-
         max_row = ws.max_row
-        max_col = ws.max_column
 
         fila_inicio = max(1, int(fila_inicio))
         fila_fin = min(max_row, int(fila_fin))
 
         if fila_inicio <= fila_fin:
-            for fila in range(fila_inicio, fila_fin + 1):
-                for col in range(1, max_col + 1):
-                    try:
-                        ws.cell(fila, col).border = no_border
-                    except Exception:
-                        pass
+            quitar_bordes_filas(ws, fila_inicio, fila_fin)
             if callback:
                 callback(f"  ✓ Filas {fila_inicio}-{fila_fin} sin bordes")
     except Exception as e:
@@ -202,14 +290,20 @@ def limpiar_bordes_entre_filas(ws, fila_inicio, fila_fin, callback=None):
             callback(f"  ⚠️ Error limpiando bordes entre filas: {str(e)}")
 
 
-def aplicar_formato_celda(cell, valor, estilos, aplicar_borde=True, numero_formato=None, fill=None, forzar_borde=False):
+def aplicar_formato_celda(cell, valor, estilos, aplicar_borde=True, numero_formato=None, fill=None, forzar_borde=False,
+                          totales=None, calculado=SIN_VALOR):
     """Aplica formato a una celda.
     - Bordes: se aplican si hay contenido real y aplicar_borde=True, o si forzar_borde=True.
     - Las celdas vacías quedan sin borde salvo que se fuerce (útil para celdas operandos vacías).
+    - calculado: valor de la fórmula, que se guarda con ella; totales registra lo escrito.
     """
-    cell.value = valor
-    cell.font = estilos.fuente_calibri
-    cell.alignment = estilos.alineacion_centrada
+    if _es_formula(valor):
+        asignar_formula(cell, valor, calculado)
+    else:
+        cell.value = valor
+        calculado = valor
+    if totales is not None:
+        totales.valores[(cell.row, cell.column)] = calculado
     
     tiene_contenido = False
     if valor is not None:
@@ -217,21 +311,29 @@ def aplicar_formato_celda(cell, valor, estilos, aplicar_borde=True, numero_forma
         if valor_str and valor_str != '' and valor_str != '-':
             tiene_contenido = True
     
-    if (aplicar_borde and tiene_contenido) or forzar_borde:
-        cell.border = estilos.borde_celda
-    else:
-        cell.border = None
-    
+    atributos = {
+        'font': estilos.fuente_calibri,
+        'alignment': estilos.alineacion_centrada,
+        'border': estilos.borde_celda if (aplicar_borde and tiene_contenido) or forzar_borde else None,
+    }
     if numero_formato:
-        cell.number_format = numero_formato
+        atributos['number_format'] = numero_formato
     if fill:
-        cell.fill = fill
+        atributos['fill'] = fill
+    estilos.aplicar(cell, estilos.combinacion(**atributos))
 
 
-def agregar_pie_pagina(ws, fila_total, headers_destino, estilos, callback=None):
+def agregar_pie_pagina(ws, fila_total, descriptor, estilos, callback=None, totales=None):
     """Agrega pie de página con PRE CANCELACION, BASE 0%, BASE 12%, tabla de pólizas
     SOLO aplica bordes a celdas con datos
-    fila_total es la fila de totales, el pie comenzará en fila_total + 2 dejando una vacía"""
+    fila_total es la fila de totales, el pie comenzará en fila_total + 2 dejando una vacía
+    totales (AcumuladorTotales) trae los valores de la fila de totales para las fórmulas"""
+    if totales is None:
+        totales = AcumuladorTotales(descriptor)
+    
+    def operando(fila, col):
+        return _operando(totales.valor(fila, col))
+    
     try:
         # Columnas fijas para el pie (AN, AO, AP, AQ, AR)
         col_an = 40  # AN
@@ -246,16 +348,9 @@ def agregar_pie_pagina(ws, fila_total, headers_destino, estilos, callback=None):
         col_letter_aq = get_column_letter(col_aq)
         col_letter_ar = get_column_letter(col_ar)
         
-        # Buscar PRIMA NETA (AL) y HGR para las fórmulas
-        col_al = None
-        col_ao_hgr = None
-        for idx, cell in enumerate(headers_destino):
-            if cell.value:
-                header_str = str(cell.value).strip().upper()
-                if 'PRIMA NETA' in header_str and col_al is None:
-                    col_al = idx + 1
-                if 'HGR' in header_str and col_ao_hgr is None:
-                    col_ao_hgr = idx + 1
+        # PRIMA NETA (AL) y HGR para las fórmulas
+        col_al = descriptor.col_prima_neta_pie
+        col_ao_hgr = descriptor.col_hgr_pie
         
         if col_al is None:
             col_al = 38  # Valor por defecto para AL
@@ -285,7 +380,9 @@ def agregar_pie_pagina(ws, fila_total, headers_destino, estilos, callback=None):
             f"={col_letter_ao}{fila_total}/{col_letter_al}{fila_total}", 
             estilos,
             aplicar_borde=True,  # SÍ aplicar borde
-            numero_formato='0.00%'
+            numero_formato='0.00%',
+            totales=totales,
+            calculado=_dividir(operando(fila_total, col_ao), operando(fila_total, col_al))
         )
         
         # Celda AN - "PRE CANCELACION" (texto con borde por tener información)
@@ -293,7 +390,8 @@ def agregar_pie_pagina(ws, fila_total, headers_destino, estilos, callback=None):
             ws.cell(fila_pre_cancelacion, col_an), 
             "PRE CANCELACION", 
             estilos,
-            aplicar_borde=True
+            aplicar_borde=True,
+            totales=totales
         )
         
         # Celda AO en fila PRE CANCELACION: operando (vacía, pero con borde porque interviene en fórmula)
@@ -302,7 +400,8 @@ def agregar_pie_pagina(ws, fila_total, headers_destino, estilos, callback=None):
             "", 
             estilos,
             aplicar_borde=True,
-            forzar_borde=True
+            forzar_borde=True,
+            totales=totales
         )
 
         # En la fila INFERIOR, colocar la celda AO amarilla con la fórmula
@@ -314,7 +413,9 @@ def agregar_pie_pagina(ws, fila_total, headers_destino, estilos, callback=None):
             formula_ao_inferior, 
             estilos,
             numero_formato='0.00',
-            fill=estilos.fill_amarillo
+            fill=estilos.fill_amarillo,
+            totales=totales,
+            calculado=_restar(operando(fila_total, col_ao), operando(fila_pre_cancelacion, col_ao))
         )
         
         # Celda vacía con borde en AO (2 filas después de la fórmula amarilla, antes de BASE 12%)
@@ -324,7 +425,8 @@ def agregar_pie_pagina(ws, fila_total, headers_destino, estilos, callback=None):
             "", 
             estilos,
             aplicar_borde=True,
-            forzar_borde=True
+            forzar_borde=True,
+            totales=totales
         )
         
         # Celda AP - Operando vacío (se usará en fórmulas), borde forzado
@@ -333,7 +435,8 @@ def agregar_pie_pagina(ws, fila_total, headers_destino, estilos, callback=None):
             "", 
             estilos,
             aplicar_borde=True,
-            forzar_borde=True
+            forzar_borde=True,
+            totales=totales
         )
         
         # Celda AQ - "BASE 0%" (texto con borde y fondo amarillo)
@@ -342,7 +445,8 @@ def agregar_pie_pagina(ws, fila_total, headers_destino, estilos, callback=None):
             "BASE 0%", 
             estilos,
             aplicar_borde=True,
-            fill=estilos.fill_amarillo
+            fill=estilos.fill_amarillo,
+            totales=totales
         )
 
         # Celda AR - "TOTAL PRE CANCELACIONES" (texto con borde)
@@ -350,7 +454,8 @@ def agregar_pie_pagina(ws, fila_total, headers_destino, estilos, callback=None):
             ws.cell(fila_pre_cancelacion, col_ar), 
             "TOTAL PRE CANCELACIONES", 
             estilos,
-            aplicar_borde=True
+            aplicar_borde=True,
+            totales=totales
         )
         
         # Ajustar ancho de columna AR para "TOTAL PRE CANCELACIONES"
@@ -362,7 +467,8 @@ def agregar_pie_pagina(ws, fila_total, headers_destino, estilos, callback=None):
             "", 
             estilos,
             aplicar_borde=True,
-            forzar_borde=True
+            forzar_borde=True,
+            totales=totales
         )
         
         # Fila de BASE 12% (texto con borde y fondo amarillo) colocada en columna AQ
@@ -371,7 +477,8 @@ def agregar_pie_pagina(ws, fila_total, headers_destino, estilos, callback=None):
             "BASE 12%", 
             estilos,
             aplicar_borde=True,
-            fill=estilos.fill_amarillo
+            fill=estilos.fill_amarillo,
+            totales=totales
         )
         
         # Celda AP en fila BASE 12%: vacía con borde (al lado izquierdo de BASE 12%)
@@ -380,7 +487,8 @@ def agregar_pie_pagina(ws, fila_total, headers_destino, estilos, callback=None):
             "", 
             estilos,
             aplicar_borde=True,
-            forzar_borde=True
+            forzar_borde=True,
+            totales=totales
         )
         
         # Celda AR en fila BASE 12%: vacía con borde
@@ -389,7 +497,8 @@ def agregar_pie_pagina(ws, fila_total, headers_destino, estilos, callback=None):
             "", 
             estilos,
             aplicar_borde=True,
-            forzar_borde=True
+            forzar_borde=True,
+            totales=totales
         )
         
         # Fila DEBAJO de BASE 12%: AO copia valor de arriba
@@ -398,7 +507,9 @@ def agregar_pie_pagina(ws, fila_total, headers_destino, estilos, callback=None):
             ws.cell(fila_ao_copia, col_ao), 
             f"={col_letter_ao}{fila_base_12}", 
             estilos,
-            numero_formato='0.00'
+            numero_formato='0.00',
+            totales=totales,
+            calculado=operando(fila_base_12, col_ao)
         )
         
         # Encabezados tabla de pólizas (texto con borde)
@@ -406,14 +517,16 @@ def agregar_pie_pagina(ws, fila_total, headers_destino, estilos, callback=None):
             ws.cell(fila_tabla_encabezado, col_ao), 
             "#", 
             estilos,
-            aplicar_borde=True
+            aplicar_borde=True,
+            totales=totales
         )
         
         aplicar_formato_celda(
             ws.cell(fila_tabla_encabezado, col_ap), 
             "TOTAL", 
             estilos,
-            aplicar_borde=True
+            aplicar_borde=True,
+            totales=totales
         )
         
         # Pólizas (texto en columna AN, con borde; celdas AO/AP vacías con borde)
@@ -421,42 +534,48 @@ def agregar_pie_pagina(ws, fila_total, headers_destino, estilos, callback=None):
             ws.cell(fila_poliza_1, col_an), 
             "5852", 
             estilos,
-            aplicar_borde=True
+            aplicar_borde=True,
+            totales=totales
         )
         aplicar_formato_celda(
             ws.cell(fila_poliza_1, col_ao), 
             "", 
             estilos,
             aplicar_borde=True,
-            forzar_borde=True
+            forzar_borde=True,
+            totales=totales
         )
         aplicar_formato_celda(
             ws.cell(fila_poliza_1, col_ap), 
             "", 
             estilos,
             aplicar_borde=True,
-            forzar_borde=True
+            forzar_borde=True,
+            totales=totales
         )
         
         aplicar_formato_celda(
             ws.cell(fila_poliza_2, col_an), 
             "7650", 
             estilos,
-            aplicar_borde=True
+            aplicar_borde=True,
+            totales=totales
         )
         aplicar_formato_celda(
             ws.cell(fila_poliza_2, col_ao), 
             "", 
             estilos,
             aplicar_borde=True,
-            forzar_borde=True
+            forzar_borde=True,
+            totales=totales
         )
         aplicar_formato_celda(
             ws.cell(fila_poliza_2, col_ap), 
             "", 
             estilos,
             aplicar_borde=True,
-            forzar_borde=True
+            forzar_borde=True,
+            totales=totales
         )
         
         # Totales tabla - Columna AO (con fondo amarillo)
@@ -465,7 +584,9 @@ def agregar_pie_pagina(ws, fila_total, headers_destino, estilos, callback=None):
             f"=+{col_letter_ao}{fila_poliza_1}+{col_letter_ao}{fila_poliza_2}", 
             estilos,
             numero_formato='0.00',
-            fill=estilos.fill_amarillo
+            fill=estilos.fill_amarillo,
+            totales=totales,
+            calculado=_sumar(operando(fila_poliza_1, col_ao), operando(fila_poliza_2, col_ao))
         )
         
         # Totales tabla - Columna AP (con fondo amarillo)
@@ -474,7 +595,9 @@ def agregar_pie_pagina(ws, fila_total, headers_destino, estilos, callback=None):
             f"=+{col_letter_ap}{fila_poliza_1}+{col_letter_ap}{fila_poliza_2}", 
             estilos,
             numero_formato='0.00',
-            fill=estilos.fill_amarillo
+            fill=estilos.fill_amarillo,
+            totales=totales,
+            calculado=_sumar(operando(fila_poliza_1, col_ap), operando(fila_poliza_2, col_ap))
         )
         
         if callback:
@@ -3,9 +3,126 @@
 Lógica de transferencia de datos y validación de filas
 """
 
+import re
+from itertools import islice
+
+import numpy as np
 import pandas as pd
 from openpyxl.cell.cell import MergedCell
-from datetime import datetime, date
+from openpyxl.utils import get_column_letter
+
+from ..config import CONFIG_SISTEMA, PALABRAS_CLAVE_TOTALES
+from .cancelacion import comprobar_cancelacion
+from .escritor_xml import HojaPorFilas
+from .descriptor_plantilla import DescriptorPlantilla
+from .formulas_compartidas import FormulasCompartidas, compartir_formulas
+from .formulas_fila import CALCULAR, EvaluadorFormulas
+from .transformaciones import OMITIR, TransformacionesColumnares, _instancias
+from .valores_cacheados import SIN_VALOR, valores_cacheados
+
+
+def indices_especiales_origen(headers_origen):
+    """Ubica PROVINCIA, CIUDAD, PAIS DE ORIGEN y TIPO IDENTIFICACION en los encabezados origen
+
+    Returns:
+        dict: {'idx_provincia_orig', 'idx_ciudad_orig', 'idx_pais_origen',
+               'idx_tipo_identificacion'} con índices base 0 o None
+    """
+    indices = {
+        'idx_provincia_orig': None,
+        'idx_ciudad_orig': None,
+        'idx_pais_origen': None,
+        'idx_tipo_identificacion': None,
+    }
+    for idx, header in enumerate(headers_origen):
+        if not pd.notna(header):
+            continue
+        header_str = str(header).strip().upper()
+        if indices['idx_provincia_orig'] is None and 'PROVINCIA' in header_str and 'PAIS' not in header_str:
+            indices['idx_provincia_orig'] = idx
+        if indices['idx_ciudad_orig'] is None and 'CIUDAD' in header_str:
+            indices['idx_ciudad_orig'] = idx
+        if indices['idx_pais_origen'] is None and 'PAIS DE ORIGEN' in header_str:
+            indices['idx_pais_origen'] = idx
+        if indices['idx_tipo_identificacion'] is None and 'TIPO IDENTIFICACION' in header_str:
+            indices['idx_tipo_identificacion'] = idx
+    return indices
+
+
+# Primeras columnas que descartan la fila (vacías, nulos escritos o rótulos de totales exactos)
+_TEXTOS_DESCARTE = frozenset(['', 'NAN', 'NONE', 'NULL']) | frozenset(PALABRAS_CLAVE_TOTALES)
+# Una fila válida que contiene alguna palabra clave marca el fin de los datos
+_PATRON_TOTALES = '|'.join(re.escape(palabra) for palabra in PALABRAS_CLAVE_TOTALES)
+
+def _presentes(valores):
+    """Máscara de los valores distintos de OMITIR (sin __eq__ propio, se compara por identidad)"""
+    return np.asarray(valores != OMITIR, dtype=bool)
+
+
+# Columnas donde los datos reemplazan a la fórmula de la plantilla (PROVINCIA, CIUDAD, AP a BC)
+_COLUMNAS_SOBRE_FORMULA = frozenset({15, 16}) | frozenset(range(42, 56))
+
+
+def mascara_filas_validas(primeras_columnas):
+    """Decide en una pasada qué filas se transfieren y dónde terminan los datos
+
+    Args:
+        primeras_columnas: valores de la primera columna de cada fila
+    Returns:
+        tuple: (máscara bool de filas a conservar, índice de la primera fila de totales o None)
+    """
+    columna = pd.Series(primeras_columnas, dtype=object)
+    es_texto = pd.Series(_instancias(columna.to_numpy(), str), index=columna.index)
+    textos = columna.where(es_texto, '').str.strip().str.upper()
+
+    conservar = columna.notna() & ~(es_texto & textos.isin(_TEXTOS_DESCARTE))
+    totales = conservar & es_texto & textos.str.contains(_PATRON_TOTALES, regex=True)
+
+    paradas = np.flatnonzero(totales.to_numpy())
+    parada = int(paradas[0]) if len(paradas) else None
+    return conservar.to_numpy(), parada
+
+
+def _es_formula(valor):
+    """True si el valor se guardaría como fórmula (misma regla que openpyxl)"""
+    return isinstance(valor, str) and len(valor) > 1 and valor.startswith('=')
+
+
+class FormulaCompilada:
+    """Fórmula de la fila plantilla separada en texto fijo y referencias de fila relativas
+
+    Las referencias con '$' quedan fijas; el resto se desplaza con la fila destino.
+    En columnas EDAD se incluye ya el ROUND(...,2) si la fórmula no lo tiene.
+    """
+
+    __slots__ = ('_plantilla', '_filas')
+
+    def __init__(self, formula, patron, redondear=False):
+        if redondear and 'ROUND' not in formula.upper():
+            formula_sin_igual = formula[1:] if formula.startswith('=') else formula
+            prefijo, sufijo = '=ROUND(', ',2)'
+        else:
+            formula_sin_igual = formula
+            prefijo = sufijo = ''
+
+        partes = [prefijo]
+        self._filas = []
+        pos = 0
+        for match in patron.finditer(formula_sin_igual):
+            if '$' in match.group(0):
+                continue
+            partes.append(formula_sin_igual[pos:match.start()].replace('{', '{{').replace('}', '}}'))
+            partes.append(match.group(1).replace('{', '{{').replace('}', '}}'))
+            partes.append('{%d}' % len(self._filas))
+            self._filas.append(int(match.group(2)))
+            pos = match.end()
+        partes.append(formula_sin_igual[pos:].replace('{', '{{').replace('}', '}}'))
+        partes.append(sufijo)
+        self._plantilla = ''.join(partes)
+
+    def en_fila(self, diferencia):
+        """Texto de la fórmula desplazado `diferencia` filas"""
+        return self._plantilla.format(*[fila + diferencia for fila in self._filas])
 
 
 class TransferenciaDatos:
@@ -16,341 +133,443 @@ class TransferenciaDatos:
         self._cache_indices_columnas = cache_indices
         self._formulas_cache = formulas_cache
         self._formulas_pattern = formulas_pattern
-        self._headers_cache = {}
+        self._estilos_formato = {}
+        self._totales = None
+        self._evaluador = None
+        self._evaluador_fila6 = None
+        self._calculados = {}
+        self._compartidas = None
     
-    def transferir_datos(self, ws, df_origen, fila_encabezados, headers_origen, mapeo, callback=None):
-        """Transfiere datos de origen a destino replicando la lógica original"""
+    def transferir_datos(self, ws, filas_origen, headers_origen, mapeo, callback=None, descriptor=None, totales=None,
+                         montos=None, cancelacion=None, progreso=None):
+        """Transfiere datos de origen a destino replicando la lógica original
+
+        filas_origen es un iterable (p. ej. LectorOrigen.filas) con las filas
+        posteriores a los encabezados; se consume una sola vez, sin materializarlo.
+        descriptor (DescriptorPlantilla) trae las columnas especiales del destino;
+        si no se pasa se compila desde ws. totales (AcumuladorTotales) acumula
+        las columnas con total de cada fila escrita. Las fórmulas copiadas de la
+        fila 6 se escriben con su valor calculado (EvaluadorFormulas) por bloque y
+        como fórmulas compartidas de Excel (FormulasCompartidas). montos
+        (ColumnaMontos) recibe por bloque el valor final de MONTO CREDITO para Hoja2.
+        cancelacion (TokenCancelacion) se comprueba antes de cada lote de filas y
+        progreso (MedidorProgreso) recibe después de cada lote las filas escritas y leídas.
+        """
         fila_destino = 6
         filas_procesadas = 0
+        self._totales = totales
+        self._evaluador = self._evaluador_fila6 = None
+        self._calculados = {}
+        self._compartidas = None
 
-        headers_destino = list(ws[5])
-        fila_origen_inicio = fila_encabezados + 1
-        limite_origen = len(df_origen)
-        primera_columna_array = df_origen.iloc[fila_origen_inicio:, 0].values
+        if descriptor is None:
+            descriptor = DescriptorPlantilla.compilar(ws)
 
-        # Índices cacheados para columnas especiales
-        idx_pais_residencia_dest = self._cache_indices_columnas.get('idx_pais_residencia_dest')
-        if idx_pais_residencia_dest is None:
-            for idx, cell in enumerate(headers_destino):
-                if cell.value and 'PAIS DE RESIDENCIA' in str(cell.value).upper():
-                    idx_pais_residencia_dest = idx + 1
-                    self._cache_indices_columnas['idx_pais_residencia_dest'] = idx_pais_residencia_dest
-                    break
-
-        idx_pais_origen = self._cache_indices_columnas.get('idx_pais_origen')
-        idx_provincia_orig = self._cache_indices_columnas.get('idx_provincia_orig')
-        idx_ciudad_orig = self._cache_indices_columnas.get('idx_ciudad_orig')
+        # Columnas especiales del origen (se recalculan en cada transferencia)
+        self._cache_indices_columnas.update(indices_especiales_origen(headers_origen))
+        idx_provincia_orig = self._cache_indices_columnas['idx_provincia_orig']
+        idx_ciudad_orig = self._cache_indices_columnas['idx_ciudad_orig']
 
         col_provincia_dest = 15
         col_ciudad_dest = 16
 
         # Forzar mapeo de PROVINCIA y CIUDAD
-        if idx_provincia_orig is None:
-            for idx, header in enumerate(headers_origen):
-                if pd.notna(header):
-                    header_str = str(header).strip().upper()
-                    if 'PROVINCIA' in header_str and 'PAIS' not in header_str:
-                        mapeo[idx] = col_provincia_dest
-                        idx_provincia_orig = idx
-                        self._cache_indices_columnas['idx_provincia_orig'] = idx
-                        break
-        else:
+        if idx_provincia_orig is not None:
             mapeo[idx_provincia_orig] = col_provincia_dest
-
-        if idx_ciudad_orig is None:
-            for idx, header in enumerate(headers_origen):
-                if pd.notna(header):
-                    header_str = str(header).strip().upper()
-                    if 'CIUDAD' in header_str:
-                        mapeo[idx] = col_ciudad_dest
-                        idx_ciudad_orig = idx
-                        self._cache_indices_columnas['idx_ciudad_orig'] = idx
-                        break
-        else:
+        if idx_ciudad_orig is not None:
             mapeo[idx_ciudad_orig] = col_ciudad_dest
 
-        if idx_pais_origen is None:
-            for idx, header in enumerate(headers_origen):
-                if pd.notna(header) and 'PAIS DE ORIGEN' in str(header).upper():
-                    idx_pais_origen = idx
-                    self._cache_indices_columnas['idx_pais_origen'] = idx
-                    break
+        # Las transformaciones se calculan por columna sobre bloques de filas válidas
+        motor = TransformacionesColumnares(
+            headers_origen, mapeo, self._cache_indices_columnas['idx_tipo_identificacion']
+        )
+        filas_por_bloque = CONFIG_SISTEMA['PROCESAMIENTO'].get('filas_por_bloque', 2000)
+        bloque = []
 
-        for idx_local, idx_origen in enumerate(range(fila_origen_inicio, limite_origen)):
-            try:
-                primera_col = primera_columna_array[idx_local]
-                fila_valida = False
-
-                if pd.notna(primera_col):
-                    if isinstance(primera_col, str):
-                        valor_limpio = primera_col.strip()
-                        if valor_limpio and valor_limpio.upper() not in ['NAN', 'NONE', 'NULL', 'TOTAL', 'CUADRE', 'PRECANCELACION', '']:
-                            fila_valida = True
-                    else:
-                        fila_valida = True
-
-                if not fila_valida:
+        # Con los motores de escritura por filas (xml, write_only) cada fila se emite completa
+        if isinstance(ws, HojaPorFilas):
+            transferir_fila = self.transferir_fila_directa
+        else:
+            transferir_fila = self.transferir_fila_optimizada
+
+        def escribir_bloque(fila_destino, filas_procesadas):
+            columnas = motor.transformar_bloque(bloque)
+            datos = self._datos_bloque(columnas)
+            self._calculados = self._calcular_formulas(ws, datos, len(bloque), fila_destino, descriptor, callback)
+            escritas = np.zeros(len(bloque), dtype=bool)
+            for i in range(len(bloque)):
+                try:
+                    transferir_fila(columnas, i, ws, fila_destino, descriptor)
+                    filas_procesadas += 1
+                    fila_destino += 1
+                    escritas[i] = True
+                except Exception:
                     continue
-
-                if isinstance(primera_col, str):
-                    primera_col_str = primera_col.strip().upper()
-                    if 'TOTAL' in primera_col_str or 'CUADRE' in primera_col_str or 'PRECANCELACION' in primera_col_str:
-                        break
-            except Exception:
-                continue
-
-            try:
-                self.transferir_fila_optimizada(
-                    df_origen,
-                    idx_origen,
-                    ws,
-                    fila_destino,
-                    mapeo,
-                    headers_origen,
-                    headers_destino,
-                    idx_pais_origen,
-                    idx_pais_residencia_dest,
-                )
-                filas_procesadas += 1
-                fila_destino += 1
-            except Exception:
-                continue
+            if montos is not None:
+                formulas = self._evaluador.formulas if self._evaluador is not None else descriptor.formulas_fila6
+                finales = self._valores_finales(montos.col, datos, len(bloque), descriptor, formulas)
+                montos.agregar(finales[escritas])
+            bloque.clear()
+            return fila_destino, filas_procesadas
+
+        # Las filas llegan por lotes: la validez y la fila de totales se deciden sobre
+        # la primera columna completa del lote
+        filas_origen = iter(filas_origen)
+        filas_leidas = 0
+        while True:
+            comprobar_cancelacion(cancelacion)
+            lote = list(islice(filas_origen, filas_por_bloque))
+            if not lote:
+                break
+            conservar, parada = mascara_filas_validas([fila[0] if fila else None for fila in lote])
+            if parada is not None:
+                conservar = conservar[:parada]
+            bloque.extend(lote[i] for i in np.flatnonzero(conservar))
+            if len(bloque) >= filas_por_bloque:
+                fila_destino, filas_procesadas = escribir_bloque(fila_destino, filas_procesadas)
+            filas_leidas += len(lote)
+            if progreso is not None:
+                progreso.filas(filas_procesadas, filas_leidas)
+            if parada is not None:
+                break
+
+        if bloque:
+            comprobar_cancelacion(cancelacion)
+            fila_destino, filas_procesadas = escribir_bloque(fila_destino, filas_procesadas)
 
         return filas_procesadas
 
-    def transferir_fila_optimizada(self, df_origen, idx_origen, ws_destino, fila_destino,
-                                   mapeo_columnas, headers_origen, headers_destino,
-                                   idx_pais_origen=None, idx_pais_residencia_dest=None):
-        """Copia fórmulas y datos aplicando las mismas transformaciones del monolito"""
+    def transferir_fila_optimizada(self, columnas, i, ws_destino, fila_destino, descriptor):
+        """Copia fórmulas y escribe la fila i de un bloque ya transformado
+
+        columnas es el resultado de TransformacionesColumnares.transformar_bloque.
+        """
         fila_plantilla = 6
-        row_origen = df_origen.iloc[idx_origen]
-
-        # Detectar tipo de identificación
-        tipo_identificacion = None
-        idx_tipo_id = self._cache_indices_columnas.get('idx_tipo_identificacion')
-        if idx_tipo_id is None:
-            for idx, header in enumerate(headers_origen):
-                if pd.notna(header) and 'TIPO IDENTIFICACION' in str(header).upper():
-                    idx_tipo_id = idx
-                    self._cache_indices_columnas['idx_tipo_identificacion'] = idx
-                    break
-        if idx_tipo_id is not None and idx_tipo_id < len(row_origen):
-            tipo_valor = row_origen.iloc[idx_tipo_id]
-            if pd.notna(tipo_valor):
-                tipo_identificacion = str(tipo_valor).strip()
+
+        calculados = self._calculados_fila(i)
+        copiadas = {}
 
         # Paso 1: copiar fórmulas de la fila 6
         if fila_destino != fila_plantilla:
             diferencia_filas = fila_destino - fila_plantilla
 
             if fila_plantilla not in self._formulas_cache:
-                formulas_plantilla = {}
-                max_cols = min(ws_destino.max_column, 200)
-                for idx, cell_plantilla in enumerate(ws_destino[fila_plantilla], start=1):
-                    if idx > max_cols:
-                        break
-                    if not isinstance(cell_plantilla, MergedCell) and cell_plantilla.data_type == 'f':
-                        formulas_plantilla[idx] = str(cell_plantilla.value)
-                self._formulas_cache[fila_plantilla] = formulas_plantilla
-
-            formulas_plantilla = self._formulas_cache[fila_plantilla]
-
-            def reemplazar_ref(match):
-                col_ref = match.group(1)
-                fila_ref = int(match.group(2))
-                match_completo = match.group(0)
-                if '$' in match_completo:
-                    partes = match_completo.split(str(fila_ref))
-                    if len(partes) > 0 and '$' in partes[0]:
-                        return match_completo
-                return f"{col_ref}{fila_ref + diferencia_filas}"
-
-            headers_edad_cache = {}
-            for col in formulas_plantilla.keys():
-                if col-1 < len(headers_destino) and headers_destino[col-1].value:
-                    header_cell = str(headers_destino[col-1].value).upper()
-                    if 'EDAD' in header_cell:
-                        headers_edad_cache[col] = True
-
-            for col, formula_original in formulas_plantilla.items():
+                self._formulas_cache[fila_plantilla] = self._compilar_formulas_plantilla(
+                    ws_destino, fila_plantilla, descriptor
+                )
+
+            for col, formula in self._formulas_cache[fila_plantilla].items():
                 try:
                     cell_destino = ws_destino.cell(fila_destino, col)
                     if isinstance(cell_destino, MergedCell):
                         continue
-                    formula_ajustada = self._formulas_pattern.sub(reemplazar_ref, formula_original) if diferencia_filas != 0 else formula_original
-                    if col in headers_edad_cache and 'ROUND' not in formula_ajustada.upper():
-                        formula_sin_igual = formula_ajustada[1:] if formula_ajustada.startswith('=') else formula_ajustada
-                        formula_ajustada = f"=ROUND({formula_sin_igual},2)"
-                    cell_destino.value = formula_ajustada
+                    cell_destino.value = copiadas[col] = formula.en_fila(diferencia_filas)
                 except Exception:
                     continue
 
-        # Paso 2: copiar datos mapeados con transformaciones
-        self._aplicar_transformaciones(
-            df_origen, idx_origen, ws_destino, fila_destino, mapeo_columnas,
-            headers_origen, headers_destino, tipo_identificacion, idx_pais_origen
-        )
+        # Paso 2: escribir datos mapeados (ya transformados por columna)
+        self._escribir_valores(columnas, i, ws_destino, fila_destino)
 
         # Paso 3: establecer PAIS DE RESIDENCIA en 239
-        if idx_pais_residencia_dest is not None:
+        if descriptor.col_pais_residencia is not None:
             try:
-                cell_destino = ws_destino.cell(fila_destino, idx_pais_residencia_dest)
+                cell_destino = ws_destino.cell(fila_destino, descriptor.col_pais_residencia)
                 if not isinstance(cell_destino, MergedCell) and cell_destino.data_type != 'f':
                     cell_destino.value = '239'
             except Exception:
                 pass
 
         # Paso 4: escribir número de póliza fijo 5852
-        self._escribir_numero_poliza(ws_destino, fila_destino, headers_destino)
+        self._escribir_numero_poliza(ws_destino, fila_destino, descriptor)
 
         # Paso 5: escribir nombre producto fijo
-        self._escribir_nombre_producto(ws_destino, fila_destino, headers_destino)
-
-    def _aplicar_transformaciones(self, df_origen, idx_origen, ws_destino, fila_destino,
-                                  mapeo_columnas, headers_origen, headers_destino,
-                                  tipo_identificacion, idx_pais_origen):
-        """Aplica transformaciones de datos según tipo de columna"""
-        row_origen = df_origen.iloc[idx_origen]
-        valor_pais_origen = None
-        
-        if idx_pais_origen is not None and idx_pais_origen < len(row_origen):
-            valor_pais = row_origen.iloc[idx_pais_origen]
-            if pd.notna(valor_pais) and str(valor_pais).strip() != '':
-                valor_pais_origen = valor_pais
-
-        es_provincia_ciudad_cols = {15, 16}
-        es_columna_ap_bc = set(range(42, 56))
-        row_values = row_origen.values if hasattr(row_origen, 'values') else [row_origen.iloc[i] for i in range(len(row_origen))]
-
-        for idx_origen_col, col_destino in mapeo_columnas.items():
-            try:
-                if idx_origen_col >= len(row_values):
-                    continue
-
-                valor = row_values[idx_origen_col]
+        self._escribir_nombre_producto(ws_destino, fila_destino, descriptor)
+
+        # Valores calculados de las celdas que quedaron con fórmula
+        if calculados:
+            cacheados = valores_cacheados(ws_destino)
+            for col, valor in calculados.items():
+                cell = ws_destino._cells.get((fila_destino, col))
+                if cell is not None and cell.data_type == 'f':
+                    cacheados[(fila_destino, col)] = valor
+
+        # Las que conservan la fórmula copiada forman el grupo compartido de su columna
+        if copiadas:
+            compartidas = self._formulas_compartidas(ws_destino, fila_plantilla)
+            for col, formula in copiadas.items():
+                cell = ws_destino._cells.get((fila_destino, col))
+                if cell is not None and cell._value == formula:
+                    compartidas.registrar(fila_destino, col)
+
+        if self._totales is not None:
+            valores = []
+            for col in self._totales.columnas:
+                cell = ws_destino._cells.get((fila_destino, col))
+                valores.append((col, cell.value if cell is not None else None, calculados.get(col, SIN_VALOR)))
+            self._totales.registrar_fila(valores)
+
+    def transferir_fila_directa(self, columnas, i, hoja, fila_destino, descriptor):
+        """Equivalente de transferir_fila_optimizada para HojaPorFilas
+
+        Arma la fila completa con las mismas reglas y la emite de una vez como XML.
+        """
+        fila_plantilla = 6
+        celdas = {}
+        calculados = self._calculados_fila(i)
+        copiadas = {}
 
-                if pd.isna(valor):
+        # Paso 1: fórmulas de la fila 6 desplazadas
+        if fila_destino != fila_plantilla and fila_plantilla in self._formulas_cache:
+            diferencia_filas = fila_destino - fila_plantilla
+            for col, formula in self._formulas_cache[fila_plantilla].items():
+                if hoja.es_combinada(fila_destino, col):
                     continue
-
-                valor_str = valor.strip() if isinstance(valor, str) else str(valor).strip()
-                if not valor_str or valor_str.lower() == 'nan':
+                try:
+                    copiadas[col] = formula.en_fila(diferencia_filas)
+                    hoja.asignar(celdas, fila_destino, col, copiadas[col])
+                except Exception:
                     continue
 
+        # Paso 2: datos mapeados
+        for col_destino, valores, formatos in columnas:
+            valor = valores[i]
+            if valor is OMITIR or hoja.es_combinada(fila_destino, col_destino):
+                continue
+            if (col_destino not in _COLUMNAS_SOBRE_FORMULA
+                    and _es_formula(hoja.valor_actual(celdas, fila_destino, col_destino))):
+                continue
+            try:
+                hoja.asignar(celdas, fila_destino, col_destino, valor, formatos[i])
+            except Exception:
+                continue
+
+        # Pasos 3 a 5: PAIS DE RESIDENCIA, número de póliza y nombre producto fijos
+        fijos = (
+            (descriptor.col_pais_residencia, '239'),
+            (descriptor.col_numero_poliza, '5852'),
+            (descriptor.col_nombre_producto, 'MONTO DEL CREDITO'),
+        )
+        for col, valor in fijos:
+            if col is None or hoja.es_combinada(fila_destino, col):
+                continue
+            if not _es_formula(hoja.valor_actual(celdas, fila_destino, col)):
+                hoja.asignar(celdas, fila_destino, col, valor)
+
+        # La fila 6 ya no se puede consultar una vez emitida: se compila antes
+        if fila_destino == fila_plantilla and fila_plantilla not in self._formulas_cache:
+            self._formulas_cache[fila_plantilla] = self._compilar_formulas_directas(
+                hoja, celdas, fila_plantilla, descriptor
+            )
+
+        valores_totales = None
+        if self._totales is not None:
+            valores_totales = [
+                (col, None if hoja.es_combinada(fila_destino, col) else hoja.valor_actual(celdas, fila_destino, col),
+                 calculados.get(col, SIN_VALOR))
+                for col in self._totales.columnas
+            ]
+
+        if copiadas:
+            compartidas = self._formulas_compartidas(hoja, fila_plantilla)
+            for col, formula in copiadas.items():
+                if col in celdas and celdas[col][0] == formula:
+                    compartidas.registrar(fila_destino, col)
+
+        hoja.escribir_fila(fila_destino, celdas, calculados)
+
+        if valores_totales is not None:
+            self._totales.registrar_fila(valores_totales)
+
+    @staticmethod
+    def _datos_bloque(columnas):
+        """{col destino: arreglo object} con el último dato mapeado de cada fila (OMITIR si no hay)"""
+        datos = {}
+        for col_destino, valores, _ in columnas:
+            presentes = _presentes(valores)
+            previos = datos.get(col_destino)
+            datos[col_destino] = np.where(presentes, valores, previos if previos is not None else OMITIR)
+        return datos
+
+    @staticmethod
+    def _valores_finales(col, datos, n, descriptor, formulas):
+        """Valor con que queda la columna en cada fila de un bloque (CALCULAR si queda la fórmula)
+
+        Mismas reglas que transferir_fila_*: los datos no pisan fórmulas salvo en
+        PROVINCIA, CIUDAD y AP a BC, y los valores fijos solo van donde no hay fórmula.
+        """
+        fijos = {
+            descriptor.col_pais_residencia: '239',
+            descriptor.col_numero_poliza: '5852',
+            descriptor.col_nombre_producto: 'MONTO DEL CREDITO',
+        }
+        valores = datos.get(col)
+        if valores is None:
+            valores = np.full(n, OMITIR, dtype=object)
+        presentes = _presentes(valores)
+        if col in formulas:
+            escrito = presentes if col in _COLUMNAS_SOBRE_FORMULA else np.zeros(n, dtype=bool)
+            final = np.where(escrito, valores, CALCULAR)
+            if col in fijos:
+                final = np.where(escrito, fijos[col], final)
+        elif col in fijos:
+            final = np.full(n, fijos[col], dtype=object)
+        else:
+            final = np.where(presentes, valores, None)
+        return final.astype(object)
+
+    def _calcular_formulas(self, ws, datos, n, fila_destino, descriptor, callback=None):
+        """Valores de las fórmulas de la fila 6 para las n filas de un bloque
+
+        Arma, por columna, el valor final de cada celda que leen las fórmulas
+        (_valores_finales) y evalúa todo el bloque de una vez.
+
+        Returns:
+            dict: {col: arreglo con el valor calculado de cada fila}
+        """
+        if not descriptor.formulas_fila6 or n == 0:
+            return {}
+
+        if self._evaluador is None:
+            self._crear_evaluadores(ws, datos, fila_destino, descriptor, callback)
+
+        formulas = self._evaluador.formulas
+        # Columnas que lee cualquiera de los dos evaluadores (el de la fila 6 puede leer otras)
+        leidas = self._evaluador.referencias | set(formulas)
+        if fila_destino == 6 and self._evaluador_fila6 is not self._evaluador:
+            leidas |= self._evaluador_fila6.referencias | set(self._evaluador_fila6.formulas)
+        entradas = {
+            col: self._valores_finales(col, datos, n, descriptor, formulas)
+            for col in leidas
+        }
+
+        calculados = self._evaluador.evaluar(entradas, n)
+        if fila_destino == 6 and self._evaluador_fila6 is not self._evaluador:
+            # La fila 6 conserva las fórmulas de la plantilla tal cual (sin el ROUND de EDAD)
+            primera = {col: valores[:1] for col, valores in entradas.items()}
+            for col, valores in self._evaluador_fila6.evaluar(primera, 1).items():
+                if col in calculados:
+                    calculados[col][0] = valores[0]
+        return calculados
+
+    def _crear_evaluadores(self, ws, datos, fila_destino, descriptor, callback=None):
+        """Compila las fórmulas de la fila 6 y reporta las que quedan sin valor calculado"""
+        # Una columna de la fila 6 reemplazada por datos deja de copiarse al resto de filas
+        reemplazadas = set()
+        if fila_destino == 6:
+            reemplazadas = {
+                col for col in descriptor.formulas_fila6
+                if col in _COLUMNAS_SOBRE_FORMULA and col in datos and datos[col][0] is not OMITIR
+            }
+
+        def valor_fijo(fila, col):
+            if isinstance(ws, HojaPorFilas):
+                return None if ws.es_combinada(fila, col) else ws.valor_actual({}, fila, col)
+            cell = ws._cells.get((fila, col))
+            return None if cell is None or isinstance(cell, MergedCell) else cell.value
+
+        copiadas = {
+            col: FormulaCompilada(formula, self._formulas_pattern, redondear=col in descriptor.columnas_edad).en_fila(0)
+            for col, formula in descriptor.formulas_fila6.items() if col not in reemplazadas
+        }
+        self._evaluador = EvaluadorFormulas(copiadas, valor_fijo)
+        if all(descriptor.formulas_fila6.get(col) == formula for col, formula in copiadas.items()):
+            self._evaluador_fila6 = self._evaluador
+        else:
+            self._evaluador_fila6 = EvaluadorFormulas(
+                {col: descriptor.formulas_fila6[col] for col in copiadas}, valor_fijo
+            )
+
+        if callback:
+            no_soportadas = dict(self._evaluador_fila6.no_soportadas)
+            no_soportadas.update(self._evaluador.no_soportadas)
+            for col, motivo in sorted(no_soportadas.items()):
+                callback(f"  ⚠️ Fórmula de {get_column_letter(col)}6 sin valor calculado: {motivo}")
+
+    def _calculados_fila(self, i):
+        """{col: valor calculado} de la fila i del bloque actual (sin las no calculadas)"""
+        calculados = {}
+        for col, valores in self._calculados.items():
+            valor = valores[i]
+            if valor is not SIN_VALOR:
+                calculados[col] = valor
+        return calculados
+
+    def _formulas_compartidas(self, ws, fila_plantilla):
+        """FormulasCompartidas de la transferencia en curso, asociadas a la hoja destino"""
+        if self._compartidas is None:
+            self._compartidas = FormulasCompartidas(self._formulas_cache[fila_plantilla], fila_plantilla)
+            compartir_formulas(ws, self._compartidas)
+        return self._compartidas
+
+    def _compilar_formulas_directas(self, hoja, celdas, fila_plantilla, descriptor):
+        """Como _compilar_formulas_plantilla, sobre la fila 6 aún no emitida de una HojaPorFilas"""
+        formulas_plantilla = {}
+        max_cols = min(max([hoja.max_column] + list(celdas)), 200)
+        for idx in range(1, max_cols + 1):
+            if hoja.es_combinada(fila_plantilla, idx):
+                continue
+            valor = hoja.valor_actual(celdas, fila_plantilla, idx)
+            if _es_formula(valor):
+                formulas_plantilla[idx] = FormulaCompilada(
+                    valor, self._formulas_pattern, redondear=idx in descriptor.columnas_edad
+                )
+        return formulas_plantilla
+
+    def _compilar_formulas_plantilla(self, ws_destino, fila_plantilla, descriptor):
+        """Compila una vez las fórmulas de la fila plantilla ({col: FormulaCompilada})"""
+        formulas_plantilla = {}
+        max_cols = min(ws_destino.max_column, 200)
+        for idx, cell_plantilla in enumerate(ws_destino[fila_plantilla], start=1):
+            if idx > max_cols:
+                break
+            if not isinstance(cell_plantilla, MergedCell) and cell_plantilla.data_type == 'f':
+                formulas_plantilla[idx] = FormulaCompilada(
+                    str(cell_plantilla.value), self._formulas_pattern, redondear=idx in descriptor.columnas_edad
+                )
+        return formulas_plantilla
+
+    def _escribir_valores(self, columnas, i, ws_destino, fila_destino):
+        """Escribe los valores precalculados de la fila i con su formato"""
+        for col_destino, valores, formatos in columnas:
+            valor = valores[i]
+            if valor is OMITIR:
+                continue
+            try:
                 cell_destino = ws_destino.cell(fila_destino, col_destino)
                 if isinstance(cell_destino, MergedCell):
                     continue
-                if col_destino not in es_provincia_ciudad_cols and col_destino not in es_columna_ap_bc and cell_destino.data_type == 'f':
+                if col_destino not in _COLUMNAS_SOBRE_FORMULA and cell_destino.data_type == 'f':
                     continue
 
-                header_orig = None
-                if idx_origen_col < len(headers_origen):
-                    if idx_origen_col not in self._headers_cache:
-                        self._headers_cache[idx_origen_col] = str(headers_origen[idx_origen_col]).strip().upper()
-                    header_orig = self._headers_cache[idx_origen_col]
-
-                    # Aplicar transformación según tipo de columna
-                    valor = self._transformar_valor(valor, valor_str, header_orig, col_destino, tipo_identificacion)
-
                 cell_destino.value = valor
-                
-                # Aplicar formato
-                if 'FECHA' in (header_orig or '') and isinstance(valor, (date, datetime)):
-                    cell_destino.number_format = 'mm/dd/yyyy'
-                elif isinstance(valor, (int, float)) and not isinstance(valor, bool):
-                    cell_destino.number_format = '0.00'
+
+                formato = formatos[i]
+                if formato is not None:
+                    self.estilos.aplicar(cell_destino, self._estilo_formato(formato))
             except Exception:
                 continue
 
-    def _transformar_valor(self, valor, valor_str, header_orig, col_destino, tipo_identificacion):
-        """Aplica transformación específica según el tipo de columna"""
-        if 'PROVINCIA' in header_orig or 'CIUDAD' in header_orig:
-            if isinstance(valor, (int, float)):
-                return int(valor)
-            elif isinstance(valor_str, str) and valor_str:
-                if len(valor_str) > 1 and valor_str[0] == '0' and valor_str[1:].isdigit():
-                    return int(valor_str[1:])
-                elif valor_str.isdigit():
-                    return int(valor_str)
-                try:
-                    if valor_str.replace('.', '', 1).replace('-', '', 1).isdigit():
-                        return int(float(valor_str))
-                except Exception:
-                    pass
-            return valor_str
-        
-        elif 'NACIONALIDAD' in header_orig:
-            return '239' if tipo_identificacion in ('00', '0') else valor_str
-        
-        elif 'PAIS DE ORIGEN' in header_orig or 'PAÍS DE ORIGEN' in header_orig:
-            if col_destino == 13:
-                try:
-                    if isinstance(valor, (int, float)):
-                        return int(valor)
-                    elif valor_str.isdigit():
-                        return int(valor_str)
-                    elif valor_str.replace('.', '', 1).replace('-', '', 1).isdigit():
-                        return int(float(valor_str))
-                except Exception:
-                    pass
-            return valor_str
-        
-        elif 'MONTO CREDITO' in header_orig or 'MONTO CRÉDITO' in header_orig:
-            try:
-                return round(float(valor), 2)
-            except Exception:
-                return valor_str
-        
-        elif 'PLAZO DE CREDITO' in header_orig or 'PLAZO DE CRÉDITO' in header_orig:
-            try:
-                return round(float(valor), 2)
-            except Exception:
-                return valor_str
-        
-        elif 'FECHA' in header_orig:
-            try:
-                fecha_obj = None
-                if isinstance(valor, (datetime, pd.Timestamp)):
-                    fecha_obj = valor.date() if hasattr(valor, 'date') else valor
-                elif isinstance(valor, str):
-                    if ' ' in valor:
-                        valor = valor.split(' ')[0]
-                    if '-' in valor or '/' in valor:
-                        fecha_parsed = pd.to_datetime(valor)
-                        fecha_obj = fecha_parsed.date() if hasattr(fecha_parsed, 'date') else fecha_parsed
-                if fecha_obj:
-                    return fecha_obj.date() if hasattr(fecha_obj, 'date') else fecha_obj
-            except Exception:
-                pass
-        
-        return valor_str
+    def _estilo_formato(self, formato):
+        """Combinación de estilo interna para un formato numérico de datos"""
+        if formato not in self._estilos_formato:
+            self._estilos_formato[formato] = self.estilos.combinacion(number_format=formato)
+        return self._estilos_formato[formato]
 
-    def _escribir_numero_poliza(self, ws_destino, fila_destino, headers_destino):
+    def _escribir_numero_poliza(self, ws_destino, fila_destino, descriptor):
         """Escribe número de póliza fijo 5852"""
-        if not hasattr(self, '_idx_numero_poliza'):
-            self._idx_numero_poliza = None
-            for idx, cell in enumerate(headers_destino):
-                if cell.value and 'NUMERO' in str(cell.value).upper() and 'POLIZA' in str(cell.value).upper():
-                    self._idx_numero_poliza = idx + 1
-                    break
-        if self._idx_numero_poliza is not None:
+        if descriptor.col_numero_poliza is not None:
             try:
-                cell_poliza = ws_destino.cell(fila_destino, self._idx_numero_poliza)
+                cell_poliza = ws_destino.cell(fila_destino, descriptor.col_numero_poliza)
                 if not isinstance(cell_poliza, MergedCell) and cell_poliza.data_type != 'f':
                     cell_poliza.value = '5852'
             except Exception:
                 pass
 
-    def _escribir_nombre_producto(self, ws_destino, fila_destino, headers_destino):
+    def _escribir_nombre_producto(self, ws_destino, fila_destino, descriptor):
         """Escribe nombre producto fijo"""
-        if not hasattr(self, '_idx_nombre_producto'):
-            self._idx_nombre_producto = None
-            for idx, cell in enumerate(headers_destino):
-                if cell.value and 'NOMBRE' in str(cell.value).upper() and 'PRODUCTO' in str(cell.value).upper():
-                    self._idx_nombre_producto = idx + 1
-                    break
-        if self._idx_nombre_producto is not None:
+        if descriptor.col_nombre_producto is not None:
             try:
-                cell_producto = ws_destino.cell(fila_destino, self._idx_nombre_producto)
+                cell_producto = ws_destino.cell(fila_destino, descriptor.col_nombre_producto)
                 if not isinstance(cell_producto, MergedCell) and cell_producto.data_type != 'f':
                     cell_producto.value = 'MONTO DEL CREDITO'
             except Exception:
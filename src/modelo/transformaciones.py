@@ -0,0 +1,317 @@
+# src/modelo/transformaciones.py
+"""
+Motor columnar de transformaciones
+Cada columna mapeada se clasifica una sola vez y se transforma por bloques de filas
+"""
+
+from itertools import product
+
+import numpy as np
+import pandas as pd
+
+from .fechas import NormalizadorFechas
+
+
+# Marca de celda que no se escribe (valor vacío o transformación fallida)
+OMITIR = object()
+
+FORMATO_FECHA = 'mm/dd/yyyy'
+FORMATO_NUMERO = '0.00'
+
+# Tipos de columna (en el mismo orden de prioridad que tenía _transformar_valor)
+CRUDO = 'crudo'
+UBICACION = 'ubicacion'
+NACIONALIDAD = 'nacionalidad'
+PAIS_ORIGEN = 'pais_origen'
+DECIMAL = 'decimal'
+FECHA = 'fecha'
+TEXTO = 'texto'
+
+
+def clasificar_columna(header_orig):
+    """Determina el tipo de transformación según el encabezado origen normalizado"""
+    if header_orig is None:
+        return CRUDO
+    if 'PROVINCIA' in header_orig or 'CIUDAD' in header_orig:
+        return UBICACION
+    if 'NACIONALIDAD' in header_orig:
+        return NACIONALIDAD
+    if 'PAIS DE ORIGEN' in header_orig or 'PAÍS DE ORIGEN' in header_orig:
+        return PAIS_ORIGEN
+    if 'MONTO CREDITO' in header_orig or 'MONTO CRÉDITO' in header_orig:
+        return DECIMAL
+    if 'PLAZO DE CREDITO' in header_orig or 'PLAZO DE CRÉDITO' in header_orig:
+        return DECIMAL
+    if 'FECHA' in header_orig:
+        return FECHA
+    return TEXTO
+
+
+# ===== Núcleos escalares: casos que las operaciones de pandas no resuelven igual =====
+# (enteros enormes, infinitos, dígitos no ASCII, textos que pandas no lee como número);
+# se aplican uno a uno sobre lo que queda pendiente
+
+def _a_entero_ubicacion(valor, texto):
+    """PROVINCIA/CIUDAD: quita ceros iniciales y convierte a entero"""
+    try:
+        if isinstance(valor, (int, float)):
+            return int(valor)
+        if len(texto) > 1 and texto[0] == '0' and texto[1:].isdigit():
+            return int(texto[1:])
+        elif texto.isdigit():
+            return int(texto)
+        try:
+            if texto.replace('.', '', 1).replace('-', '', 1).isdigit():
+                return int(float(texto))
+        except Exception:
+            pass
+        return texto
+    except Exception:
+        return OMITIR
+
+
+def _a_entero_pais(valor, texto):
+    """PAIS DE ORIGEN (columna 13): convierte a entero si es posible"""
+    try:
+        if isinstance(valor, (int, float)):
+            return int(valor)
+        elif texto.isdigit():
+            return int(texto)
+        elif texto.replace('.', '', 1).replace('-', '', 1).isdigit():
+            return int(float(texto))
+    except Exception:
+        pass
+    return texto
+
+
+def _redondear(valor, texto):
+    """MONTO/PLAZO: redondeo a 2 decimales"""
+    try:
+        return round(float(valor), 2)
+    except Exception:
+        return texto
+
+
+# ===== Operaciones por columna (pandas) =====
+
+# Flotantes con los que int() y round() se calculan igual en float64
+_LIMITE_ENTERO = 2.0 ** 63
+_LIMITE_REDONDEO = 2.0 ** 52 / 100
+
+# Textos que cuentan como vacíos: '' y 'nan' en cualquier combinación de mayúsculas
+_VACIOS = [''] + [''.join(letras) for letras in product('nN', 'aA', 'nN')]
+
+
+def _mascara(arr):
+    """Arreglo bool propio (los de pandas pueden ser de solo lectura)"""
+    return np.array(arr, dtype=bool)
+
+
+def _textos(valores):
+    """str(valor).strip() de cada valor no nulo"""
+    serie = pd.Series(valores, dtype=object)
+    if pd.api.types.infer_dtype(valores, skipna=False) != 'string':
+        serie = serie.astype(str)
+    return serie.str.strip().to_numpy(dtype=object)
+
+
+def _instancias(valores, clases, excluir=()):
+    """Máscara de isinstance(valor, clases) y no de excluir (un type() por valor y un isin)"""
+    if pd.api.types.infer_dtype(valores, skipna=False) == 'string':
+        tipos = pd.Series([str])
+    else:
+        tipos = pd.Series(valores, dtype=object).map(type)
+    elegidos = [tipo for tipo in tipos.unique() if issubclass(tipo, clases) and not issubclass(tipo, excluir)]
+    if len(tipos) == 1:
+        return np.full(len(valores), bool(elegidos))
+    return _mascara(tipos.isin(elegidos))
+
+
+def _completar(salida, resueltos, valores, textos, escalar):
+    """Aplica el núcleo escalar a las celdas que quedaron sin resolver"""
+    pendientes = np.flatnonzero(~resueltos)
+    if len(pendientes):
+        salida[pendientes] = [escalar(valores[i], textos[i]) for i in pendientes]
+    return salida
+
+
+def _truncar(salida, resueltos, posiciones, valores):
+    """int(float(valor)) en las posiciones cuyo valor cabe en int64"""
+    try:
+        x = valores[posiciones].astype(float)
+    except (TypeError, ValueError, OverflowError):
+        return  # p. ej. '1-2': lo decide el núcleo escalar
+    ok = np.abs(x) < _LIMITE_ENTERO
+    salida[posiciones[ok]] = np.trunc(x[ok]).astype(np.int64).astype(object)
+    resueltos[posiciones[ok]] = True
+
+
+def _a_entero(valores, textos, escalar):
+    """int() de números y textos numéricos; los demás textos quedan igual
+
+    Mismas reglas que el núcleo escalar (_a_entero_ubicacion o _a_entero_pais), que
+    decide las celdas fuera de los casos comunes.
+    """
+    salida = textos.copy()
+    resueltos = np.zeros(len(valores), dtype=bool)
+    numeros = _instancias(valores, (int, float))
+
+    if numeros.any():
+        tipos = pd.Series(valores, dtype=object).map(type)
+        # int: int(valor) es el mismo valor; float: se trunca
+        enteros = _mascara(tipos.isin([int]))
+        salida[enteros] = valores[enteros]
+        resueltos |= enteros
+        _truncar(salida, resueltos, np.flatnonzero(_mascara(tipos.isin([float]))), valores)
+
+    # Textos de dígitos: int(texto) (numpy convierte con int())
+    textuales = np.flatnonzero(~numeros)
+    serie = pd.Series(textos[textuales], dtype=object)
+    digitos = _mascara(serie.str.isdigit())
+    if digitos.any():
+        try:
+            salida[textuales[digitos]] = textos[textuales[digitos]].astype(np.int64).astype(object)
+            resueltos[textuales[digitos]] = True
+        except (ValueError, OverflowError):
+            pass  # dígitos que int() no acepta o enteros enormes: núcleo escalar
+
+    # Decimales ('12.5', '-3'): int(float(texto)); sin forma de número: el texto
+    otros, serie = textuales[~digitos], serie[~digitos]
+    decimal = _mascara(
+        serie.str.replace('.', '', n=1, regex=False).str.replace('-', '', n=1, regex=False).str.isdigit()
+    )
+    resueltos[otros[~decimal]] = True
+    _truncar(salida, resueltos, otros[decimal], textos)
+    return _completar(salida, resueltos, valores, textos, escalar)
+
+
+def _redondeados(valores, textos):
+    """round(float(valor), 2); el texto donde float() falla"""
+    salida = textos.copy()
+    resueltos = np.zeros(len(valores), dtype=bool)
+    candidatos = np.arange(len(valores))
+    try:
+        # float() de cada valor, como en el núcleo escalar
+        x = valores.astype(float)
+    except (TypeError, ValueError, OverflowError):
+        # Hay textos u otros objetos: se prueban los que pandas reconoce como número
+        candidatos = np.flatnonzero(_mascara(pd.to_numeric(pd.Series(valores, dtype=object), errors='coerce').notna()))
+        try:
+            x = valores[candidatos].astype(float)
+        except (TypeError, ValueError, OverflowError):
+            candidatos, x = candidatos[:0], np.empty(0)
+    en_rango = np.abs(x) < _LIMITE_REDONDEO
+    candidatos, escalados = candidatos[en_rango], x[en_rango] * 100
+    # round() redondea el valor exacto: cerca de la mitad decide el núcleo escalar
+    ok = np.abs(escalados - np.floor(escalados) - 0.5) > np.spacing(np.abs(escalados))
+    salida[candidatos[ok]] = (np.rint(escalados[ok]) / 100).astype(object)
+    resueltos[candidatos[ok]] = True
+    return _completar(salida, resueltos, valores, textos, _redondear)
+
+
+def columna_bloque(filas, idx):
+    """Extrae la columna idx de un bloque de filas como arreglo object (None si falta)"""
+    arr = np.empty(len(filas), dtype=object)
+    arr[:] = [fila[idx] if idx < len(fila) else None for fila in filas]
+    return arr
+
+
+class TransformacionesColumnares:
+    """Aplica las transformaciones de datos columna por columna sobre bloques de filas
+
+    Replica exactamente la transformación celda a celda anterior: el tipo de cada
+    columna se decide una vez por encabezado y cada bloque se procesa con operaciones
+    sobre arreglos completos. El escritor solo emite los valores ya calculados.
+    """
+
+    def __init__(self, headers_origen, mapeo, idx_tipo_identificacion=None):
+        self.idx_tipo_identificacion = idx_tipo_identificacion
+        # (idx_origen, col_destino, tipo) respetando el orden del mapeo
+        self.columnas = []
+        for idx_origen, col_destino in mapeo.items():
+            header = None
+            if idx_origen < len(headers_origen):
+                header = str(headers_origen[idx_origen]).strip().upper()
+            self.columnas.append((idx_origen, col_destino, clasificar_columna(header)))
+        # Un normalizador por columna FECHA: formato inferido y memoria propios
+        self._fechas = {col_destino: NormalizadorFechas()
+                        for _, col_destino, tipo in self.columnas if tipo == FECHA}
+
+    def transformar_bloque(self, filas):
+        """Transforma un bloque de filas origen
+
+        Returns:
+            list: tuplas (col_destino, valores, formatos) en el orden del mapeo;
+                  OMITIR en valores marca las celdas que no se escriben
+        """
+        if not filas:
+            return []
+
+        columnas = {}
+        tipo_00 = None
+        if self.idx_tipo_identificacion is not None:
+            tipo_00 = self._tipo_identificacion_00(filas)
+
+        resultado = []
+        for idx_origen, col_destino, tipo in self.columnas:
+            if idx_origen not in columnas:
+                columnas[idx_origen] = columna_bloque(filas, idx_origen)
+            valores, formatos = self._transformar_columna(columnas[idx_origen], tipo, col_destino, tipo_00)
+            resultado.append((col_destino, valores, formatos))
+        return resultado
+
+    def _tipo_identificacion_00(self, filas):
+        """Máscara de filas cuyo TIPO IDENTIFICACION es '00' o '0'"""
+        tipos = columna_bloque(filas, self.idx_tipo_identificacion)
+        mascara = np.zeros(len(filas), dtype=bool)
+        presentes = ~_mascara(pd.isna(tipos))
+        if presentes.any():
+            mascara[presentes] = np.isin(_textos(tipos[presentes]), ['00', '0'])
+        return mascara
+
+    def _transformar_columna(self, valores, tipo, col_destino, tipo_00):
+        """Transforma una columna completa del bloque"""
+        n = len(valores)
+        salida = np.full(n, OMITIR, dtype=object)
+        formatos = np.full(n, None, dtype=object)
+
+        # Celdas vacías: nulos, texto vacío o 'nan'
+        activos = ~_mascara(pd.isna(valores))
+        if not activos.any():
+            return salida, formatos
+        textos = _textos(valores[activos])
+        no_vacios = ~np.isin(textos, _VACIOS)
+        activos[activos] = no_vacios
+        if not activos.any():
+            return salida, formatos
+
+        v = valores[activos]
+        t = textos[no_vacios]
+
+        if tipo == CRUDO:
+            res = v
+        elif tipo == UBICACION:
+            res = _a_entero(v, t, _a_entero_ubicacion)
+        elif tipo == NACIONALIDAD:
+            res = t
+            if tipo_00 is not None:
+                res = np.where(tipo_00[activos], '239', t).astype(object)
+        elif tipo == PAIS_ORIGEN:
+            res = _a_entero(v, t, _a_entero_pais) if col_destino == 13 else t
+        elif tipo == DECIMAL:
+            res = _redondeados(v, t)
+        elif tipo == FECHA:
+            res = self._fechas[col_destino].normalizar(v, t)
+        else:
+            res = t
+
+        salida[activos] = res
+
+        # Formato: fechas normalizadas en columnas FECHA, números en el resto
+        if tipo == FECHA:
+            fmt = np.where(_instancias(res, str), None, FORMATO_FECHA)
+            formatos[activos] = fmt
+        elif tipo not in (TEXTO, NACIONALIDAD):
+            fmt = np.where(_instancias(res, (int, float), excluir=bool), FORMATO_NUMERO, None)
+            formatos[activos] = fmt
+        return salida, formatos
@@ -4,27 +4,72 @@ Modelo de Transformador - Orquestación principal
 Refactorizado en arquitectura modular
 """
 
+import os
 import pandas as pd
 import re
-from openpyxl import load_workbook
 from openpyxl.cell.cell import MergedCell
+from openpyxl.utils import get_column_letter
 from datetime import datetime
 
+from ..config import CONFIG_SISTEMA
+
 # Importar módulos especializados
+from .escritor_xml import HojaXml, abrir_plantilla
+from .escritor_flujo import HojaFlujo
 from .estilos import EstilosExcel
+from .fechas import parsear_fecha
 from .mapeo_columnas import obtener_mapeo_columnas
-from .transferencia_datos import TransferenciaDatos
-from .totales_pie import agregar_totales_columnas, agregar_pie_pagina, limpiar_bordes_todas_filas_excepto_pie
-from .tabla_dinamica import crear_hoja2_tabla_dinamica
+from .cache_mapeo import cache_mapeo_global
+from .transferencia_datos import TransferenciaDatos, indices_especiales_origen
+from .lector_origen import crear_lector
+from .totales_pie import (AcumuladorTotales, agregar_totales_columnas, agregar_pie_pagina,
+                          limpiar_bordes_todas_filas_excepto_pie)
+from .tabla_dinamica import ColumnaMontos, crear_hoja2_tabla_dinamica
+from .descriptor_plantilla import descriptor_plantilla
+from .cancelacion import TransformacionCancelada, comprobar_cancelacion
+from .progreso import MedidorProgreso
+
+
+# Celdas con valor (fila >= 6) de cada plantilla: {(ruta, mtime, tamaño, hoja): ((fila, col), ...)}
+_cache_valores_plantilla = {}
+_MAX_PLANTILLAS_CACHE = 8
+
+
+def celdas_con_valor_plantilla(ws, archivo_plantilla=None, fila_inicio=6):
+    """Coordenadas de las celdas con valor (no fórmula ni combinada) desde fila_inicio
+
+    El índice se calcula una vez por versión del archivo de plantilla, recorriendo
+    solo las celdas existentes (no el rectángulo max_row × max_column).
+    """
+    clave = None
+    if archivo_plantilla:
+        try:
+            info = os.stat(archivo_plantilla)
+            clave = (os.path.abspath(archivo_plantilla), info.st_mtime_ns, info.st_size, ws.title, fila_inicio)
+        except OSError:
+            clave = None
+    if clave is not None and clave in _cache_valores_plantilla:
+        return _cache_valores_plantilla[clave]
+
+    coordenadas = tuple(
+        coordenada for coordenada, cell in ws._cells.items()
+        if coordenada[0] >= fila_inicio and cell.value is not None
+        and not isinstance(cell, MergedCell) and cell.data_type != 'f'
+    )
+    if clave is not None:
+        if len(_cache_valores_plantilla) >= _MAX_PLANTILLAS_CACHE:
+            _cache_valores_plantilla.pop(next(iter(_cache_valores_plantilla)))
+        _cache_valores_plantilla[clave] = coordenadas
+    return coordenadas
 
 
 class TransformadorDatos:
     """Orquestador principal de transformación de datos"""
     
-    def __init__(self, callback_mensaje=None):
+    def __init__(self, callback_mensaje=None, callback_progreso=None):
         self.callback_mensaje = callback_mensaje
-        self._cache_headers_destino = None
-        self._cache_mapeo_columnas = None
+        self.callback_progreso = callback_progreso
+        self.progreso = None
         self._cache_indices_columnas = {}
         self._formulas_cache = {}
         self._formulas_pattern = re.compile(r'(\$?[A-Z]+\$?)(\d+)')
@@ -41,12 +86,18 @@ class TransformadorDatos:
         if self.callback_mensaje:
             self.callback_mensaje(mensaje)
     
-    def transformar(self, archivo_origen, archivo_plantilla, poliza_info):
+    def transformar(self, archivo_origen, archivo_plantilla, poliza_info, cancelacion=None):
         """
         Transforma datos del archivo origen a la plantilla
+        cancelacion (TokenCancelacion) se comprueba entre etapas y por lote de filas
+        El avance por fases queda en self.progreso (MedidorProgreso); el guardado lo
+        registra quien guarda el libro
         Retorna: (wb_resultado, nombre_archivo_descarga)
         """
+        wb = None
+        self.progreso = MedidorProgreso(self.callback_progreso)
         try:
+            self.progreso.fase('lectura')
             self.enviar_mensaje("=" * 80)
             self.enviar_mensaje("INICIANDO TRANSFORMACIÓN")
             self.enviar_mensaje("=" * 80)
@@ -56,108 +107,176 @@ class TransformadorDatos:
             hoja_origen = poliza_info.get('hoja_origen_requerida', 'Report_AseguradoraMensual') if isinstance(poliza_info, dict) else 'Report_AseguradoraMensual'
             print(f"[DEBUG] Leyendo hoja: {hoja_origen}")
             
-            # Leer archivo origen
-            df_origen = pd.read_excel(
-                archivo_origen,
-                sheet_name=hoja_origen,
-                header=None,
-                engine='openpyxl'
-            )
-            
-            if len(df_origen) < 10:
-                raise Exception(f"Archivo origen vacío o muy pequeño ({len(df_origen)} filas)")
-            
-            self.enviar_mensaje(f"✓ Archivo origen leído: {len(df_origen)} filas")
-            
-            # Buscar encabezados
-            fila_encabezados_origen, headers_origen = self.buscar_encabezados(df_origen)
-            
-            if headers_origen is None:
-                raise Exception("No se encontraron encabezados válidos")
-            
-            self.enviar_mensaje(f"✓ Encabezados encontrados en fila {fila_encabezados_origen + 1}")
-            
-            # Copiar plantilla
-            wb = load_workbook(archivo_plantilla, data_only=False)
-            
-            # Detectar hoja destino
-            hoja_destino = self.detectar_hoja_destino(wb, poliza_info)
-            
-            if not hoja_destino:
-                raise Exception("No se pudo detectar hoja destino")
+            validacion = CONFIG_SISTEMA['VALIDACION']
+            min_filas = validacion['min_filas_obligatorio']
             
-            ws = wb[hoja_destino]
-            self.enviar_mensaje(f"✓ Usando hoja: {hoja_destino}")
-            
-            # Obtener headers destino
-            headers_destino = list(ws[5])
-            
-            # Mapear columnas
-            mapeo = obtener_mapeo_columnas(
-                headers_origen,
-                headers_destino,
-                self._cache_mapeo_columnas,
-                self._cache_headers_destino
-            )
-            
-            # Actualizar cache
-            self._cache_mapeo_columnas = mapeo.copy()
-            self._cache_headers_destino = headers_destino
-            
-            self.enviar_mensaje(f"✓ {len(mapeo)} columnas mapeadas")
-            
-            # Limpiar datos existentes
-            self.limpiar_datos_destino(ws)
-            
-            # Transferir datos
-            filas_procesadas = self.transferencia.transferir_datos(
-                ws, df_origen, fila_encabezados_origen,
-                headers_origen, mapeo, self.enviar_mensaje
-            )
+            # Abrir archivo origen en modo streaming (las filas se leen bajo demanda)
+            with crear_lector(archivo_origen, hoja_origen) as lector:
+                # Fase 1: sonda barata sobre las primeras filas para ubicar encabezados
+                filas_sonda = lector.inicio(max(validacion['max_filas_busqueda_encabezados'], min_filas))
+                
+                if len(filas_sonda) < min_filas:
+                    raise Exception(f"Archivo origen vacío o muy pequeño ({len(filas_sonda)} filas)")
+                
+                if lector.filas_estimadas:
+                    self.enviar_mensaje(f"✓ Archivo origen abierto: ~{lector.filas_estimadas} filas")
+                else:
+                    self.enviar_mensaje("✓ Archivo origen abierto")
+                
+                # Buscar encabezados
+                fila_encabezados_origen, headers_origen = self.buscar_encabezados(filas_sonda)
+                
+                if headers_origen is None:
+                    raise Exception("No se encontraron encabezados válidos")
+                
+                self.enviar_mensaje(f"✓ Encabezados encontrados en fila {fila_encabezados_origen + 1}")
+                
+                # Copiar plantilla (objetos openpyxl o escritura XML directa según configuración)
+                comprobar_cancelacion(cancelacion)
+                wb = abrir_plantilla(archivo_plantilla)
+                
+                # Detectar hoja destino
+                hoja_destino = self.detectar_hoja_destino(wb, poliza_info)
+                
+                if not hoja_destino:
+                    raise Exception("No se pudo detectar hoja destino")
+                
+                ws = wb[hoja_destino]
+                self.enviar_mensaje(f"✓ Usando hoja: {hoja_destino}")
+                
+                # Columnas especiales, totales, pie y fórmulas de la plantilla (precompilado)
+                descriptor = descriptor_plantilla(archivo_plantilla, ws)
+                
+                # Obtener headers destino
+                headers_destino = list(ws[5])
+                
+                # Mapear columnas
+                self.progreso.fase('mapeo')
+                reglas_mapeo = {}
+                mapeo = obtener_mapeo_columnas(
+                    headers_origen,
+                    headers_destino,
+                    cache_mapeo_global(),
+                    poliza_info.get('prefijo') if isinstance(poliza_info, dict) else None,
+                    reglas_mapeo
+                )
+                
+                self.enviar_mensaje(f"✓ {len(mapeo)} columnas mapeadas")
+                for idx_origen, col in sorted(mapeo.items(), key=lambda item: item[1]):
+                    destino = str(headers_destino[col - 1].value).strip()
+                    origen = str(headers_origen[idx_origen]).strip()
+                    self.enviar_mensaje(
+                        f"  {get_column_letter(col)} {destino} ← {origen} ({reglas_mapeo.get(idx_origen, '-')})"
+                    )
+                
+                # Fase 2: lectura completa proyectada a las columnas que realmente se usan
+                columnas = self.columnas_requeridas(headers_origen, mapeo)
+                lector.proyectar(columnas)
+                posicion = {idx: pos for pos, idx in enumerate(columnas)}
+                headers_proyectados = [
+                    headers_origen[idx] if idx < len(headers_origen) else None
+                    for idx in columnas
+                ]
+                mapeo_proyectado = {posicion[idx]: col for idx, col in mapeo.items()}
+                self.enviar_mensaje(f"✓ Lectura limitada a {len(columnas)} de {len(headers_origen)} columnas")
+                
+                filas_inicio = lector.inicio(100)
+                
+                # Limpiar datos existentes
+                self.limpiar_datos_destino(ws, archivo_plantilla)
+                
+                # Transferir datos (las filas fluyen del lector sin materializar la hoja);
+                # las columnas con total se acumulan para guardar los totales ya calculados
+                # y MONTO CREDITO se conserva por bloques para Hoja2
+                totales = AcumuladorTotales(descriptor)
+                montos = ColumnaMontos(descriptor.col_monto_credito) if descriptor.col_monto_credito else None
+                self.progreso.fase('transferencia')
+                if lector.filas_estimadas:
+                    self.progreso.filas_totales = max(0, lector.filas_estimadas - fila_encabezados_origen - 1)
+                filas_procesadas = self.transferencia.transferir_datos(
+                    ws, lector.filas(fila_encabezados_origen + 1),
+                    headers_proyectados, mapeo_proyectado, self.enviar_mensaje, descriptor, totales, montos,
+                    cancelacion, self.progreso
+                )
             
             self.enviar_mensaje(f"✓ {filas_procesadas} filas procesadas")
             
             # Agregar totales a columnas
+            comprobar_cancelacion(cancelacion)
+            self.progreso.fase('totales')
             self.enviar_mensaje("Agregando totales a columnas...")
             ultima_fila_datos_nueva = filas_procesadas + 5
             fila_total = ultima_fila_datos_nueva + 1
-            agregar_totales_columnas(ws, ultima_fila_datos_nueva, headers_destino, self.estilos, self.enviar_mensaje)
+            agregar_totales_columnas(ws, ultima_fila_datos_nueva, descriptor, self.estilos, self.enviar_mensaje, totales)
             
             # Agregar pie de página (deja una fila vacía después de totales)
+            comprobar_cancelacion(cancelacion)
+            self.progreso.fase('pie')
             self.enviar_mensaje("Agregando pie de página...")
-            agregar_pie_pagina(ws, fila_total, headers_destino, self.estilos, self.enviar_mensaje)
+            agregar_pie_pagina(ws, fila_total, descriptor, self.estilos, self.enviar_mensaje, totales)
                         # Limpiar bordes de todas las filas después del pie
+            comprobar_cancelacion(cancelacion)
             self.enviar_mensaje("Limpiando bordes...")
             fila_final_pie = fila_total + 10  # Aproximadamente donde termina el pie
             limpiar_bordes_todas_filas_excepto_pie(ws, fila_final_pie, callback=self.enviar_mensaje)
                         # Crear Hoja2 con tabla dinámica
+            comprobar_cancelacion(cancelacion)
+            self.progreso.fase('tabla_dinamica')
             self.enviar_mensaje("Creando Hoja2 con tabla dinámica...")
-            crear_hoja2_tabla_dinamica(wb, ws, ultima_fila_datos_nueva, headers_destino, self.estilos, self.enviar_mensaje)
+            crear_hoja2_tabla_dinamica(wb, montos, descriptor, self.estilos, self.enviar_mensaje)
             
             # Generar nombre archivo
-            fecha_mes = self.extraer_fecha_mes(df_origen, headers_origen)
+            fecha_mes = self.extraer_fecha_mes(filas_inicio, headers_proyectados)
             nombre_descarga = self.generar_nombre_archivo(poliza_info, fecha_mes)
             
             self.enviar_mensaje("✓ Transformación completada")
             
             return wb, nombre_descarga
             
+        except TransformacionCancelada:
+            # Los motores xml y write_only guardan las filas en archivos temporales
+            if wb is not None:
+                wb.close()
+            raise
         except Exception as e:
             raise Exception(f"Error en transformación: {str(e)}")
     
-    def buscar_encabezados(self, df_origen):
-        """Busca la fila de encabezados en el archivo origen"""
-        for idx_fila in range(min(10, len(df_origen))):
-            fila_actual = df_origen.iloc[idx_fila].tolist()
+    def buscar_encabezados(self, filas_origen):
+        """Busca la fila de encabezados en las primeras filas del archivo origen"""
+        validacion = CONFIG_SISTEMA['VALIDACION']
+        for idx_fila in range(min(validacion['max_filas_busqueda_encabezados'], len(filas_origen))):
+            fila_actual = list(filas_origen[idx_fila])
             headers_validos = [h for h in fila_actual if pd.notna(h) and str(h).strip() != '']
             
-            if len(headers_validos) >= 5:
+            if len(headers_validos) >= validacion['min_columnas_encabezado']:
                 headers_texto = [h for h in headers_validos if isinstance(h, str)]
-                if len(headers_texto) >= 3:
+                if len(headers_texto) >= validacion['min_columnas_validas_encabezado']:
                     return idx_fila, fila_actual
         
         return None, None
     
+    def columnas_requeridas(self, headers_origen, mapeo):
+        """Columnas origen que se leen en la fase completa (índices base 0, ordenados)
+        
+        Incluye la primera columna (validación de filas), las columnas mapeadas,
+        las especiales PROVINCIA/CIUDAD/PAIS DE ORIGEN/TIPO IDENTIFICACION y la
+        fecha usada para el nombre del archivo.
+        """
+        columnas = {0}
+        columnas.update(mapeo.keys())
+        columnas.update(idx for idx in indices_especiales_origen(headers_origen).values() if idx is not None)
+        idx_fecha = self._indice_fecha_inicio(headers_origen)
+        if idx_fecha is not None:
+            columnas.add(idx_fecha)
+        return sorted(columnas)
+    
+    def _indice_fecha_inicio(self, headers_origen):
+        """Índice de la columna FECHA DE INICIO DE CREDITO en el origen"""
+        for idx, header in enumerate(headers_origen):
+            if pd.notna(header) and 'FECHA DE INICIO DE CREDITO' in str(header).upper():
+                return idx
+        return None
+    
     def detectar_hoja_destino(self, wb, poliza_info):
         """Detecta la hoja destino basándose en la póliza"""
         for sheet_name in wb.sheetnames:
@@ -171,33 +290,36 @@ class TransformadorDatos:
         
         return wb.sheetnames[0]
     
-    def limpiar_datos_destino(self, ws):
-        """Limpia datos existentes en hoja destino"""
-        for row in ws.iter_rows(min_row=6, max_row=ws.max_row):
-            for cell in row:
-                if not isinstance(cell, MergedCell) and cell.data_type != 'f':
-                    cell.value = None
+    def limpiar_datos_destino(self, ws, archivo_plantilla=None):
+        """Limpia datos existentes en hoja destino (solo las celdas indexadas con valor)"""
+        if isinstance(ws, HojaXml):
+            ws.limpiar_valores(6)
+            return
+        hoja = ws.hoja if isinstance(ws, HojaFlujo) else ws
+        for coordenada in celdas_con_valor_plantilla(hoja, archivo_plantilla):
+            cell = hoja._cells.get(coordenada)
+            if cell is not None:
+                cell.value = None
     
-    def extraer_fecha_mes(self, df_origen, headers_origen):
-        """Extrae fecha del mes desde columna FECHA DE INICIO DE CREDITO"""
-        col_fecha = None
-        
-        for idx, header in enumerate(headers_origen):
-            if pd.notna(header) and 'FECHA DE INICIO DE CREDITO' in str(header).upper():
-                col_fecha = idx
-                break
+    def extraer_fecha_mes(self, filas_origen, headers_origen):
+        """Extrae fecha del mes desde columna FECHA DE INICIO DE CREDITO (primeras filas)"""
+        col_fecha = self._indice_fecha_inicio(headers_origen)
         
         if col_fecha is None:
             return datetime.now()
         
-        for idx in range(6, min(len(df_origen), 100)):
+        for idx in range(6, min(len(filas_origen), 100)):
             try:
-                fecha_valor = df_origen.iloc[idx, col_fecha]
+                fecha_valor = filas_origen[idx][col_fecha]
                 if pd.notna(fecha_valor):
                     if isinstance(fecha_valor, datetime):
                         return fecha_valor
                     elif isinstance(fecha_valor, pd.Timestamp):
                         return fecha_valor.to_pydatetime()
+                    elif isinstance(fecha_valor, str):
+                        fecha = parsear_fecha(fecha_valor)
+                        if fecha is not None:
+                            return fecha.to_pydatetime()
                     else:
                         return pd.to_datetime(fecha_valor).to_pydatetime()
             except:
@@ -0,0 +1,160 @@
+# src/modelo/valores_cacheados.py
+"""
+Valores calculados de las celdas con fórmula
+Se guardan como <v> junto a la fórmula, de modo que quien lea el archivo sin Excel
+(openpyxl con data_only=True, pandas) obtiene el número sin recalcular el libro.
+El mismo write_cell emite las fórmulas compartidas de la hoja (formulas_compartidas) y
+comprueba la cancelación del guardado; solo reemplaza al de openpyxl durante los
+guardados del pipeline (escritura_con_valores).
+"""
+
+import math
+import threading
+from contextlib import contextmanager
+from datetime import datetime, date, time, timedelta
+
+from openpyxl.cell import _writer as _escritor_celdas
+from openpyxl.cell.cell import ERROR_CODES
+from openpyxl.compat.strings import safe_string
+from openpyxl.utils.datetime import to_excel
+from openpyxl.worksheet import _writer as _escritor_hoja
+from openpyxl.xml.functions import Element, SubElement
+
+
+# Marca de fórmula cuyo valor no se pudo calcular (se guarda sin <v>)
+SIN_VALOR = object()
+
+# Celdas que se escriben entre dos comprobaciones de cancelación del guardado
+_CELDAS_POR_COMPROBACION = 5000
+
+
+def valores_cacheados(ws):
+    """{(fila, col): valor} calculados para las celdas con fórmula de la hoja"""
+    valores = getattr(ws, '_valores_cacheados', None)
+    if valores is None:
+        valores = ws._valores_cacheados = {}
+    return valores
+
+
+def asignar_formula(cell, formula, valor=SIN_VALOR):
+    """Escribe la fórmula en la celda y, si se conoce, su valor calculado"""
+    cell.value = formula
+    if valor is not SIN_VALOR:
+        valores_cacheados(cell.parent)[(cell.row, cell.column)] = valor
+
+
+def valor_xml(valor):
+    """(atributo t, texto de <v>) para un valor calculado"""
+    if isinstance(valor, bool):
+        return 'b', str(int(valor))
+    if isinstance(valor, (int, float)):
+        if isinstance(valor, float) and not math.isfinite(valor):
+            return 'e', '#NUM!'
+        return None, safe_string(valor)
+    if isinstance(valor, (datetime, date, time, timedelta)):
+        return None, safe_string(to_excel(valor))
+    if isinstance(valor, str) and valor in ERROR_CODES:
+        return 'e', valor
+    return 'str', str(valor)
+
+
+def _recalcular_al_abrir(worksheet):
+    """Una fórmula queda sin valor calculado: el libro pide a Excel recalcular al abrir
+
+    WorkbookWriter escribe workbook.xml después de las hojas, así que la marca llega a tiempo.
+    """
+    worksheet.parent.calculation.fullCalcOnLoad = True
+
+
+def _comprobar_cancelacion(libro):
+    """Comprueba cada _CELDAS_POR_COMPROBACION celdas el token del guardado en curso"""
+    cancelacion = getattr(libro, '_cancelacion_guardado', None)
+    if cancelacion is None:
+        return
+    libro._celdas_guardadas += 1
+    if libro._celdas_guardadas % _CELDAS_POR_COMPROBACION == 0:
+        cancelacion.comprobar()
+
+
+def _escribir_celda(xf, worksheet, cell, styled=None):
+    """write_cell de openpyxl que además emite fórmulas compartidas y el valor calculado"""
+    _comprobar_cancelacion(worksheet.parent)
+    if cell.data_type != 'f' or not ESCRITURA_CON_VALORES:
+        _escribir_celda_openpyxl(xf, worksheet, cell, styled)
+        return
+    if not isinstance(cell._value, str):
+        # Fórmulas matriciales o de tabla de datos: sin valor calculado
+        _recalcular_al_abrir(worksheet)
+        _escribir_celda_openpyxl(xf, worksheet, cell, styled)
+        return
+    valores = getattr(worksheet, '_valores_cacheados', None)
+    valor = valores.get((cell.row, cell.column), SIN_VALOR) if valores else SIN_VALOR
+    compartidas = getattr(worksheet, '_formulas_compartidas', None)
+    compartida = compartidas.celda(cell.row, cell.column, cell._value) if compartidas is not None else None
+    if valor is SIN_VALOR:
+        _recalcular_al_abrir(worksheet)
+        if compartida is None:
+            _escribir_celda_openpyxl(xf, worksheet, cell, styled)
+            return
+
+    _, atributos = _escritor_celdas._set_attributes(cell, styled)
+    if valor is not SIN_VALOR:
+        tipo, texto = valor_xml(valor)
+        if tipo is not None:
+            atributos['t'] = tipo
+    elemento = Element('c', atributos)
+    if compartida is None:
+        SubElement(elemento, 'f').text = cell._value[1:]
+    else:
+        si, es_maestra = compartida
+        if es_maestra:
+            SubElement(elemento, 'f', t='shared', ref=compartidas.ref(cell.column), si=str(si)).text = cell._value[1:]
+        else:
+            SubElement(elemento, 'f', t='shared', si=str(si))
+    contenido = SubElement(elemento, 'v')
+    if valor is not SIN_VALOR:
+        contenido.text = texto
+    xf.write(elemento)
+
+
+# Los motores openpyxl y write_only guardan con WorksheetWriter, que escribe cada celda
+# con write_cell. El reemplazo usa _set_attributes, privado de openpyxl (3.0 y 3.1, ver
+# requirements.txt): sin él las fórmulas se guardan sin valor y el libro se recalcula al abrir
+_escribir_celda_openpyxl = _escritor_celdas.write_cell
+ESCRITURA_CON_VALORES = callable(getattr(_escritor_celdas, '_set_attributes', None))
+_lock_escritura = threading.Lock()
+_escrituras_activas = 0
+
+
+@contextmanager
+def escritura_con_valores(wb=None, cancelacion=None):
+    """Guardado con valores calculados y fórmulas compartidas (motores openpyxl y write_only)
+
+    Mientras dura, WorksheetWriter escribe las celdas con _escribir_celda; las hojas sin
+    valores calculados ni fórmulas compartidas se escriben igual que con openpyxl. wb
+    (Workbook que se guarda) queda sin recálculo al abrir salvo que alguna fórmula se
+    escriba sin valor; si se indica cancelacion, la escritura de sus celdas termina con
+    TransformacionCancelada al cancelarse el token.
+    """
+    global _escrituras_activas
+    if not ESCRITURA_CON_VALORES and (wb is None or cancelacion is None):
+        yield
+        return
+    if wb is not None:
+        if ESCRITURA_CON_VALORES:
+            wb.calculation.fullCalcOnLoad = False
+        wb._cancelacion_guardado = cancelacion
+        wb._celdas_guardadas = 0
+    with _lock_escritura:
+        if _escrituras_activas == 0:
+            _escritor_hoja.write_cell = _escribir_celda
+        _escrituras_activas += 1
+    try:
+        yield
+    finally:
+        if wb is not None:
+            wb._cancelacion_guardado = None
+        with _lock_escritura:
+            _escrituras_activas -= 1
+            if _escrituras_activas == 0:
+                _escritor_hoja.write_cell = _escribir_celda_openpyxl
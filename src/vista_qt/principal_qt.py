@@ -10,7 +10,9 @@ class VentanaPrincipalQt(QWidget):
     # Signals to bridge with controller
     solicitar_transformacion = Signal()
     archivo_seleccionado = Signal(str)
+    archivos_seleccionados = Signal(list)
     descargar_resultado = Signal(str, str)
+    solicitar_cancelacion = Signal()
 
     def __init__(self):
         super().__init__()
@@ -18,8 +20,7 @@ class VentanaPrincipalQt(QWidget):
         self.resize(760, 640)
 
         self.archivo_origen = None
-        self.ruta_temporal_resultado = None
-        self.nombre_archivo_sugerido = "archivo_transformado.xlsx"
+        self.archivos_origen = []
 
         self._build_ui()
         # Aplicar fondo blanco al final para no interferir con gradientes
@@ -137,6 +138,21 @@ class VentanaPrincipalQt(QWidget):
         self.lbl_porcentaje.setStyleSheet("color:#666666;font-weight:bold;")
         prog_row.addWidget(self.lbl_porcentaje)
         root.addLayout(prog_row)
+        # Fase, filas/s y tiempo restante de la transformación en curso
+        self.lbl_detalle_progreso = QLabel("")
+        self.lbl_detalle_progreso.setStyleSheet("color:#666666;font-size:9pt;")
+        root.addWidget(self.lbl_detalle_progreso)
+
+        # Resultados listos para descargar (uno por trabajo terminado)
+        sec_resultados = QVBoxLayout()
+        lbl_resultados = QLabel("RESULTADOS")
+        lbl_resultados.setStyleSheet("font-weight:bold;color:#333333;")
+        sec_resultados.addWidget(lbl_resultados)
+        self.combo_resultados = QComboBox()
+        self.combo_resultados.setEnabled(False)
+        self.combo_resultados.setStyleSheet("QComboBox{padding:8px;border:1px solid #CCCCCC;border-radius:8px;background:#F5F5F5;color:#333333;} QComboBox::drop-down{width:24px;}")
+        sec_resultados.addWidget(self.combo_resultados)
+        root.addLayout(sec_resultados)
 
         # Botones
         btn_row = QHBoxLayout()
@@ -153,6 +169,17 @@ class VentanaPrincipalQt(QWidget):
         self.btn_transformar.clicked.connect(lambda: self.solicitar_transformacion.emit())
         btn_row.addWidget(self.btn_transformar)
 
+        self.btn_cancelar = QPushButton("CANCELAR")
+        self.btn_cancelar.setEnabled(False)
+        self.btn_cancelar.setStyleSheet(
+            "QPushButton{border-radius:10px;padding:12px 20px;background:#FFFFFF;"
+            "color:#DC2626;font-weight:bold;border:2px solid #DC2626;}"
+            "QPushButton:hover{background:#FEE2E2;}"
+            "QPushButton:disabled{background:#F5F5F5;color:#999999;border:1px solid #CCCCCC;}"
+        )
+        self.btn_cancelar.clicked.connect(self._cancelar)
+        btn_row.addWidget(self.btn_cancelar)
+
         self.btn_descargar = QPushButton("DESCARGAR")
         self.btn_descargar.setEnabled(False)
         self.btn_descargar.setStyleSheet(
@@ -185,27 +212,55 @@ class VentanaPrincipalQt(QWidget):
         self.combo_tipo.addItems(nombres)
         self.combo_tipo.setCurrentIndex(0)  # Mostrar placeholder por defecto
 
-    def set_archivo_resultado_temp(self, ruta):
-        self.ruta_temporal_resultado = ruta
+    def agregar_resultado(self, ruta, nombre, origen=None):
+        """Agrega un resultado a la lista de descargas (data: ruta temporal, nombre sugerido)"""
+        texto = f"{nombre} ({origen})" if origen else nombre
+        repetidos = sum(
+            1 for i in range(self.combo_resultados.count())
+            if self.combo_resultados.itemData(i)[1] == nombre
+        )
+        if repetidos:
+            texto += f" #{repetidos + 1}"
+        self.combo_resultados.addItem(texto, (ruta, nombre))
+        self.combo_resultados.setCurrentIndex(self.combo_resultados.count() - 1)
+        self.combo_resultados.setEnabled(True)
         self.btn_descargar.setEnabled(True)
-        self.btn_transformar.setEnabled(False)
+
+    def quitar_resultado(self, ruta):
+        """Quita de la lista un resultado ya descargado"""
+        for i in range(self.combo_resultados.count()):
+            if self.combo_resultados.itemData(i)[0] == ruta:
+                self.combo_resultados.removeItem(i)
+                break
+        hay_resultados = self.combo_resultados.count() > 0
+        self.combo_resultados.setEnabled(hay_resultados)
+        self.btn_descargar.setEnabled(hay_resultados)
+
+    def set_cancelable(self, activo):
+        self.btn_cancelar.setEnabled(bool(activo))
 
     def add_message(self, msg):
         # Prefix like console prompt
         self.text_estado.append(f"> {msg}")
 
+    def add_messages(self, mensajes):
+        # Lote del bus de mensajes: una sola inserción en la consola
+        self.text_estado.append("\n".join(f"> {msg}" for msg in mensajes))
+
     def set_progress(self, value):
         v = max(0, min(100, int(value)))
         self.barra.setValue(v)
         self.lbl_porcentaje.setText(f"{v}%")
 
+    def set_detalle_progreso(self, texto):
+        self.lbl_detalle_progreso.setText(texto)
+
     def highlight_descargar(self):
         self.btn_descargar.setEnabled(True)
-        self.btn_transformar.setEnabled(False)
 
     def highlight_analizar(self):
         self.btn_analizar_otro.setEnabled(True)
-        self.btn_descargar.setEnabled(False)
+        self.btn_descargar.setEnabled(self.combo_resultados.count() > 0)
     
     def obtener_poliza_seleccionada(self):
         """Retorna el nombre de la póliza seleccionada"""
@@ -223,13 +278,17 @@ class VentanaPrincipalQt(QWidget):
 
     # ===== Internal slots =====
     def _seleccionar_archivo(self):
-        ruta, _ = QFileDialog.getOpenFileName(self, "Seleccionar archivo 413", filter="Excel (*.xlsx)")
-        if ruta:
-            self.archivo_origen = ruta
-            self.lbl_archivo.setText(ruta.split('/')[-1])
-            self.btn_seleccionar.setEnabled(False)
+        # Varios archivos a la vez: cada uno se encola como un trabajo aparte
+        rutas, _ = QFileDialog.getOpenFileNames(self, "Seleccionar archivos 413", filter="Excel (*.xlsx)")
+        if rutas:
+            self.archivos_origen = rutas
+            self.archivo_origen = rutas[0]
+            if len(rutas) == 1:
+                self.lbl_archivo.setText(rutas[0].split('/')[-1])
+            else:
+                self.lbl_archivo.setText(f"{len(rutas)} archivos seleccionados")
             self.combo_tipo.setEnabled(True)
-            self.archivo_seleccionado.emit(ruta)
+            self.archivos_seleccionados.emit(rutas)
 
     def _on_tipo_cambiado(self, idx):
         if idx >= 0:
@@ -238,28 +297,35 @@ class VentanaPrincipalQt(QWidget):
             self.btn_transformar.setEnabled(False)
 
     def _descargar(self):
-        if not self.ruta_temporal_resultado:
+        resultado = self.combo_resultados.currentData()
+        if not resultado:
             return
-        destino, _ = QFileDialog.getSaveFileName(self, "Guardar resultado", filter="Excel (*.xlsx)")
+        ruta, nombre = resultado
+        destino, _ = QFileDialog.getSaveFileName(
+            self, "Guardar resultado", nombre, filter="Excel (*.xlsx)"
+        )
         if destino:
-            self.descargar_resultado.emit(self.ruta_temporal_resultado, destino)
+            self.descargar_resultado.emit(ruta, destino)
+
+    def _cancelar(self):
+        self.btn_cancelar.setEnabled(False)
+        self.solicitar_cancelacion.emit()
 
     def _analizar_otro(self):
-        # reset simple
+        # reset simple (los resultados sin descargar siguen en la lista)
         self.archivo_origen = None
-        self.ruta_temporal_resultado = None
+        self.archivos_origen = []
         self.lbl_archivo.setText("No seleccionado")
-        self.btn_seleccionar.setEnabled(True)
         self.combo_tipo.setEnabled(False)
         self.combo_tipo.setCurrentIndex(-1)
         self.btn_transformar.setEnabled(False)
-        self.btn_descargar.setEnabled(False)
         self.btn_analizar_otro.setEnabled(False)
         self.set_progress(0)
         # Limpiar consola y porcentaje
         self.text_estado.clear()
         if hasattr(self, 'lbl_porcentaje'):
             self.lbl_porcentaje.setText("0%")
+        self.lbl_detalle_progreso.setText("")
 
     # ===== UI helpers =====
     # Métodos _make_pill y _set_pill_state eliminados (sección ESTADO removida)
\ No newline at end of file
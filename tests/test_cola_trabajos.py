@@ -0,0 +1,148 @@
+"""Pruebas de la cola de trabajos, la cancelación y el tiempo límite"""
+
+import os
+import threading
+import time
+
+import pytest
+from openpyxl import Workbook, load_workbook
+
+from src.controlador.cola_trabajos import CANCELADO, COMPLETADO, ColaTrabajos
+from src.modelo import valores_cacheados
+from src.modelo.cancelacion import TokenCancelacion, TransformacionCancelada
+from src.modelo.escritor_xml import guardar_libro
+
+
+def _libro(filas=50, columnas=5):
+    wb = Workbook()
+    ws = wb.active
+    for fila in range(1, filas + 1):
+        ws.append([fila * columna for columna in range(1, columnas + 1)])
+    return wb
+
+
+def _guardar_en_directorio(trabajo, cancelacion=None):
+    """ejecutar de la cola: guarda un libro en la carpeta temporal del trabajo"""
+    nombre = f"resultado_{os.path.basename(trabajo.ruta_origen)}"
+    ruta = os.path.join(trabajo.directorio, nombre)
+    guardar_libro(_libro(), ruta, cancelacion)
+    return ruta, nombre
+
+
+@pytest.fixture
+def origen(tmp_path):
+    ruta = tmp_path / 'origen.xlsx'
+    _libro(filas=3).save(ruta)
+    return str(ruta)
+
+
+def test_dos_trabajos_del_mismo_origen_conservan_sus_resultados(origen):
+    cola = ColaTrabajos(_guardar_en_directorio, trabajadores=2)
+    try:
+        trabajos = [cola.encolar(origen, 'DV'), cola.encolar(origen, 'DV')]
+        terminados = list(cola.completados(timeout=30))
+
+        assert {trabajo.id for trabajo in terminados} == {trabajo.id for trabajo in trabajos}
+        assert all(trabajo.estado == COMPLETADO for trabajo in trabajos)
+        assert trabajos[0].directorio != trabajos[1].directorio
+        for trabajo in trabajos:
+            assert os.path.dirname(trabajo.ruta_resultado) == trabajo.directorio
+            assert load_workbook(trabajo.ruta_resultado).active['E50'].value == 250
+        assert cola.buscar(trabajos[1].ruta_resultado) is trabajos[1]
+    finally:
+        for trabajo in cola.trabajos():
+            cola.descartar(trabajo)
+        cola.cerrar()
+    assert not any(os.path.exists(trabajo.directorio) for trabajo in trabajos)
+
+
+def test_cancelar_un_trabajo_en_curso_borra_su_resultado(origen, monkeypatch):
+    # Comprobación frecuente: el libro de prueba tiene pocas celdas
+    monkeypatch.setattr(valores_cacheados, '_CELDAS_POR_COMPROBACION', 10)
+    guardando = threading.Event()
+    cancelado = threading.Event()
+    consultas = []
+    rutas = []
+
+    def ejecutar(trabajo):
+        def consultar():
+            consultas.append(trabajo.cancelacion_pedida)
+            # La primera consulta es la previa al guardado; la segunda ocurre con el archivo a medias
+            if len(consultas) == 2:
+                rutas.extend(os.listdir(trabajo.directorio))
+                guardando.set()
+                assert cancelado.wait(10)
+            return trabajo.cancelacion_pedida
+        return _guardar_en_directorio(trabajo, TokenCancelacion(consultar))
+
+    cola = ColaTrabajos(ejecutar, trabajadores=1, al_cancelar=lambda trabajo: cancelado.set())
+    try:
+        trabajo = cola.encolar(origen, 'DV')
+        assert guardando.wait(10)
+        cola.cancelar(trabajo)
+        (terminado,) = cola.completados(timeout=30)
+
+        assert terminado is trabajo
+        assert trabajo.estado == CANCELADO
+        assert isinstance(trabajo.error, TransformacionCancelada)
+        assert trabajo.ruta_resultado is None
+        assert rutas == ['resultado_origen.xlsx']
+        assert os.listdir(trabajo.directorio) == []
+    finally:
+        cancelado.set()
+        for trabajo in cola.trabajos():
+            cola.descartar(trabajo)
+        cola.cerrar()
+
+
+def test_cancelar_un_trabajo_pendiente_no_lo_ejecuta(origen):
+    liberar = threading.Event()
+    ejecutados = []
+
+    def ejecutar(trabajo):
+        ejecutados.append(trabajo.id)
+        assert liberar.wait(10)
+        return _guardar_en_directorio(trabajo)
+
+    cola = ColaTrabajos(ejecutar, trabajadores=1)
+    try:
+        primero = cola.encolar(origen, 'DV')
+        segundo = cola.encolar(origen, 'DV')
+        cola.cancelar(segundo)
+        liberar.set()
+        list(cola.completados(timeout=30))
+
+        assert primero.estado == COMPLETADO
+        assert segundo.estado == CANCELADO
+        assert ejecutados == [primero.id]
+    finally:
+        liberar.set()
+        for trabajo in cola.trabajos():
+            cola.descartar(trabajo)
+        cola.cerrar()
+
+
+def test_plazo_vencido_lanza_transformacion_cancelada():
+    token = TokenCancelacion(limite_segundos=0.01)
+    time.sleep(0.05)
+
+    with pytest.raises(TransformacionCancelada, match='Tiempo límite'):
+        token.comprobar()
+    assert token.cancelado
+
+
+def test_guardado_con_plazo_vencido_no_deja_archivo(tmp_path):
+    token = TokenCancelacion(limite_segundos=0.01)
+    time.sleep(0.05)
+    ruta = tmp_path / 'resultado.xlsx'
+
+    with pytest.raises(TransformacionCancelada):
+        guardar_libro(_libro(), str(ruta), token)
+    assert not ruta.exists()
+
+
+def test_sin_plazo_no_se_cancela():
+    token = TokenCancelacion()
+
+    token.comprobar()
+    assert not token.cancelado
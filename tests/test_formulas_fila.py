@@ -0,0 +1,102 @@
+# tests/test_formulas_fila.py
+"""Pruebas del evaluador de fórmulas de la fila plantilla"""
+
+from datetime import datetime
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from src.modelo.formulas_fila import CALCULAR, EvaluadorFormulas
+from src.modelo.transferencia_datos import TransferenciaDatos
+from src.modelo.valores_cacheados import SIN_VALOR
+
+
+def _sin_fijos(fila, col):
+    return None
+
+
+def _arreglo(*valores):
+    arreglo = np.empty(len(valores), dtype=object)
+    arreglo[:] = list(valores)
+    return arreglo
+
+
+def _evaluar(formula, entradas, col=30):
+    evaluador = EvaluadorFormulas({col: formula}, _sin_fijos)
+    assert evaluador.no_soportadas == {}
+    n = len(next(iter(entradas.values())))
+    return list(evaluador.evaluar(entradas, n)[col])
+
+
+@pytest.mark.parametrize('formula', [
+    '=ROUND(DATEDIF(H6,V6,"Y"),2)',
+    '=IF(AND(A6>1,B6>1),1,0)',
+    '=SUM(ABS(A6),1)',
+    '=ROUND(ABS(INT(A6)),0)',
+])
+def test_funciones_anidadas_se_compilan(formula):
+    evaluador = EvaluadorFormulas({30: formula}, _sin_fijos)
+    assert evaluador.no_soportadas == {}
+    assert evaluador.orden == [30]
+
+
+@pytest.mark.parametrize('formula', ['=SUM(A6,)', '=SUM(,A6)', '=ROUND(A6,)'])
+def test_argumento_vacio_no_se_soporta(formula):
+    evaluador = EvaluadorFormulas({30: formula}, _sin_fijos)
+    assert 'argumento vacío' in evaluador.no_soportadas[30]
+
+
+def test_if_and_anidado():
+    entradas = {1: _arreglo(2, 2, 0), 2: _arreglo(3, 0, 3)}
+    assert _evaluar('=IF(AND(A6>1,B6>1),1,0)', entradas) == [1, 0, 0]
+
+
+def test_sum_de_abs():
+    assert _evaluar('=SUM(ABS(A6),1)', {1: _arreglo(-4, 2.5)}) == [5, 3.5]
+
+
+def test_datedif():
+    entradas = {
+        8: _arreglo(datetime(1980, 5, 20), datetime(1980, 5, 20), datetime(2000, 1, 31)),
+        22: _arreglo(datetime(2024, 5, 19), datetime(2024, 5, 20), datetime(2000, 3, 1)),
+    }
+    assert _evaluar('=DATEDIF(H6,V6,"Y")', entradas) == [43, 44, 0]
+    assert _evaluar('=DATEDIF(H6,V6,"M")', entradas) == [527, 528, 1]
+    assert _evaluar('=DATEDIF(H6,V6,"D")', entradas) == [16070, 16071, 30]
+
+
+def test_datedif_con_inicio_posterior_queda_sin_valor():
+    entradas = {8: _arreglo(datetime(2024, 1, 2)), 22: _arreglo(datetime(2024, 1, 1))}
+    assert _evaluar('=DATEDIF(H6,V6,"D")', entradas) == [SIN_VALOR]
+
+
+def test_round_de_datedif():
+    entradas = {8: _arreglo(datetime(1980, 5, 20)), 22: _arreglo(datetime(2024, 5, 19))}
+    assert _evaluar('=ROUND(DATEDIF(H6,V6,"Y"),2)', entradas) == [43]
+
+
+def test_round_mitad_hacia_arriba():
+    assert _evaluar('=ROUND(A6,1)', {1: _arreglo(2.25, -2.25, 0.15)}) == [2.3, -2.3, 0.2]
+
+
+def test_referencia_a_celda_calculada_queda_sin_valor():
+    assert _evaluar('=A6+1', {1: _arreglo(1, CALCULAR)}) == [2, SIN_VALOR]
+
+
+def test_fila6_lee_columnas_de_su_propio_evaluador():
+    """La fila 6 se evalúa con las fórmulas originales, que pueden leer otras columnas"""
+    transferencia = TransferenciaDatos(None, {}, {}, None)
+    transferencia._evaluador = EvaluadorFormulas({30: '=ROUND(A6,0)'}, _sin_fijos)
+    transferencia._evaluador_fila6 = EvaluadorFormulas({30: '=B6*2'}, _sin_fijos)
+    descriptor = SimpleNamespace(
+        formulas_fila6={30: '=B6*2'},
+        col_pais_residencia=None, col_numero_poliza=None, col_nombre_producto=None,
+    )
+    datos = {1: _arreglo(1.4, 2.6), 2: _arreglo(5, 7)}
+
+    calculados = transferencia._calcular_formulas(None, datos, 2, 6, descriptor)
+    assert list(calculados[30]) == [10, 3]
+
+    calculados = transferencia._calcular_formulas(None, datos, 2, 8, descriptor)
+    assert list(calculados[30]) == [1, 3]